@@ -0,0 +1,64 @@
+# benchmarks/bench_import_time.py
+"""
+Measures how long importing the packages' entry points takes in a fresh interpreter, and which
+heavy dependencies each one loads.
+
+Run from the repository root:
+    python -m benchmarks.bench_import_time
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# (module, the heavy dependencies importing it may load)
+MODULES = [
+    ('gym_betse', ()),
+    ('koopman', ()),
+    ('gym_betse.utils.yaml_friend', ('pandas',)),
+    ('gym_betse.utils.data_storage', ('h5py',)),
+    ('gym_betse.envs.betse_env', ('h5py', 'pandas', 'gymnasium')),
+    ('koopman.dataset', ('h5py', 'torch')),
+]
+HEAVY = ('betse', 'matplotlib', 'torch', 'h5py', 'pandas', 'gymnasium')
+
+_PROBE = """
+import importlib, json, sys, time
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+seconds = time.perf_counter() - start
+print(json.dumps({'seconds': seconds, 'loaded': [name for name in sys.argv[2:] if name in sys.modules]}))
+"""
+
+
+def measure(module, repeats=3):
+    """
+    :return: (fastest import time of module over repeats fresh interpreters, heavy modules it loaded).
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')])))
+    best, loaded = float('inf'), []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-c", _PROBE, module, *HEAVY], capture_output=True, text=True,
+                                check=True, env=env).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        best, loaded = min(best, result['seconds']), result['loaded']
+    return best, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    for module, allowed in MODULES:
+        seconds, loaded = measure(module, args.repeats)
+        unexpected = sorted(set(loaded) - set(allowed))
+        print(f"{module:32s} {seconds * 1e3:9.1f} ms  loads: {', '.join(loaded) or '-'}"
+              + (f"  UNEXPECTED: {', '.join(unexpected)}" if unexpected else ""))
+
+
+if __name__ == "__main__":
+    main()
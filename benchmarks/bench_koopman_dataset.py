@@ -0,0 +1,115 @@
+# benchmarks/bench_koopman_dataset.py
+"""
+Compares DataLoader throughput of the KoopmanDataset backends against per-sample HDF5 reads.
+
+Run from the repository root:
+    python -m benchmarks.bench_koopman_dataset
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import h5py
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Dataset
+
+from gym_betse.utils.data_storage import DataStorage
+from koopman.dataset import KoopmanDataset, ContiguousBatchSampler, export_memmap
+from koopman.train_koopman import custom_collate_fn
+
+
+class PerSampleDataset(Dataset):
+    """
+    The previous KoopmanDataset: three h5py reads per sample.
+    """
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.h5file = None
+        with h5py.File(filepath, 'r') as h5file:
+            self.length = int(h5file['transitions'].attrs['length'])
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, idx):
+        if self.h5file is None:
+            self.h5file = h5py.File(self.filepath, 'r')
+        transitions = self.h5file['transitions']
+        state = transitions['state'][idx]
+        seq_len = transitions['seq_len'][idx]
+        offset = transitions['offsets'][idx]
+        next_states = transitions['next_states'][offset:offset + seq_len]
+        return {'state': torch.tensor(state, dtype=torch.float32),
+                'next_states': torch.tensor(next_states, dtype=torch.float32),
+                'seq_len': torch.tensor(seq_len, dtype=torch.int64)}
+
+
+def write_dataset(path, num_transitions, state_size, max_seq_length):
+    storage = DataStorage(storage_path=path, filename='dataset.h5', state_size=state_size,
+                          max_seq_length=max_seq_length)
+    rng = np.random.default_rng(0)
+    for _ in range(num_transitions):
+        seq_len = rng.integers(1, max_seq_length + 1)
+        storage.store_transition(rng.random(state_size), 0, rng.random((seq_len, state_size)), 0.0, False)
+    storage.close()
+    return storage.filepath
+
+
+def throughput(loader, max_batches):
+    samples = 0
+    start = time.perf_counter()
+    for i, batch in enumerate(loader):
+        samples += len(batch['state'])
+        if i + 1 == max_batches:
+            break
+    return samples / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--transitions", type=int, default=20000)
+    parser.add_argument("--state-size", type=int, default=64)
+    parser.add_argument("--max-seq-length", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--batches", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=0)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        filepath = write_dataset(tmp, args.transitions, args.state_size, args.max_seq_length)
+        memmap_dir = export_memmap(filepath, os.path.join(tmp, 'memmap'))
+        loader_kwargs = {'collate_fn': custom_collate_fn, 'num_workers': args.workers}
+
+        def shuffled(dataset):
+            return DataLoader(dataset, batch_size=args.batch_size, shuffle=True, **loader_kwargs)
+
+        def contiguous(dataset):
+            return DataLoader(dataset, batch_sampler=ContiguousBatchSampler(dataset, args.batch_size),
+                              **loader_kwargs)
+
+        cases = {
+            "per-sample h5 (previous)": shuffled(PerSampleDataset(filepath)),
+            "h5, batched reads": shuffled(KoopmanDataset(filepath)),
+            "h5, contiguous batches": contiguous(KoopmanDataset(filepath)),
+            "preload, shuffled": shuffled(KoopmanDataset(filepath, preload=True)),
+            "memmap, shuffled": shuffled(KoopmanDataset(memmap_dir)),
+            "memmap, contiguous batches": contiguous(KoopmanDataset(memmap_dir)),
+        }
+        results = {name: throughput(loader, args.batches) for name, loader in cases.items()}
+    finally:
+        shutil.rmtree(tmp)
+
+    baseline = results["per-sample h5 (previous)"]
+    print(f"{args.transitions} transitions, batch size {args.batch_size}, {args.workers} workers")
+    for name, rate in results.items():
+        print(f"{name:28s} {rate:12.0f} samples/s  {rate / baseline:8.1f}x")
+
+
+if __name__ == "__main__":
+    torch.manual_seed(0)
+    main()
@@ -0,0 +1,70 @@
+# benchmarks/bench_koopman_loss.py
+"""
+Compares forward + backward time of the per-step rollout loss against compute_koopman_loss.
+
+Run from the repository root:
+    python -m benchmarks.bench_koopman_loss
+"""
+
+import argparse
+import time
+
+import torch
+import torch.nn as nn
+
+from koopman.models import KoopmanModel
+from koopman.utils import compute_koopman_loss
+
+
+def loop_loss(model, state, next_states, seq_len):
+    criterion = nn.MSELoss()
+    lifted_state = model(state)
+    total_loss = 0.0
+    for t in range(next_states.shape[1] - 1):
+        lifted_state = model.predict_next_lifted(lifted_state)
+        reconstructed_state = model.reconstruct(lifted_state)
+        mask = (seq_len > t + 1).float().unsqueeze(1)
+        total_loss += criterion(reconstructed_state * mask, next_states[:, t + 1, :] * mask)
+    return total_loss
+
+
+def bench(loss_fn, model, batch, iterations):
+    loss_fn(model, *batch).backward()  # warm up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        model.zero_grad()
+        loss = loss_fn(model, *batch)
+        loss.backward()
+    return (time.perf_counter() - start) / iterations, loss.item()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--state-size", type=int, default=7)
+    parser.add_argument("--lifted-size", type=int, default=50)
+    parser.add_argument("--seq-len", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    model = KoopmanModel(state_size=args.state_size, lifted_size=args.lifted_size)
+    with torch.no_grad():
+        model.K.copy_(torch.linalg.qr(model.K)[0])  # orthogonal K keeps long rollouts finite
+    state = torch.randn(args.batch_size, args.state_size)
+    next_states = torch.randn(args.batch_size, args.seq_len, args.state_size)
+    seq_len = torch.randint(1, args.seq_len + 1, (args.batch_size,))
+    seq_len[0] = args.seq_len
+    batch = (state, next_states, seq_len)
+
+    loop_seconds, loop_value = bench(loop_loss, model, batch, args.iterations)
+    vector_seconds, vector_value = bench(compute_koopman_loss, model, batch, args.iterations)
+    print(f"batch {args.batch_size}, T={args.seq_len}, lifted {args.lifted_size}, "
+          f"{torch.get_num_threads()} threads")
+    print(f"{'per-step loop':24s} {loop_seconds * 1e3:9.3f} ms/step  loss {loop_value:.6f}")
+    print(f"{'compute_koopman_loss':24s} {vector_seconds * 1e3:9.3f} ms/step  loss {vector_value:.6f}  "
+          f"{loop_seconds / vector_seconds:6.1f}x")
+
+
+if __name__ == "__main__":
+    torch.manual_seed(0)
+    main()
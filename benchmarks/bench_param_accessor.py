@@ -0,0 +1,71 @@
+# benchmarks/bench_param_accessor.py
+"""
+Compares applying an action through yaml_friend.update_yaml against ParamAccessor.
+
+Run from the repository root:
+    python -m benchmarks.bench_param_accessor
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from gym_betse.utils import yaml_friend
+
+DEFAULT_CONFIG = os.path.join(os.path.dirname(__file__), "..", "gym_betse", "config", "betse_config.yaml")
+
+
+def bench_update_yaml(config_path, paths, actions):
+    start = time.perf_counter()
+    for values in actions:
+        yaml_friend.update_yaml(config_path, paths, values, write_path=config_path)
+    return (time.perf_counter() - start) / len(actions)
+
+
+def bench_accessor(config_path, paths, actions):
+    start = time.perf_counter()
+    accessor = yaml_friend.ParamAccessor(config_path, paths)
+    for values in actions:
+        if accessor.set_values(values):
+            accessor.write(config_path)
+    return (time.perf_counter() - start) / len(actions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--config", default=DEFAULT_CONFIG)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    # update_yaml cannot follow "grn/" paths into the referenced GRN file, so only the config paths
+    # of the default list are compared
+    paths = [path for path in yaml_friend.DEFAULT_PARAMS if path.startswith("config/")]
+    tmp = tempfile.mkdtemp()
+    try:
+        config_path = os.path.join(tmp, "temp.yaml")
+        shutil.copy(args.config, config_path)
+        initial = yaml_friend.ParamAccessor(config_path, paths).get_values()
+        actions = [yaml_friend.perturb_values(initial) for _ in range(args.iterations)]
+        repeated = [initial] * args.iterations
+
+        results = {
+            "update_yaml": bench_update_yaml(config_path, paths, actions),
+            "ParamAccessor": bench_accessor(config_path, paths, actions),
+            "ParamAccessor (unchanged values)": bench_accessor(config_path, paths, repeated),
+        }
+    finally:
+        shutil.rmtree(tmp)
+
+    baseline = results["update_yaml"]
+    print(f"{len(paths)} parameters, {args.iterations} actions, libyaml: {yaml_friend.SafeLoader.__name__}")
+    for name, seconds in results.items():
+        print(f"{name:34s} {seconds * 1e3:9.3f} ms/action  {baseline / seconds:8.1f}x")
+
+
+if __name__ == "__main__":
+    np.random.seed(0)
+    main()
@@ -0,0 +1,111 @@
+# benchmarks/bench_replay.py
+"""
+Compares DQNAgent.replay() with the previous deque-of-tuples memory against ReplayBuffer and
+PrioritizedReplayBuffer.
+
+Run from the repository root:
+    python -m benchmarks.bench_replay
+"""
+
+import argparse
+import random
+import time
+from collections import deque
+
+import numpy as np
+import torch
+
+from gym_betse.agents.dqn_agent import DQNAgent
+
+
+class DequeDQNAgent(DQNAgent):
+    """
+    DQNAgent with the previous deque memory and per-update list comprehensions.
+    """
+    def __init__(self, state_size, action_size, buffer_size):
+        super(DequeDQNAgent, self).__init__(state_size, action_size, buffer_size=1)
+        self.memory = deque(maxlen=buffer_size)
+
+    def step(self, state, action, reward, next_state, done):
+        self.memory.append((state, action, reward, next_state, done))
+
+    def replay(self):
+        minibatch = random.sample(self.memory, self.batch_size)
+        states = torch.tensor([e[0] for e in minibatch], dtype=torch.float32)
+        actions = torch.tensor([e[1] for e in minibatch], dtype=torch.long)
+        rewards = torch.tensor([e[2] for e in minibatch], dtype=torch.float32)
+        next_states = torch.tensor([e[3] for e in minibatch], dtype=torch.float32)
+        dones = torch.tensor([e[4] for e in minibatch], dtype=torch.float32)
+        target = rewards + self.gamma * torch.max(self.model(next_states), dim=1)[0] * (1 - dones)
+        current = self.model(states).gather(1, actions.unsqueeze(1)).squeeze(1)
+        loss = self.loss_fn(current, target.detach())
+        self.optimizer.zero_grad()
+        loss.backward()
+        self.optimizer.step()
+
+
+def fill(agent, transitions, state_size, action_size):
+    rng = np.random.default_rng(0)
+    for _ in range(transitions):
+        state, next_state = rng.random(state_size, dtype=np.float32), rng.random(state_size, dtype=np.float32)
+        if isinstance(agent.memory, deque):
+            agent.memory.append((state, int(rng.integers(action_size)), 0.0, next_state, False))
+        else:
+            agent.memory.add(state, int(rng.integers(action_size)), 0.0, next_state, False)
+
+
+def bench(agent, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        agent.replay()
+    return (time.perf_counter() - start) / iterations
+
+
+def bench_sampling(agent, iterations):
+    # sampling and tensor conversion only, without the network update
+    start = time.perf_counter()
+    for _ in range(iterations):
+        if isinstance(agent.memory, deque):
+            minibatch = random.sample(agent.memory, agent.batch_size)
+            for field in range(5):
+                torch.tensor([e[field] for e in minibatch])
+        else:
+            batch = agent.memory.sample(agent.batch_size)
+            if 'weights' in batch:
+                agent.memory.update_priorities(batch['indices'], np.ones(agent.batch_size))
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--state-size", type=int, default=64)
+    parser.add_argument("--action-size", type=int, default=5)
+    parser.add_argument("--capacity", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    agents = {
+        "deque (previous)": DequeDQNAgent(args.state_size, args.action_size, args.capacity),
+        "ReplayBuffer": DQNAgent(args.state_size, args.action_size, buffer_size=args.capacity),
+        "PrioritizedReplayBuffer": DQNAgent(args.state_size, args.action_size, buffer_size=args.capacity,
+                                            prioritized=True),
+    }
+    results = {}
+    for name, agent in agents.items():
+        agent.batch_size = args.batch_size
+        fill(agent, args.capacity, args.state_size, args.action_size)
+        results[name] = bench_sampling(agent, args.iterations), bench(agent, args.iterations)
+
+    baseline_sampling, baseline = results["deque (previous)"]
+    print(f"capacity {args.capacity}, batch {args.batch_size}, state size {args.state_size}")
+    print(f"{'':26s} {'sample':>16s} {'replay()':>26s}")
+    for name, (sampling, seconds) in results.items():
+        print(f"{name:26s} {sampling * 1e6:9.1f} us {baseline_sampling / sampling:5.1f}x "
+              f"{seconds * 1e6:9.1f} us {baseline / seconds:5.1f}x")
+
+
+if __name__ == "__main__":
+    torch.manual_seed(0)
+    random.seed(0)
+    main()
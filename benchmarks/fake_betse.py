@@ -0,0 +1,98 @@
+# benchmarks/fake_betse.py
+"""
+Deterministic stand-in for ContinuableBetseWrapper, passed to BetseSimulation(wrapper_cls=...).
+
+It implements the phase methods BetseSimulation calls, sleeps for a configurable time in each of
+them and fills phase.sim.vm_ave / vm_ave_time with values derived from the config file contents
+and the run count, so benchmarks exercise the whole env pipeline without BETSE.
+"""
+
+import os
+import time
+import zlib
+from types import SimpleNamespace
+
+import numpy as np
+
+# Seconds spent in each phase by default: zero measures the overhead of everything around BETSE
+DEFAULT_LATENCY = {'run_seed': 0.0, 'run_init': 0.0, 'load_init': 0.0, 'load_sim': 0.0, 'run_sim': 0.0,
+                   'save_sim': 0.0}
+
+
+class FakeBetseWrapper:
+    """
+    Use make_fake_wrapper() to get a subclass with other latencies or output sizes.
+    """
+    latency = DEFAULT_LATENCY
+    num_cells = 7
+    num_samples = 50
+
+    def __init__(self, config_filename, log_filename=None, log_level=None):
+        self._config_filename = config_filename
+        self.runs = 0
+
+    def _wait(self, phase):
+        seconds = self.latency.get(phase, 0.0)
+        if seconds:
+            time.sleep(seconds)
+
+    def _run(self):
+        # the output depends on the config as BETSE's would, so actions change the observations
+        with open(self._config_filename, 'rb') as file:
+            seed = zlib.crc32(file.read()) + self.runs
+        rng = np.random.default_rng(seed)
+        start = rng.normal(-50.0, 10.0, self.num_cells)
+        drift = rng.normal(0.0, 0.5, self.num_cells)
+        vm_ave_time = [start + drift * t for t in range(self.num_samples)]
+        self.phase = SimpleNamespace(sim=SimpleNamespace(vm_ave=vm_ave_time[-1], vm_ave_time=vm_ave_time),
+                                     cells=SimpleNamespace(cell_centres=rng.random((self.num_cells, 2))))
+        self.runs += 1
+
+    def run_seed(self, verbose=False):
+        self._wait('run_seed')
+
+    def run_init(self, verbose=False):
+        self._wait('run_init')
+        self._run()
+
+    def load_init(self, verbose=False):
+        self._wait('load_init')
+        self._run()
+
+    def load_sim(self, verbose=False):
+        self._wait('load_sim')
+        self._run()
+
+    def run_sim(self, verbose=False):
+        self._wait('run_sim')
+        self._run()
+
+    def continue_sim(self, config_filename=None, persist=False, verbose=False):
+        if config_filename is not None:
+            self._config_filename = config_filename
+        self._wait('run_sim')
+        self._run()
+        if persist:
+            self.save_sim()
+
+    def save_sim(self):
+        self._wait('save_sim')
+
+
+def make_fake_wrapper(latency=None, num_cells=7, num_samples=50):
+    """
+    :param latency: Dict of phase name to seconds, overriding DEFAULT_LATENCY.
+    :return: FakeBetseWrapper subclass with the given settings.
+    """
+    return type('FakeBetseWrapper', (FakeBetseWrapper,), {
+        'latency': dict(DEFAULT_LATENCY, **(latency or {})),
+        'num_cells': num_cells,
+        'num_samples': num_samples,
+    })
+
+
+def fake_config_dir():
+    """
+    :return: The bundled config directory, which the fake only reads the YAML files of.
+    """
+    return os.path.join(os.path.dirname(__file__), "..", "gym_betse", "config")
@@ -0,0 +1,245 @@
+# benchmarks/run_suite.py
+"""
+Runs the benchmark suite against the FakeBetseWrapper backend and saves the results for comparison
+between commits.
+
+Run from the repository root:
+    python -m benchmarks.run_suite                       # writes benchmarks/results/<commit>.json
+    python -m benchmarks.run_suite --compare benchmarks/results/<other commit>.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import torch
+
+from benchmarks.bench_import_time import measure
+from benchmarks.bench_koopman_dataset import write_dataset, throughput
+from benchmarks.fake_betse import make_fake_wrapper, fake_config_dir
+from gym_betse.agents.dqn_agent import DQNAgent
+from gym_betse.envs.betse_env import BetseEnv
+from gym_betse.utils import yaml_friend
+from gym_betse.utils.data_storage import DataStorage
+from koopman.dataset import KoopmanDataset, ContiguousBatchSampler
+from koopman.models import KoopmanModel
+from koopman.train_koopman import custom_collate_fn
+from koopman.utils import compute_koopman_loss
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def timed(fn, iterations):
+    """
+    :return: Mean seconds per call of fn over iterations calls, after one warm-up call.
+    """
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+
+def make_env(tmp, latency, single_run=True):
+    config_path = os.path.join(fake_config_dir(), "betse_config.yaml")
+    working_dir = os.path.join(tmp, "config")
+    initial = yaml_friend.ParamAccessor(config_path, yaml_friend.get_param_list(
+        os.path.join(fake_config_dir(), "params.txt"))).get_values()
+    # Discrete actions map onto fixed parameter vectors: the initial values and four perturbations of them
+    np.random.seed(0)
+    action_values = [initial] + [yaml_friend.perturb_values(initial) for _ in range(4)]
+    return BetseEnv(config_path=config_path, working_dir=working_dir, storage_path=os.path.join(tmp, "data"),
+                    single_run=single_run,
+                    simulation_kwargs={'wrapper_cls': make_fake_wrapper(latency), 'continuation': True,
+                                       'action_values': action_values})
+
+
+def bench_env(tmp, args):
+    env = make_env(tmp, {'run_sim': args.sim_latency, 'load_init': args.init_latency})
+    env.reset(seed=0)
+    actions = iter(np.arange(10 ** 6) % env.action_space.n)
+    step = timed(lambda: env.step(next(actions)), args.env_steps)
+    reset = timed(env.reset, args.resets)
+    env.close()
+    return {'env_steps_per_sec': (1.0 / step, 'steps/s', True), 'reset_latency': (reset * 1e3, 'ms', False)}
+
+
+def bench_update_yaml(tmp, args):
+    config_path = os.path.join(tmp, "temp.yaml")
+    shutil.copy(os.path.join(fake_config_dir(), "betse_config.yaml"), config_path)
+    # the parameters BetseSimulation applies (the bundled config ships without the GRN file DEFAULT_PARAMS uses)
+    paths = yaml_friend.get_param_list(os.path.join(fake_config_dir(), "params.txt"))
+    accessor = yaml_friend.ParamAccessor(config_path, paths)
+    initial = accessor.get_values()
+    actions = iter([yaml_friend.perturb_values(initial) for _ in range(args.yaml_writes + 1)])
+
+    def apply():
+        accessor.set_values(next(actions))
+        accessor.write(config_path)
+
+    return {'update_yaml': (timed(apply, args.yaml_writes) * 1e3, 'ms', False)}
+
+
+def bench_storage(tmp, args):
+    rng = np.random.default_rng(0)
+    states = rng.random((args.transitions, args.state_size), dtype=np.float32)
+    sequences = rng.random((args.transitions, args.seq_len, args.state_size), dtype=np.float32)
+    storage = DataStorage(storage_path=tmp, filename="storage.h5", state_size=args.state_size,
+                          max_seq_length=args.seq_len)
+    start = time.perf_counter()
+    for i in range(args.transitions):
+        storage.store_transition(states[i], i % 5, sequences[i], 0.0, False)
+    storage.close()
+    return {'data_storage_writes': (args.transitions / (time.perf_counter() - start), 'transitions/s', True)}
+
+
+def bench_dataset(tmp, args):
+    filepath = write_dataset(os.path.join(tmp, "koopman"), args.transitions, args.state_size, args.seq_len)
+    dataset = KoopmanDataset(filepath)
+    loader = torch.utils.data.DataLoader(dataset, batch_size=256, shuffle=True, collate_fn=custom_collate_fn)
+    contiguous = torch.utils.data.DataLoader(dataset, batch_sampler=ContiguousBatchSampler(dataset, 256),
+                                             collate_fn=custom_collate_fn)
+    results = {'koopman_dataset_shuffled': (throughput(loader, 20), 'samples/s', True),
+               'koopman_dataset_contiguous': (throughput(contiguous, 20), 'samples/s', True)}
+    dataset.close()
+    return results
+
+
+def bench_training(tmp, args):
+    agent = DQNAgent(args.state_size, 5, buffer_size=10000)
+    rng = np.random.default_rng(0)
+    agent.memory.add_batch(rng.random((10000, args.state_size)), rng.integers(5, size=10000),
+                           rng.random(10000), rng.random((10000, args.state_size)), np.zeros(10000))
+    dqn = timed(agent.replay, args.train_steps)
+
+    model = KoopmanModel(state_size=args.state_size, lifted_size=50)
+    with torch.no_grad():
+        model.K.copy_(torch.linalg.qr(model.K)[0])
+    optimizer = torch.optim.Adam(model.parameters(), lr=1e-3)
+    state = torch.randn(32, args.state_size)
+    next_states = torch.randn(32, args.seq_len, args.state_size)
+    seq_len = torch.full((32,), args.seq_len)
+
+    def koopman_step():
+        optimizer.zero_grad()
+        compute_koopman_loss(model, state, next_states, seq_len).backward()
+        optimizer.step()
+
+    koopman = timed(koopman_step, args.train_steps)
+    return {'dqn_train_step': (dqn * 1e3, 'ms', False), 'koopman_train_step': (koopman * 1e3, 'ms', False)}
+
+
+def bench_imports(tmp, args):
+    # fresh interpreters, so the imports this script already did don't count
+    return {'import_gym_betse_env': (measure('gym_betse.envs.betse_env')[0] * 1e3, 'ms', False),
+            'import_yaml_friend': (measure('gym_betse.utils.yaml_friend')[0] * 1e3, 'ms', False)}
+
+
+BENCHMARKS = {
+    'env': bench_env,
+    'update_yaml': bench_update_yaml,
+    'storage': bench_storage,
+    'dataset': bench_dataset,
+    'training': bench_training,
+    'imports': bench_imports,
+}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results, baseline, threshold):
+    """
+    Prints every metric next to the baseline and returns the names that regressed by more than threshold.
+    """
+    regressions = []
+    print(f"{'metric':28s} {'baseline':>14s} {'current':>14s} {'change':>8s}")
+    for name, current in results['results'].items():
+        previous = baseline['results'].get(name)
+        if previous is None:
+            print(f"{name:28s} {'-':>14s} {current['value']:14.3f}")
+            continue
+        ratio = current['value'] / previous['value']
+        # express the change so that positive is always an improvement
+        change = ratio - 1 if current['higher_is_better'] else 1 / ratio - 1
+        flag = "  REGRESSION" if change < -threshold else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:28s} {previous['value']:14.3f} {current['value']:14.3f} {change:+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="run a subset of the suite")
+    parser.add_argument("--output", default=None, help="results file (default: results/<commit>.json)")
+    parser.add_argument("--compare", default=None, help="results file of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative slowdown reported as a regression (exit status 1)")
+    parser.add_argument("--sim-latency", type=float, default=0.0, help="fake run_sim seconds per step")
+    parser.add_argument("--init-latency", type=float, default=0.0, help="fake load_init seconds per reset")
+    parser.add_argument("--env-steps", type=int, default=200)
+    parser.add_argument("--resets", type=int, default=20)
+    parser.add_argument("--yaml-writes", type=int, default=50)
+    parser.add_argument("--transitions", type=int, default=5000)
+    parser.add_argument("--state-size", type=int, default=7)
+    parser.add_argument("--seq-len", type=int, default=50)
+    parser.add_argument("--train-steps", type=int, default=50)
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    np.random.seed(0)
+    torch.set_num_threads(1)
+    metrics = {}
+    tmp = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    try:
+        # BetseSimulation writes temp.yaml and logs relative to the working directory
+        os.chdir(tmp)
+        for name in args.only or BENCHMARKS:
+            for metric, (value, unit, higher_is_better) in BENCHMARKS[name](tmp, args).items():
+                metrics[metric] = {'value': value, 'unit': unit, 'higher_is_better': higher_is_better}
+                print(f"{metric:28s} {value:14.3f} {unit}")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(tmp)
+
+    results = {
+        'commit': git_commit(),
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'torch': torch.__version__,
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'arguments': vars(args),
+        'results': metrics,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{results['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump(results, file, indent=2)
+    print(f"Wrote {output}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        print(f"\nCompared with {baseline['commit']} ({baseline['timestamp']}):")
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
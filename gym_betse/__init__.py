@@ -1,6 +1,25 @@
 # gym_betse/__init__.py
 
-from gym_betse.envs import BetseEnv
+import importlib
+
+# Loaded on first access (PEP 562): the environments pull in BETSE, torch and h5py, which tools that
+# only need e.g. gym_betse.utils.yaml_friend, and every spawned worker, should not pay for
+_ENVS = ('BetseEnv', 'BetseVectorEnv', 'KoopmanSurrogateEnv')
+_SUBMODULES = ('envs', 'utils', 'agents')
 
 __all__ = ['envs', 'utils', 'agents']
 
+
+def __getattr__(name):
+    if name in _ENVS:
+        value = getattr(importlib.import_module('gym_betse.envs'), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module(f'gym_betse.{name}')
+    else:
+        raise AttributeError(f"module 'gym_betse' has no attribute '{name}'")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_ENVS) | set(_SUBMODULES))
@@ -2,19 +2,29 @@
 
 import random
 import numpy as np
-from collections import deque
 import torch
 import torch.nn as nn
 import torch.optim as optim
 from gym_betse.agents.base_agent import BaseAgent
+from gym_betse.agents.replay_buffer import ReplayBuffer, PrioritizedReplayBuffer
 
 class DQNAgent(BaseAgent):
     """
     DQN Agent implementation.
     """
-    def __init__(self, state_size, action_size):
+    def __init__(self, state_size, action_size, buffer_size=100000, prioritized=False, alpha=0.6, beta=0.4,
+                 gradient_steps=1, target_sync_every=100, tau=None):
+        """
+        :param gradient_steps: Replay updates per environment step.
+        :param target_sync_every: Updates between hard copies of the online network into the target network.
+        :param tau: If set, softly track the online network after every update instead
+            (target <- (1 - tau) * target + tau * online).
+        """
         super(DQNAgent, self).__init__(state_size, action_size)
-        self.memory = deque(maxlen=2000)
+        if prioritized:
+            self.memory = PrioritizedReplayBuffer(state_size, buffer_size, alpha=alpha, beta=beta)
+        else:
+            self.memory = ReplayBuffer(state_size, buffer_size)
         # Hyperparameters
         self.gamma = 0.95
         self.epsilon = 1.0
@@ -22,8 +32,15 @@ class DQNAgent(BaseAgent):
         self.epsilon_decay = 0.995
         self.batch_size = 64
         self.learning_rate = 1e-3
-        # Build network
+        self.gradient_steps = gradient_steps
+        self.target_sync_every = target_sync_every
+        self.tau = tau
+        self.updates = 0
+        # Build network, the target network provides the bootstrapped Q-values in replay()
         self.model = self._build_model()
+        self.target_model = self._build_model()
+        self.target_model.requires_grad_(False)
+        self.sync_target()
         self.optimizer = optim.Adam(self.model.parameters(), lr=self.learning_rate)
         self.loss_fn = nn.MSELoss()
 
@@ -38,40 +55,72 @@ class DQNAgent(BaseAgent):
         return model
 
     def act(self, state):
+        """
+        Epsilon-greedy action for one state, or an array of actions for a (num_envs, state_size) batch.
+        """
         # needs to specify the pharmacological intervention to BETSE
-        if np.random.rand() <= self.epsilon:
-            return random.randrange(self.action_size)
-        state = torch.tensor(state, dtype=torch.float32).unsqueeze(0)
-        act_values = self.model(state)
-        return torch.argmax(act_values[0]).item()
+        state = np.asarray(state, dtype=np.float32)
+        if state.ndim == 1:
+            if np.random.rand() <= self.epsilon:
+                return random.randrange(self.action_size)
+            return int(self.greedy(state[None])[0])
+        actions = self.greedy(state)
+        explore = np.random.rand(len(state)) <= self.epsilon
+        actions[explore] = np.random.randint(self.action_size, size=int(explore.sum()))
+        return actions
+
+    def greedy(self, states):
+        with torch.inference_mode():
+            return torch.argmax(self.model(torch.from_numpy(states)), dim=1).numpy()
 
     def step(self, state, action, reward, next_state, done):
-        self.memory.append((state, action, reward, next_state, done))
+        self.memory.add(state, action, reward, next_state, done)
         if len(self.memory) > self.batch_size:
-            self.replay()
+            for _ in range(self.gradient_steps):
+                self.replay()
         if self.epsilon > self.epsilon_min:
             self.epsilon *= self.epsilon_decay
 
     def replay(self):
-        minibatch = random.sample(self.memory, self.batch_size)
-        states = torch.tensor([e[0] for e in minibatch], dtype=torch.float32)
-        actions = torch.tensor([e[1] for e in minibatch], dtype=torch.long)
-        rewards = torch.tensor([e[2] for e in minibatch], dtype=torch.float32)
-        next_states = torch.tensor([e[3] for e in minibatch], dtype=torch.float32)
-        dones = torch.tensor([e[4] for e in minibatch], dtype=torch.float32)
+        batch = self.memory.sample(self.batch_size)
+        states, actions, rewards = batch['states'], batch['actions'], batch['rewards']
+        next_states, dones = batch['next_states'], batch['dones']
         # Compute target
-        target = rewards + self.gamma * torch.max(self.model(next_states), dim=1)[0] * (1 - dones)
-        current = self.model(states).gather(1, actions.unsqueeze(1)).squeeze()
-        # Compute loss
-        loss = self.loss_fn(current, target.detach())
+        with torch.no_grad():
+            target = rewards + self.gamma * torch.max(self.target_model(next_states), dim=1)[0] * (1 - dones)
+        current = self.model(states).gather(1, actions.unsqueeze(1)).squeeze(1)
+        # Compute loss, weighted by the importance-sampling weights under prioritized replay
+        if 'weights' in batch:
+            td_errors = current - target
+            loss = (batch['weights'] * td_errors.pow(2)).mean()
+            self.memory.update_priorities(batch['indices'], td_errors.detach().numpy())
+        else:
+            loss = self.loss_fn(current, target)
         # Backpropagation
         self.optimizer.zero_grad()
         loss.backward()
         self.optimizer.step()
+        self.updates += 1
+        if self.tau is not None:
+            self.sync_target(self.tau)
+        elif self.updates % self.target_sync_every == 0:
+            self.sync_target()
+
+    def sync_target(self, tau=None):
+        """
+        Copies the online weights into the target network, or moves them a fraction tau towards it.
+        """
+        with torch.no_grad():
+            if tau is None:
+                self.target_model.load_state_dict(self.model.state_dict())
+            else:
+                for target_param, param in zip(self.target_model.parameters(), self.model.parameters()):
+                    target_param.lerp_(param, tau)
 
     def save(self, filepath):
         torch.save(self.model.state_dict(), filepath)
 
     def load(self, filepath):
         self.model.load_state_dict(torch.load(filepath))
+        self.sync_target()
 
@@ -0,0 +1,156 @@
+# gym_betse/agents/replay_buffer.py
+
+import numpy as np
+import torch
+
+
+class ReplayBuffer:
+    """
+    Uniform experience replay backed by preallocated arrays used as a ring buffer.
+
+    Batches are gathered with one fancy index per field and handed to torch with torch.from_numpy,
+    so sampling costs no Python-level work per transition.
+    """
+    def __init__(self, state_size, capacity=100000, seed=None):
+        self.capacity = capacity
+        self.states = np.zeros((capacity, state_size), dtype=np.float32)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros((capacity, state_size), dtype=np.float32)
+        self.dones = np.zeros(capacity, dtype=np.float32)
+        self.position = 0
+        self.size = 0
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, state, action, reward, next_state, done):
+        i = self.position
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = next_state
+        self.dones[i] = done
+        self.position = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        return i
+
+    def add_batch(self, states, actions, rewards, next_states, dones):
+        """
+        Adds a batch of transitions, e.g. one step of a vector env. Of a batch larger than the buffer
+        only the last capacity transitions are kept, as if they had been added one by one.
+
+        :return: Indices the kept transitions were written to.
+        """
+        count = len(actions)
+        if count == 0:
+            return np.zeros(0, dtype=np.int64)
+        skip = max(0, count - self.capacity)
+        indices = (self.position + skip + np.arange(count - skip)) % self.capacity
+        self.states[indices] = states[skip:]
+        self.actions[indices] = actions[skip:]
+        self.rewards[indices] = rewards[skip:]
+        self.next_states[indices] = next_states[skip:]
+        self.dones[indices] = dones[skip:]
+        self.position = (self.position + count) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+        return indices
+
+    def _gather(self, indices):
+        return {
+            'states': torch.from_numpy(self.states[indices]),
+            'actions': torch.from_numpy(self.actions[indices]),
+            'rewards': torch.from_numpy(self.rewards[indices]),
+            'next_states': torch.from_numpy(self.next_states[indices]),
+            'dones': torch.from_numpy(self.dones[indices]),
+            'indices': indices,
+        }
+
+    def sample(self, batch_size):
+        """
+        :return: Dict of batched tensors (states, actions, rewards, next_states, dones) plus the
+            sampled indices.
+        """
+        return self._gather(self.rng.integers(0, self.size, size=batch_size))
+
+
+class SumTree:
+    """
+    Binary tree over a power-of-two number of leaves where every node holds the sum of its children,
+    stored flat in one array (root at 1, leaves at leaf_offset:). Updates and prefix-sum lookups
+    are vectorized over a batch of indices and take O(log capacity) array operations.
+    """
+    def __init__(self, capacity):
+        self.leaf_offset = 1 << max(0, int(np.ceil(np.log2(capacity))))
+        self.nodes = np.zeros(2 * self.leaf_offset, dtype=np.float64)
+
+    @property
+    def total(self):
+        return self.nodes[1]
+
+    def update(self, indices, values):
+        nodes = np.asarray(indices, dtype=np.int64).reshape(-1) + self.leaf_offset
+        self.nodes[nodes] = values
+        # repeated parents just recompute the same sum, so no need to deduplicate
+        nodes = nodes // 2
+        while nodes[0] >= 1:
+            self.nodes[nodes] = self.nodes[2 * nodes] + self.nodes[2 * nodes + 1]
+            nodes = nodes // 2
+
+    def find(self, targets):
+        """
+        :return: Leaf index of each target prefix sum.
+        """
+        targets = np.array(targets, dtype=np.float64)
+        nodes = np.ones(len(targets), dtype=np.int64)
+        while nodes[0] < self.leaf_offset:
+            left = 2 * nodes
+            go_right = targets > self.nodes[left]
+            targets -= np.where(go_right, self.nodes[left], 0.0)
+            nodes = left + go_right
+        return nodes - self.leaf_offset
+
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+    """
+    Proportional prioritized replay (Schaul et al., 2016) on top of ReplayBuffer.
+
+    New transitions get the highest priority seen so far. sample() also returns importance-sampling
+    weights, normalized by their maximum, which the learner should apply to the loss before calling
+    update_priorities with the new TD errors.
+    """
+    def __init__(self, state_size, capacity=100000, alpha=0.6, beta=0.4, epsilon=1e-6, seed=None):
+        super(PrioritizedReplayBuffer, self).__init__(state_size, capacity, seed)
+        self.alpha = alpha
+        self.beta = beta
+        self.epsilon = epsilon
+        self.tree = SumTree(capacity)
+        self.max_priority = 1.0
+
+    def add(self, state, action, reward, next_state, done):
+        i = super(PrioritizedReplayBuffer, self).add(state, action, reward, next_state, done)
+        self.tree.update([i], self.max_priority ** self.alpha)
+        return i
+
+    def add_batch(self, states, actions, rewards, next_states, dones):
+        indices = super(PrioritizedReplayBuffer, self).add_batch(states, actions, rewards, next_states, dones)
+        if len(indices):
+            self.tree.update(indices, self.max_priority ** self.alpha)
+        return indices
+
+    def sample(self, batch_size):
+        # stratified: one uniform draw from each of batch_size equal slices of the total mass
+        bounds = np.linspace(0.0, self.tree.total, batch_size + 1)
+        targets = self.rng.uniform(bounds[:-1], bounds[1:])
+        indices = np.minimum(self.tree.find(targets), self.size - 1)
+        probabilities = self.tree.nodes[indices + self.tree.leaf_offset] / self.tree.total
+        weights = (self.size * probabilities) ** -self.beta
+        batch = self._gather(indices)
+        batch['weights'] = torch.from_numpy((weights / weights.max()).astype(np.float32))
+        return batch
+
+    def update_priorities(self, indices, td_errors):
+        priorities = np.abs(np.asarray(td_errors, dtype=np.float64)) + self.epsilon
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+        self.tree.update(indices, priorities ** self.alpha)
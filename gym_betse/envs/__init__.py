@@ -1,6 +1,24 @@
 # gym_betse/envs/__init__.py
 
-from gym_betse.envs.betse_env import BetseEnv
+import importlib
 
-__all__ = ['BetseEnv']
+# public name -> defining module, imported on first access
+_MODULES = {
+    'BetseEnv': 'gym_betse.envs.betse_env',
+    'BetseVectorEnv': 'gym_betse.envs.betse_vector_env',
+    'KoopmanSurrogateEnv': 'gym_betse.envs.koopman_surrogate_env',
+}
 
+__all__ = ['BetseEnv', 'BetseVectorEnv', 'KoopmanSurrogateEnv']
+
+
+def __getattr__(name):
+    if name not in _MODULES:
+        raise AttributeError(f"module 'gym_betse.envs' has no attribute '{name}'")
+    value = getattr(importlib.import_module(_MODULES[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -5,18 +5,35 @@ from gymnasium import spaces
 import numpy as np
 from gym_betse.utils.betse_interface import BetseSimulation
 from gym_betse.utils.data_storage import DataStorage
+from gym_betse.utils.profiler import Profiler, peak_rss
 
 class BetseEnv(gym.Env):
     """
     Custom Gymnasium environment for BETSE simulations.
     """
-    metadata = {'render.modes': ['human']}
+    metadata = {'render.modes': ['human', 'rgb_array'], 'render_modes': ['human', 'rgb_array'], 'render_fps': 10}
 
-    def __init__(self, config_path='config/betse_config.yml'):
+    def __init__(self, config_path='config/betse_config.yml', working_dir=None, storage_path='data/',
+                 snapshot_cache=None, simulation_kwargs=None, single_run=False, sample_stride=1, sample_window=None,
+                 profile=False, profile_path=None, storage_kwargs=None, render_mode=None, record_path=None,
+                 record_frame_skip=1, reward_fn=None):
         super(BetseEnv, self).__init__()
 
-        # Initialize BETSE simulation
-        self.simulation = BetseSimulation(config_path)
+        # profile: time every phase of a step, report per step in info['timings'] and in total through
+        # self.profiler.report(); close() writes the total to profile_path (JSON, or CSV for a .csv path)
+        self.profiler = Profiler(enabled=profile)
+        self.profile_path = profile_path
+
+        # Initialize BETSE simulation (simulation_kwargs are extra BetseSimulation options, e.g. continuation)
+        self.simulation = BetseSimulation(config_path, working_dir=working_dir, snapshot_cache=snapshot_cache,
+                                          profiler=self.profiler, **(simulation_kwargs or {}))
+
+        # render_mode: default mode of render(); record_path: write a frame every record_frame_skip
+        # simulation steps to this .gif (or video, with imageio)
+        self.render_mode = render_mode
+        if record_path is not None:
+            self.simulation.start_recording(record_path, fps=self.metadata['render_fps'],
+                                            frame_skip=record_frame_skip)
 
         # Define action and observation spaces
         self.action_space = spaces.Discrete(self.simulation.get_num_actions())
@@ -27,60 +44,99 @@ class BetseEnv(gym.Env):
             dtype=np.float32
         )
 
-        # Initialize data storage
+        # Initialize data storage (storage_kwargs are extra DataStorage options, e.g. the shard of a parallel collector)
         self.data_storage = DataStorage(
+            storage_path=storage_path,
             state_size=self.observation_space.shape[0],
-            max_seq_length=self.simulation.max_seq_length
+            max_seq_length=self.simulation.max_seq_length,
+            **(storage_kwargs or {})
         )
 
         # Other initialization
+        # reward_fn: scores (state, next_states), e.g. a gym_betse.utils.reward.TargetReward
+        self.reward_fn = reward_fn
         self.current_state = None
         self.max_steps_per_action = self.simulation.max_steps_per_action
 
-    def reset(self):
+        # single_run: one BETSE run per action, next_states are sampled from its vm_ave_time
+        self.single_run = single_run
+        self.sample_stride = sample_stride
+        self.sample_window = sample_window if sample_window is not None else self.max_steps_per_action
+
+    def reset(self, seed=None, options=None):
+        super(BetseEnv, self).reset(seed=seed)
+        self.profiler.begin_step()
         self.simulation.reset()
         self.current_state = self.simulation.get_observation()
-        return self.current_state, {}
+        return self.current_state, self._profile_info()
 
     def step(self, action):
+        self.profiler.begin_step()
         # Apply action and collect sequence of states
-        next_states = []
         self.simulation.apply_action(action)
 
-        for _ in range(self.max_steps_per_action):
+        if self.single_run:
             self.simulation.step()
-            state = self.simulation.get_observation()
-            next_states.append(state)
-            if self.simulation.is_done():
-                break
-
-        next_states = np.array(next_states)  # Shape: [seq_len, state_size]
-        reward = self.compute_reward(next_states[-1])
+            next_states = self.simulation.get_observation_sequence(self.sample_stride, self.sample_window)
+        else:
+            next_states = []
+            for _ in range(self.max_steps_per_action):
+                self.simulation.step()
+                state = self.simulation.get_observation()
+                next_states.append(state)
+                if self.simulation.is_done():
+                    break
+            next_states = np.array(next_states)  # Shape: [seq_len, state_size]
+        with self.profiler.section('compute_reward'):
+            reward = self.compute_reward(self.current_state, next_states)
         done = self.simulation.is_done()
 
         # Store transition
-        self.data_storage.store_transition(
-            state=self.current_state,
-            action=action,
-            next_states=next_states,
-            reward=reward,
-            done=done
-        )
+        with self.profiler.section('store_transition'):
+            self.data_storage.store_transition(
+                state=self.current_state,
+                action=action,
+                next_states=next_states,
+                reward=reward,
+                done=done
+            )
 
         # Update current state
         self.current_state = next_states[-1]
+        if done:
+            self.simulation.persist()
+
+        info = self._profile_info()
+        if self.simulation.result_cache is not None:
+            info['cached'] = self.simulation.last_step_cached
+        return self.current_state, reward, done, False, info
 
-        return self.current_state, reward, done, False, {}
+    def _profile_info(self):
+        if not self.profiler.enabled:
+            return {}
+        return {'timings': self.profiler.step_timings(), 'peak_rss': peak_rss()}
 
-    def render(self, mode='human'):
-        self.simulation.render(mode)
+    def render(self, mode=None):
+        return self.simulation.render(mode or self.render_mode or 'human')
 
     def close(self):
         self.simulation.close()
-        self.data_storage.close()
-
-    def compute_reward(self, observation):
-        # Implement your reward function
-        reward = 0.0
-        return reward
+        with self.profiler.section('close_storage'):
+            self.data_storage.close()
+        if self.profiler.enabled and self.profile_path is not None:
+            self.profiler.export(self.profile_path)
+
+    def cache_stats(self):
+        """
+        :return: ResultCache.stats() of the simulation's result cache, None without one.
+        """
+        if self.simulation.result_cache is None:
+            return None
+        return self.simulation.result_cache.stats()
+
+    def compute_reward(self, state, next_states):
+        # every transition is worth 0 without a reward_fn
+        if self.reward_fn is None:
+            return 0.0
+        return float(self.reward_fn(state, next_states))
 
@@ -0,0 +1,226 @@
+# gym_betse/envs/betse_vector_env.py
+
+import multiprocessing as mp
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+from gymnasium.vector import VectorEnv
+from gymnasium.vector.utils import batch_space
+from gymnasium.vector.vector_env import AutoresetMode
+
+from gym_betse.utils.data_storage import merge_shards, shard_filename
+
+# Environment variables read by the BLAS/OpenMP runtimes when a worker process starts.
+BLAS_THREAD_VARS = [
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+]
+
+
+@contextmanager
+def limit_blas_threads(num_threads):
+    """
+    Temporarily caps the BLAS thread count in os.environ. Processes started inside the block
+    inherit the cap, so N workers doing linear algebra do not each spin up a thread per core.
+    """
+    if num_threads is None:
+        yield
+        return
+    saved = {var: os.environ.get(var) for var in BLAS_THREAD_VARS}
+    for var in BLAS_THREAD_VARS:
+        os.environ[var] = str(num_threads)
+    try:
+        yield
+    finally:
+        for var, value in saved.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+
+
+def _worker(remote, parent_remote, config_path, workdir, autoreset_mode, snapshot_cache_dir, env_kwargs,
+            storage_path=None, shard=None):
+    """
+    Runs one BetseEnv inside its own scratch directory and serves commands sent over the pipe.
+    Every reply is a (success, payload) pair; on failure the payload is the error message.
+    """
+    parent_remote.close()
+    # relative defaults (temp.yaml, data/, logs) now land in the scratch dir
+    os.chdir(workdir)
+    # imported here so the BLAS caps set by the parent apply before numpy/BETSE load
+    from gym_betse.envs.betse_env import BetseEnv
+    from gym_betse.utils.snapshot_cache import SnapshotCache
+
+    if storage_path:
+        # every worker writes its own shard of the shared dataset
+        env_kwargs = dict(env_kwargs, storage_kwargs=dict(env_kwargs.get('storage_kwargs') or {}, shard=shard))
+    env = None
+    try:
+        env = BetseEnv(
+            config_path=config_path,
+            working_dir=os.path.join(workdir, "config"),
+            storage_path=storage_path or os.path.join(workdir, "data"),
+            snapshot_cache=SnapshotCache(snapshot_cache_dir) if snapshot_cache_dir else None,
+            **env_kwargs,
+        )
+        remote.send((True, (env.observation_space, env.action_space)))
+        needs_reset = False
+        while True:
+            command, data = remote.recv()
+            if command == "reset":
+                seed, options = data
+                observation, info = env.reset(seed=seed, options=options)
+                needs_reset = False
+                remote.send((True, (observation, info)))
+            elif command == "step":
+                final = None
+                if needs_reset:
+                    observation, info = env.reset()
+                    reward, terminated, truncated = 0.0, False, False
+                    needs_reset = False
+                else:
+                    observation, reward, terminated, truncated, info = env.step(data)
+                    if terminated or truncated:
+                        if autoreset_mode == AutoresetMode.NEXT_STEP:
+                            needs_reset = True
+                        elif autoreset_mode == AutoresetMode.SAME_STEP:
+                            final = (observation, info)
+                            observation, info = env.reset()
+                remote.send((True, (observation, reward, terminated, truncated, info, final)))
+            elif command == "close":
+                remote.send((True, None))
+                break
+            else:
+                raise RuntimeError(f"Unknown command '{command}'.")
+    except (KeyboardInterrupt, Exception) as e:
+        remote.send((False, f"{type(e).__name__}: {e}"))
+    finally:
+        if env is not None:
+            env.close()
+        remote.close()
+
+
+class BetseVectorEnv(VectorEnv):
+    """
+    Runs several BetseEnv instances in worker processes and steps them in parallel.
+
+    Each worker gets its own scratch directory (with a private copy of the config directory and its
+    own data/ folder), so BETSE runs never share temp.yaml or output folders. Passing a
+    snapshot_cache_dir lets all workers share one SnapshotCache of the post-init state; env_kwargs are
+    forwarded to every BetseEnv.
+
+    With storage_path set, worker i writes its transitions to the shard dataset.shard-i.h5 there
+    instead of its scratch data/ folder, and close() indexes the shards as storage_path/dataset.h5
+    (see data_storage.merge_shards). A 'filename' in env_kwargs['storage_kwargs'] replaces dataset.h5.
+    """
+    metadata = {'render.modes': [], 'autoreset_mode': AutoresetMode.NEXT_STEP}
+
+    def __init__(self, config_path='config/betse_config.yaml', num_envs=None, scratch_dir=None,
+                 blas_threads=1, autoreset_mode=AutoresetMode.NEXT_STEP, context='spawn', snapshot_cache_dir=None,
+                 env_kwargs=None, storage_path=None):
+        if num_envs is None:
+            num_envs = os.cpu_count() or 1
+        self.num_envs = num_envs
+        self.autoreset_mode = AutoresetMode(autoreset_mode)
+        self.metadata = dict(self.metadata, autoreset_mode=self.autoreset_mode)
+
+        # only remove scratch space on close if we created it
+        self._owns_scratch = scratch_dir is None
+        # absolute, since workers chdir into their directory before using it
+        self.scratch_dir = os.path.abspath(scratch_dir) if scratch_dir is not None else \
+            tempfile.mkdtemp(prefix="betse_vec_")
+        self.worker_dirs = [os.path.join(self.scratch_dir, f"worker_{i}") for i in range(num_envs)]
+        self.storage_path = storage_path and os.path.abspath(storage_path)
+        self.storage_filename = ((env_kwargs or {}).get('storage_kwargs') or {}).get('filename', 'dataset.h5')
+
+        ctx = mp.get_context(context)
+        self.remotes, self.processes = [], []
+        with limit_blas_threads(blas_threads):
+            for shard, workdir in enumerate(self.worker_dirs):
+                os.makedirs(workdir, exist_ok=True)
+                parent_remote, child_remote = ctx.Pipe()
+                process = ctx.Process(
+                    target=_worker,
+                    args=(child_remote, parent_remote, os.path.abspath(config_path), workdir, self.autoreset_mode,
+                          snapshot_cache_dir and os.path.abspath(snapshot_cache_dir), env_kwargs or {},
+                          self.storage_path, shard),
+                    daemon=True,
+                )
+                process.start()
+                child_remote.close()
+                self.remotes.append(parent_remote)
+                self.processes.append(process)
+
+        spaces = self._receive_all()
+        self.single_observation_space, self.single_action_space = spaces[0]
+        self.observation_space = batch_space(self.single_observation_space, num_envs)
+        self.action_space = batch_space(self.single_action_space, num_envs)
+
+    def _receive_all(self):
+        results = [remote.recv() for remote in self.remotes]
+        errors = [f"worker {i}: {payload}" for i, (success, payload) in enumerate(results) if not success]
+        if errors:
+            raise RuntimeError("BetseVectorEnv worker failed:\n" + "\n".join(errors))
+        return [payload for _, payload in results]
+
+    def _batch_observations(self, observations):
+        return np.stack(observations).astype(self.single_observation_space.dtype, copy=False)
+
+    def reset(self, *, seed=None, options=None):
+        if seed is None or isinstance(seed, int):
+            seeds = [None if seed is None else seed + i for i in range(self.num_envs)]
+        else:
+            seeds = list(seed)
+        for remote, env_seed in zip(self.remotes, seeds):
+            remote.send(("reset", (env_seed, options)))
+
+        observations, infos = [], {}
+        for i, (observation, info) in enumerate(self._receive_all()):
+            observations.append(observation)
+            infos = self._add_info(infos, info, i)
+        return self._batch_observations(observations), infos
+
+    def step(self, actions):
+        for remote, action in zip(self.remotes, actions):
+            remote.send(("step", action))
+
+        observations, infos = [], {}
+        rewards = np.zeros(self.num_envs, dtype=np.float64)
+        terminations = np.zeros(self.num_envs, dtype=np.bool_)
+        truncations = np.zeros(self.num_envs, dtype=np.bool_)
+        for i, (observation, reward, terminated, truncated, info, final) in enumerate(self._receive_all()):
+            observations.append(observation)
+            rewards[i], terminations[i], truncations[i] = reward, terminated, truncated
+            if final is not None:
+                infos = self._add_info(infos, {"final_obs": final[0], "final_info": final[1]}, i)
+            infos = self._add_info(infos, info, i)
+        return self._batch_observations(observations), rewards, terminations, truncations, infos
+
+    def close_extras(self, **kwargs):
+        for remote, process in zip(self.remotes, self.processes):
+            if process.is_alive():
+                try:
+                    remote.send(("close", None))
+                    remote.recv()
+                except (BrokenPipeError, EOFError):
+                    pass
+            remote.close()
+        for process in self.processes:
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
+        if self.storage_path:
+            shard_paths = [os.path.join(self.storage_path, shard_filename(self.storage_filename, shard))
+                           for shard in range(self.num_envs)]
+            shard_paths = [path for path in shard_paths if os.path.exists(path)]
+            if shard_paths:
+                merge_shards(shard_paths, os.path.join(self.storage_path, self.storage_filename))
+        if self._owns_scratch:
+            shutil.rmtree(self.scratch_dir, ignore_errors=True)
@@ -0,0 +1,186 @@
+# gym_betse/envs/koopman_surrogate_env.py
+
+import os
+
+import h5py
+import numpy as np
+import torch
+from gymnasium import spaces
+from gymnasium.vector import VectorEnv
+from gymnasium.vector.utils import batch_space
+from gymnasium.vector.vector_env import AutoresetMode
+
+from koopman.dataset import KoopmanDataset
+from koopman.edmd import EDMDStatistics
+from koopman.models import KoopmanModel
+from koopman.train_koopman import custom_collate_fn
+from koopman.utils import koopman_powers
+
+
+class KoopmanSurrogateEnv(VectorEnv):
+    """
+    Steps num_envs copies of a BetseEnv-like environment with a trained KoopmanModel instead of BETSE.
+
+    The lifted state of every environment is kept in one (num_envs, lifted_size) tensor and advanced
+    with one operator per action, so a step of all environments is a single batched matmul followed
+    by one decoder call. The operators start as the model's K and can be refitted per action from
+    the real transitions in dataset_path with recalibrate() (or automatically every
+    recalibration_interval steps), which only reads transitions stored since the last call.
+
+    Episodes are truncated after max_episode_steps and reset on the following step
+    (AutoresetMode.NEXT_STEP), like BetseVectorEnv.
+    """
+    metadata = {'render.modes': [], 'autoreset_mode': AutoresetMode.NEXT_STEP}
+
+    def __init__(self, model_path='models/koopman_model.pth', num_envs=1024, num_actions=5, state_size=None,
+                 lifted_size=None, dataset_path='data/dataset.h5', initial_states=None, steps_per_action=1,
+                 max_episode_steps=100, recalibration_interval=None, reward_fn=None, device='cpu',
+                 as_tensor=False):
+        """
+        :param model_path: state_dict saved by train_koopman_model. state_size and lifted_size are read
+            from it when not given; without a file the model keeps its random initialization.
+        :param initial_states: (state_size,) or (M, state_size) states episodes start from, sampled
+            uniformly. Defaults to the stored states in dataset_path, or zeros.
+        :param steps_per_action: Koopman steps taken per env step, i.e. the operator is K_a^steps_per_action.
+        :param reward_fn: Callable mapping a (num_envs, state_size) tensor of observations to rewards,
+            e.g. TargetReward(...).state_reward. Defaults to zero reward, as BetseEnv.compute_reward.
+        :param as_tensor: Return torch tensors on device instead of numpy arrays.
+        """
+        self.device = torch.device(device)
+        state_dict = None
+        if model_path is not None and os.path.exists(model_path):
+            state_dict = torch.load(model_path, map_location=self.device)
+            lifted_size, state_size = state_dict['K'].shape[0], state_dict['encoder.0.weight'].shape[1]
+        if state_size is None or lifted_size is None:
+            raise ValueError(f"No model at '{model_path}', state_size and lifted_size must be given.")
+        self.model = KoopmanModel(state_size=state_size, lifted_size=lifted_size).to(self.device)
+        if state_dict is not None:
+            self.model.load_state_dict(state_dict)
+        self.model.eval()
+
+        self.num_envs = num_envs
+        self.num_actions = num_actions
+        self.state_size = state_size
+        self.lifted_size = lifted_size
+        self.dataset_path = dataset_path
+        self.steps_per_action = steps_per_action
+        self.max_episode_steps = max_episode_steps
+        self.recalibration_interval = recalibration_interval
+        self.reward_fn = reward_fn
+        self.as_tensor = as_tensor
+
+        self.single_action_space = spaces.Discrete(num_actions)
+        self.single_observation_space = spaces.Box(low=-np.inf, high=np.inf, shape=(state_size,), dtype=np.float32)
+        self.action_space = batch_space(self.single_action_space, num_envs)
+        self.observation_space = batch_space(self.single_observation_space, num_envs)
+
+        # one K per action, all starting from the trained operator
+        self.operators = self.model.K.detach().unsqueeze(0).repeat(num_actions, 1, 1)
+        self.statistics = [EDMDStatistics(lifted_size, device=self.device) for _ in range(num_actions)]
+        self.calibrated_transitions = 0
+        self._update_step_operators()
+
+        if initial_states is None:
+            initial_states = self._stored_states()
+        self.initial_states = torch.as_tensor(np.atleast_2d(initial_states), dtype=torch.float32, device=self.device)
+
+        self.lifted = torch.zeros(num_envs, lifted_size, device=self.device)
+        self.episode_steps = torch.zeros(num_envs, dtype=torch.int64, device=self.device)
+        self._needs_reset = torch.zeros(num_envs, dtype=torch.bool, device=self.device)
+        self._generator = torch.Generator(device=self.device)
+        self.total_steps = 0
+
+    def _stored_states(self):
+        if self.dataset_path is not None and os.path.exists(self.dataset_path):
+            with h5py.File(self.dataset_path, 'r') as h5file:
+                transitions = h5file['transitions']
+                length = int(transitions.attrs.get('length', transitions['state'].shape[0]))
+                if length:
+                    return transitions['state'][:length]
+        return np.zeros(self.state_size, dtype=np.float32)
+
+    def _update_step_operators(self):
+        # K_a^steps_per_action, applied to every env in one einsum
+        self.step_operators = torch.stack([koopman_powers(K, self.steps_per_action)[-1] for K in self.operators])
+
+    @torch.no_grad()
+    def _reset_envs(self, mask):
+        count = int(mask.sum())
+        if count == 0:
+            return
+        rows = torch.randint(len(self.initial_states), (count,), generator=self._generator, device=self.device)
+        self.lifted[mask] = self.model(self.initial_states[rows])
+        self.episode_steps[mask] = 0
+        self._needs_reset[mask] = False
+
+    def _output(self, tensor):
+        return tensor if self.as_tensor else tensor.cpu().numpy()
+
+    @torch.no_grad()
+    def reset(self, *, seed=None, options=None):
+        super().reset(seed=seed, options=options)
+        if seed is not None:
+            self._generator.manual_seed(seed)
+        else:
+            self._generator.manual_seed(int(self.np_random.integers(2 ** 63 - 1)))
+        self._reset_envs(torch.ones(self.num_envs, dtype=torch.bool, device=self.device))
+        return self._output(self.model.reconstruct(self.lifted)), {}
+
+    @torch.no_grad()
+    def step(self, actions):
+        actions = torch.as_tensor(actions, dtype=torch.int64, device=self.device)
+        resetting = self._needs_reset.clone()
+        # (num_envs, num_actions, lifted) -> pick each env's action
+        candidates = torch.einsum('nl,alm->nam', self.lifted, self.step_operators)
+        advanced = candidates[torch.arange(self.num_envs, device=self.device), actions]
+        self.lifted = torch.where(resetting.unsqueeze(1), self.lifted, advanced)
+        self.episode_steps += 1
+        self._reset_envs(resetting)
+
+        observations = self.model.reconstruct(self.lifted)
+        if self.reward_fn is not None:
+            rewards = torch.as_tensor(self.reward_fn(observations), dtype=torch.float32, device=self.device)
+        else:
+            rewards = torch.zeros(self.num_envs, device=self.device)
+        rewards = torch.where(resetting, torch.zeros_like(rewards), rewards)
+        terminations = torch.zeros(self.num_envs, dtype=torch.bool, device=self.device)
+        truncations = (self.episode_steps >= self.max_episode_steps) & ~resetting
+        self._needs_reset = terminations | truncations
+
+        self.total_steps += 1
+        if self.recalibration_interval and self.total_steps % self.recalibration_interval == 0:
+            self.recalibrate()
+        return (self._output(observations), self._output(rewards), self._output(terminations),
+                self._output(truncations), {})
+
+    @torch.no_grad()
+    def recalibrate(self, dataset_path=None, batch_size=1024, regularization=1e-8, min_pairs=None):
+        """
+        Refits the operator of every action from the real transitions stored since the last call.
+
+        An action keeps its current operator until it has at least min_pairs one-step pairs
+        (lifted_size by default), so K_a is never fitted from an underdetermined system.
+
+        :return: Number of new transitions read.
+        """
+        dataset_path = dataset_path if dataset_path is not None else self.dataset_path
+        if dataset_path is None or not os.path.exists(dataset_path):
+            return 0
+        min_pairs = min_pairs if min_pairs is not None else self.lifted_size
+        dataset = KoopmanDataset(dataset_path)
+        start = self.calibrated_transitions
+        with h5py.File(dataset_path, 'r') as h5file:
+            actions = h5file['transitions']['action'][start:len(dataset)]
+        for action in range(self.num_actions):
+            indices = np.flatnonzero(actions == action) + start
+            for i in range(0, len(indices), batch_size):
+                batch = custom_collate_fn(dataset.__getitems__(indices[i:i + batch_size]))
+                self.statistics[action].update_from_batch(self.model, batch['state'].to(self.device),
+                                                          batch['next_states'].to(self.device),
+                                                          batch['seq_len'].to(self.device))
+            if self.statistics[action].num_pairs >= min_pairs:
+                self.operators[action] = self.statistics[action].solve(regularization).to(self.operators)
+        dataset.close()
+        self.calibrated_transitions = start + len(actions)
+        self._update_step_operators()
+        return len(actions)
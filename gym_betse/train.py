@@ -1,11 +1,26 @@
 # gym_betse/train.py
 
-import gymnasium as gym
+import argparse
+import functools
+import os
+import queue
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import torch
+import torch.multiprocessing as mp
 from gym_betse.envs import BetseEnv
+from gym_betse.envs.betse_vector_env import limit_blas_threads
 from gym_betse.agents.dqn_agent import DQNAgent
 
-def main():
-    env = BetseEnv(config_path='config/betse_config.yaml')
+def main(config_path='config/betse_config.yaml', snapshot_cache_dir=None, result_cache_dir=None):
+    from gym_betse.utils.snapshot_cache import SnapshotCache
+    from gym_betse.utils.result_cache import ResultCache
+    env = BetseEnv(config_path=config_path,
+                   snapshot_cache=SnapshotCache(snapshot_cache_dir) if snapshot_cache_dir else None,
+                   simulation_kwargs={'result_cache': ResultCache(result_cache_dir)} if result_cache_dir else None)
     agent = DQNAgent(
         state_size=env.observation_space.shape[0],
         action_size=env.action_space.n
@@ -32,7 +47,217 @@ def main():
             agent.save(f"models/dqn_agent_{episode+1}.pth")
 
     env.close()
+    if env.cache_stats() is not None:
+        print(f"result cache: {env.cache_stats()}")
+
+
+def make_betse_env(config_path, snapshot_cache_dir=None, result_cache_dir=None, **env_kwargs):
+    """
+    Builds a BetseEnv whose config copy, data/ folder and logs live in the current directory, which
+    the actor sets to its own scratch directory (as BetseVectorEnv does for its workers).
+
+    :param result_cache_dir: Directory of a ResultCache shared by all actors, so a (state, action)
+        pair simulated by one of them is not simulated again by any.
+    """
+    from gym_betse.utils.snapshot_cache import SnapshotCache
+    from gym_betse.utils.result_cache import ResultCache
+    if result_cache_dir:
+        env_kwargs['simulation_kwargs'] = dict(env_kwargs.get('simulation_kwargs') or {},
+                                               result_cache=ResultCache(result_cache_dir))
+    workdir = os.getcwd()
+    return BetseEnv(
+        config_path=config_path,
+        working_dir=os.path.join(workdir, "config"),
+        storage_path=os.path.join(workdir, "data"),
+        snapshot_cache=SnapshotCache(snapshot_cache_dir) if snapshot_cache_dir else None,
+        **env_kwargs,
+    )
+
+
+def actor_epsilon(actor_id, num_actors, base=0.4, alpha=7.0):
+    """
+    Fixed exploration rate of one actor, spread from base down to base ** (1 + alpha) across actors
+    (Horgan et al., 2018), so the pool always mixes exploring and exploiting actors.
+    """
+    if num_actors == 1:
+        return base
+    return base ** (1 + alpha * actor_id / (num_actors - 1))
+
+
+def _actor(actor_id, env_fn, workdir, shared_model, weights_version, weights_lock, transitions, stop_event,
+           epsilon, max_steps_per_episode, send_every, seed):
+    """
+    Steps one environment with a local copy of the learner's network and pushes transitions to the
+    learner in chunks of send_every as (states, actions, rewards, next_states, dones) arrays.
+    """
+    os.chdir(workdir)
+    torch.set_num_threads(1)
+    np.random.seed(seed)
+    env = env_fn()
+    agent = DQNAgent(env.observation_space.shape[0], env.action_space.n, buffer_size=1)
+    agent.epsilon = epsilon
+    local_version = -1
+    chunk = []
+
+    def send():
+        if chunk:
+            transitions.put(tuple(np.array(field) for field in zip(*chunk)))
+            chunk.clear()
+
+    try:
+        while not stop_event.is_set():
+            state, _ = env.reset(seed=seed)
+            seed = None
+            for _ in range(max_steps_per_episode):
+                if weights_version.value != local_version:
+                    with weights_lock:
+                        local_version = weights_version.value
+                        agent.model.load_state_dict(shared_model.state_dict())
+                action = agent.act(state)
+                next_state, reward, terminated, truncated, _ = env.step(action)
+                chunk.append((state, action, reward, next_state, terminated))
+                if len(chunk) >= send_every:
+                    send()
+                state = next_state
+                if terminated or truncated or stop_event.is_set():
+                    break
+            send()
+    finally:
+        send()
+        env.close()
+
+
+def train_async(env_fn, num_actors=2, total_updates=10000, sync_every=100, max_steps_per_episode=100,
+                send_every=1, min_replay_size=None, scratch_dir=None, log_every=10.0, agent_kwargs=None,
+                state_size=None, action_size=None, context='spawn', blas_threads=1, seed=0):
+    """
+    Actor-learner training: num_actors processes each step their own environment and stream
+    transitions to this (learner) process, which keeps updating a DQNAgent and publishes its weights
+    to the actors every sync_every updates. Neither side waits on the other, so env steps/s scale
+    with the number of actors while the learner trains at its own rate.
+
+    :param env_fn: Picklable callable returning a new environment; called inside each actor after it
+        changed into its own scratch directory (see make_betse_env).
+    :param state_size: Observation size, probed from a throwaway env_fn() when not given (together
+        with action_size); passing both avoids that extra BETSE init.
+    :param min_replay_size: Transitions collected before the learner starts updating. Defaults to
+        the agent's batch size.
+    :return: (agent, stats) where stats holds the env step and update counts and rates.
+    """
+    ctx = mp.get_context(context)
+    owns_scratch = scratch_dir is None
+    scratch_dir = scratch_dir if scratch_dir is not None else tempfile.mkdtemp(prefix="betse_actors_")
+
+    if state_size is None or action_size is None:
+        # the learner needs the spaces before actors start, a throwaway env in the scratch dir provides them
+        probe_dir = os.path.join(scratch_dir, "probe")
+        os.makedirs(probe_dir, exist_ok=True)
+        cwd = os.getcwd()
+        os.chdir(probe_dir)
+        try:
+            env = env_fn()
+            state_size, action_size = env.observation_space.shape[0], env.action_space.n
+            env.close()
+        finally:
+            os.chdir(cwd)
+
+    agent = DQNAgent(state_size, action_size, **(agent_kwargs or {}))
+    min_replay_size = min_replay_size if min_replay_size is not None else agent.batch_size
+    shared_model = agent._build_model()
+    shared_model.load_state_dict(agent.model.state_dict())
+    shared_model.share_memory()
+    weights_version = ctx.Value('l', 0)
+    weights_lock = ctx.Lock()
+    transitions = ctx.Queue(maxsize=1024)
+    stop_event = ctx.Event()
+
+    processes = []
+    with limit_blas_threads(blas_threads):
+        for actor_id in range(num_actors):
+            workdir = os.path.join(scratch_dir, f"actor_{actor_id}")
+            os.makedirs(workdir, exist_ok=True)
+            process = ctx.Process(
+                target=_actor,
+                args=(actor_id, env_fn, workdir, shared_model, weights_version, weights_lock, transitions,
+                      stop_event, actor_epsilon(actor_id, num_actors), max_steps_per_episode, send_every,
+                      seed + actor_id),
+                daemon=True,
+            )
+            process.start()
+            processes.append(process)
+
+    env_steps = updates = 0
+    start = last_log = time.perf_counter()
+    try:
+        while updates < total_updates:
+            # drain whatever the actors produced, block briefly only while the replay is too small
+            try:
+                while True:
+                    if len(agent.memory) < min_replay_size:
+                        batch = transitions.get(timeout=0.1)
+                    else:
+                        batch = transitions.get_nowait()
+                    agent.memory.add_batch(*batch)
+                    env_steps += len(batch[1])
+            except queue.Empty:
+                pass
+            if not any(process.is_alive() for process in processes):
+                raise RuntimeError("All actor processes exited.")
+            if len(agent.memory) < min_replay_size:
+                continue
+
+            agent.replay()
+            updates += 1
+            if updates % sync_every == 0:
+                with weights_lock:
+                    shared_model.load_state_dict(agent.model.state_dict())
+                    weights_version.value += 1
+            now = time.perf_counter()
+            if log_every and now - last_log >= log_every:
+                elapsed = now - start
+                print(f"{env_steps} env steps ({env_steps / elapsed:.1f}/s), "
+                      f"{updates} updates ({updates / elapsed:.1f}/s)")
+                last_log = now
+    finally:
+        stop_event.set()
+        # actors may block on a full queue, keep draining until they are gone
+        deadline = time.perf_counter() + 30
+        while any(process.is_alive() for process in processes) and time.perf_counter() < deadline:
+            try:
+                transitions.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        for process in processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+        if owns_scratch:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    elapsed = time.perf_counter() - start
+    stats = {'env_steps': env_steps, 'updates': updates, 'seconds': elapsed,
+             'env_steps_per_sec': env_steps / elapsed, 'updates_per_sec': updates / elapsed}
+    return agent, stats
+
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Train a DQN agent on BetseEnv.")
+    parser.add_argument("--config", default="config/betse_config.yaml")
+    parser.add_argument("--actors", type=int, default=0,
+                        help="number of actor processes; 0 runs the single-threaded loop")
+    parser.add_argument("--updates", type=int, default=10000)
+    parser.add_argument("--sync-every", type=int, default=100)
+    parser.add_argument("--snapshot-cache", default=None)
+    parser.add_argument("--result-cache", default=None, help="directory memoizing simulated (state, action) pairs")
+    args = parser.parse_args()
 
+    if args.actors:
+        env_fn = functools.partial(make_betse_env, os.path.abspath(args.config),
+                                   snapshot_cache_dir=args.snapshot_cache and os.path.abspath(args.snapshot_cache),
+                                   result_cache_dir=args.result_cache and os.path.abspath(args.result_cache))
+        agent, stats = train_async(env_fn, num_actors=args.actors, total_updates=args.updates,
+                                   sync_every=args.sync_every)
+        print(stats)
+        agent.save("models/dqn_agent_async.pth")
+    else:
+        main(args.config, snapshot_cache_dir=args.snapshot_cache, result_cache_dir=args.result_cache)
@@ -1,7 +1,25 @@
 # gym_betse/utils/__init__.py
 
-from gym_betse.utils.betse_interface import BetseSimulation
-from gym_betse.utils.data_storage import DataStorage
+import importlib
 
-__all__ = ['BetseSimulation', 'DataStorage']
+# public name -> defining module, imported on first access so that e.g. yaml_friend does not load BETSE
+_MODULES = {
+    'BetseSimulation': 'gym_betse.utils.betse_interface',
+    'DataStorage': 'gym_betse.utils.data_storage',
+    'Profiler': 'gym_betse.utils.profiler',
+    'TargetReward': 'gym_betse.utils.reward',
+}
 
+__all__ = ['BetseSimulation', 'DataStorage', 'Profiler', 'TargetReward']
+
+
+def __getattr__(name):
+    if name not in _MODULES:
+        raise AttributeError(f"module 'gym_betse.utils' has no attribute '{name}'")
+    value = getattr(importlib.import_module(_MODULES[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
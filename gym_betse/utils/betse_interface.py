@@ -1,10 +1,32 @@
 # gym_betse/utils/betse_interface.py
 
-from betse.science.wrapper import BetseWrapper
-import yaml_friend as betseyaml
+import hashlib
+import importlib
+import os
+import numpy as np
+from gym_betse.utils import yaml_friend as betseyaml
+from gym_betse.utils.workspace import create_workspace
+from gym_betse.utils.profiler import Profiler
 import shutil
-from matplotlib import pyplot as plt
 default_log = "config/experiment_log.txt"
+
+
+# Simulator backends BetseSimulation(wrapper_cls=...) accepts by name, as 'module:class' so that BETSE
+# (and the matplotlib it loads) is only imported by the processes that simulate with it
+SIMULATOR_BACKENDS = {
+    'betse': 'gym_betse.utils.betse_wrapper:ContinuableBetseWrapper',
+    'reduced_order': 'gym_betse.utils.reduced_order:ReducedOrderWrapper',
+}
+
+
+def simulator_backend(name):
+    """
+    :return: The wrapper class registered as name in SIMULATOR_BACKENDS.
+    """
+    module, _, cls = SIMULATOR_BACKENDS[name].partition(':')
+    return getattr(importlib.import_module(module), cls)
+
+
 class BetseSimulation:
     """
     Interface class for BETSE simulations.
@@ -14,13 +36,54 @@ class BetseSimulation:
     """
     config_path: str
 
-    def __init__(self, config_path, initial_conditions=None, sim_exists=False, goal_state=None):
+    def __init__(self, config_path, initial_conditions=None, sim_exists=False, goal_state=None, working_dir=None,
+                 snapshot_cache=None, continuation=False, params_path=None, profiler=None,
+                 wrapper_cls=None, action_values=None, result_cache=None, render_kwargs=None):
+        # with a working_dir, everything BETSE reads and writes lives in a private copy of the config dir
+        self.working_dir = working_dir
+        if working_dir is not None:
+            config_path = create_workspace(config_path, working_dir)
+            self.log_path = os.path.join(os.path.abspath(working_dir), "experiment_log.txt")
+        else:
+            self.log_path = default_log
         self.config_path = config_path
+        # optional SnapshotCache, restores the post-init state instead of re-running seed + init
+        self.snapshot_cache = snapshot_cache
+        # keep sim/cells in memory between steps and only pickle them on persist()
+        self.continuation = continuation
+        # times the BETSE phases, disabled (no-op) unless a Profiler is passed in
+        self.profiler = profiler if profiler is not None else Profiler(enabled=False)
+        # BetseWrapper-like class driving the phases, or the name of one in SIMULATOR_BACKENDS
+        if wrapper_cls is None or isinstance(wrapper_cls, str):
+            wrapper_cls = simulator_backend(wrapper_cls or 'betse')
+        self.wrapper_cls = wrapper_cls
+        # optional parameter vector per discrete action, so Discrete(len(action_values)) indices can be applied
+        self.action_values = action_values
+        # optional ResultCache, serves the outcome of a (state, parameters) pair simulated before
+        self.result_cache = result_cache
+        # rendering: VoltageRenderer options, built on the first render and reused for every frame
+        self.render_kwargs = render_kwargs or {}
+        self._renderer = None
+        self._window = None
+        self._recorder = None
+        self._namespace = None
+        self._cached_history = None
+        # bumped for every init/run, so get_observation_history knows when vm_ave_time was replaced
+        self._run_id = 0
+        # actions served from the cache that the simulator itself has not run yet
+        self._unsimulated = []
+        self.last_step_cached = False
         self.max_steps_per_action = 10  # Example value
         self.max_seq_length = 50  # Example value
         self.model = None
         self.load_simulation()
-        self.parameters = betseyaml.get_param_list(self.config_path)
+        # parameter paths the action vector maps onto, one per line (params.txt next to the config by default)
+        if params_path is None:
+            params_path = os.path.join(os.path.dirname(os.path.abspath(self.config_path)), "params.txt")
+        self.parameters = betseyaml.get_param_list(params_path)
+        self.param_accessor = None
+        self._history = None
+        self._history_run = None
         self.action_log = [] # 2d array, each row is param values at beginning of each sim step
         self.steps_completed = 0
 
@@ -36,8 +99,11 @@ class BetseSimulation:
             self.curr_action = None
 
         # create working config
-        shutil.copy(config_path, f"temp.yaml")
-        self.working_config = "temp.yaml"
+        if working_dir is not None:
+            self.working_config = os.path.join(working_dir, "temp.yaml")
+        else:
+            self.working_config = "temp.yaml"
+        shutil.copy(config_path, self.working_config)
 
         # has simulation has already advanced to a certain point?
         self.sim_exists = sim_exists
@@ -45,16 +111,33 @@ class BetseSimulation:
 
     def load_simulation(self):
         if self.model is None:
-            self.model = BetseWrapper(self.config_path, log_filename=default_log, log_level="NONE")
-            self.model.run_seed(verbose=True)
-            self.model.run_init(verbose=True)
+            self.seed_and_init()
 
     def reset(self):
-        self.model = BetseWrapper(self.config_path, log_filename=default_log, log_level="NONE")
-        self.model.run_seed(verbose=True)
-        self.model.run_init(verbose=True)
+        self.seed_and_init()
+        self._cached_history = None
+        self._unsimulated = []
+        self.sim_exists = False
         # TODO: probably ought to delete all folders that BETSE generates here
 
+    def seed_and_init(self):
+        self._run_id += 1
+        self.model = self.wrapper_cls(self.config_path, log_filename=self.log_path, log_level="NONE")
+        # backends that save beside BETSE's files (reduced_order) name them with a suffix
+        suffix = getattr(self.wrapper_cls, 'artifact_suffix', '')
+        if self.snapshot_cache is not None:
+            if self.snapshot_cache.restore(self.config_path, suffix, self._backend_name()):
+                with self.profiler.section('load_init'):
+                    self.model.load_init(verbose=True)
+                return
+            self.snapshot_cache.release(self.config_path, suffix)
+        with self.profiler.section('run_seed'):
+            self.model.run_seed(verbose=True)
+        with self.profiler.section('run_init'):
+            self.model.run_init(verbose=True)
+        if self.snapshot_cache is not None:
+            self.snapshot_cache.store(self.config_path, suffix, self._backend_name())
+
     # action is a vector of parameters given to us by RL- need to determine sim parameters,
     # decide order, and make sure it is consistent across all code
     def apply_action(self, action):
@@ -62,23 +145,103 @@ class BetseSimulation:
         #    - see also data saving functionality in betse_env
         # Apply action to the simulation
         # edits the config file in-place, no need to return a new file
+        if self.action_values is not None and np.ndim(action) == 0:
+            action = self.action_values[int(action)]
         self.curr_action = action
         self.action_log.append(self.curr_action)
-        betseyaml.update_yaml(self.working_config, self.parameters, self.curr_action, write_path=self.working_config)
+        self._write_action(self.curr_action)
+
+    def _write_action(self, values):
+        if self.param_accessor is None:
+            # parse the working config and resolve every parameter path once
+            self.param_accessor = betseyaml.ParamAccessor(self.working_config, self.parameters)
+        with self.profiler.section('update_yaml'):
+            if self.param_accessor.set_values(values):
+                self.param_accessor.write(self.working_config)
 
 
     def step(self):
+        self._advance()
+        if self._recorder is not None:
+            self._recorder.capture(lambda: self.render('rgb_array'))
+
+    def _advance(self):
         # Advance simulation
+        if self.result_cache is None:
+            self._simulate()
+            return
+        # get_observation has its own profiler section
+        observation = self.get_observation()
+        with self.profiler.section('result_cache'):
+            key = self.result_cache.make_key(self._cache_namespace(), observation, self.curr_action)
+            history = self.result_cache.get(key)
+        self.last_step_cached = history is not None
+        if history is not None:
+            # the simulator catches up on these actions only if a later step misses the cache
+            self._cached_history = history
+            self._unsimulated.append(self.curr_action)
+            self.sim_exists = True
+            self.steps_completed += 1
+            return
+        self._catch_up()
+        self._simulate()
+        self.result_cache.put(key, self.get_observation_history())
+
+    def _backend_name(self):
+        return f"{self.wrapper_cls.__module__}.{self.wrapper_cls.__qualname__}"
+
+    def _cache_namespace(self):
+        # everything besides the start state and the action that determines a run's outcome
+        if self._namespace is None:
+            digest = hashlib.sha256(self._backend_name().encode())
+            with open(self.config_path, 'rb') as file:
+                digest.update(file.read())
+            digest.update("\n".join(self.parameters).encode())
+            self._namespace = digest.hexdigest()
+        return self._namespace
+
+    def _catch_up(self):
+        """
+        Runs the actions served from the result cache on the simulator, so its state matches the
+        observations handed out.
+        """
+        self._cached_history = None
+        if not self._unsimulated:
+            return
+        unsimulated, self._unsimulated = self._unsimulated, []
+        steps_completed = self.steps_completed
+        for values in unsimulated:
+            self._write_action(values)
+            self._simulate()
+        self.steps_completed = steps_completed
+        self._write_action(self.curr_action)
+
+    def _simulate(self):
         # run the next simulation with whatever the config file looks like right now
-        self.model = BetseWrapper(self.working_config, log_filename=default_log, log_level="NONE")
-        #TODO: Test to see if you need to load init here
-        try:
-            self.model.load_sim(verbose=True)
-        except:
-            self.model.run_sim(verbose=True)
+        self._run_id += 1
+        if self.continuation:
+            # picks up from the in-memory state of the last init/step, no pickles involved
+            with self.profiler.section('run_sim'):
+                self.model.continue_sim(self.working_config, verbose=True)
+        else:
+            self.model = self.wrapper_cls(self.working_config, log_filename=self.log_path, log_level="NONE")
+            #TODO: Test to see if you need to load init here
+            # load_sim only logs a warning when there is no sim file yet, so check it produced a phase
+            with self.profiler.section('load_sim'):
+                self.model.load_sim(verbose=True)
+            if not hasattr(self.model, "phase"):
+                with self.profiler.section('run_sim'):
+                    self.model.run_sim(verbose=True)
         self.sim_exists = True
         self.steps_completed += 1
 
+    def persist(self):
+        # write the in-memory simulation to the sim file (continuation mode only, the other mode already did)
+        self._catch_up()
+        if self.continuation and self.sim_exists:
+            with self.profiler.section('save_sim'):
+                self.model.save_sim()
+
 
     def get_observation(self):
         # important to know here:
@@ -105,18 +268,50 @@ class BetseSimulation:
         and subject to some experimentation
         """
         # Get current state (Vmem)
-        observation = self.model.phase.sim.vm_ave  # Replace with actual observation
+        with self.profiler.section('get_observation'):
+            if self._cached_history is not None:
+                return self._cached_history[-1]
+            observation = self.model.phase.sim.vm_ave  # Replace with actual observation
         return observation
 
+    def get_observation_history(self):
+        """
+        :return: vm_ave_time of the last run as a (sampled_steps, cells) array. BETSE keeps it as a
+        list of per-step arrays, so it is stacked once per run and reused afterwards.
+        """
+        if self._cached_history is not None:
+            return self._cached_history
+        if self._history_run != self._run_id:
+            self._history = np.asarray(self.model.phase.sim.vm_ave_time)
+            self._history_run = self._run_id
+        return self._history
+
+    def get_observation_sequence(self, stride=1, window=None):
+        """
+        Samples a sequence of observations out of the time series recorded during the last run.
+
+        :param stride: Keep every stride-th sampled time step, counting back from the last one.
+        :param window: Keep at most this many observations (the most recent ones).
+        :return: View into get_observation_history() of shape (seq_len, cells), ending at the last sample.
+        """
+        with self.profiler.section('get_observation'):
+            history = self.get_observation_history()
+            sequence = history[(len(history) - 1) % stride::stride]
+            if window is not None:
+                sequence = sequence[-window:]
+        return sequence
+
 
     #TODO: With our toy model with fixed action count, this function is not necessary yet
     #TODO: Also, where is my
     def get_num_actions(self) -> int:
+        if self.action_values is not None:
+            return len(self.action_values)
         num_actions = 5  # Example value (number of discrete actions we allow the agent to take)
         return num_actions
 
     def get_observation_shape(self) -> int:
-        shape = self.get_observation().shape() # Example for 7-cell system
+        shape = self.get_observation().shape # Example for 7-cell system
         return shape
 
     def is_done(self) -> bool:
@@ -127,34 +322,66 @@ class BetseSimulation:
         return done
 
     def render(self, mode='human'):
-        # Implement rendering if needed
-        # optional: call betse's plot function
-        #TODO: If we call the plot function, this may work:
-        xc = self.model.phase.cells.cell_centres[:, 0]
-        yc = self.model.phase.cells.cell_centres[:, 1]
-
-        plt.figure()
-        plt.tripcolor(xc, yc, self.model.phase.sim.vm_ave_time[-1], shading='gouraud') # idk what gouraud is
-        plt.axis('equal')
-        plt.colorbar()
-        plt.show()
-        #maybe save figs to config/RESULTS ?
+        """
+        Draws the last sampled voltages of every cell.
+
+        :param mode: 'rgb_array' returns the frame as a (height, width, 3) uint8 array; 'human' shows
+            it in a window that later calls update without blocking.
+        """
+        # the history also covers steps served from the result cache, and the geometry never changes
+        voltages = self.get_observation_history()[-1]
+        if self._renderer is None or self._renderer.num_cells != len(voltages):
+            from gym_betse.utils.rendering import VoltageRenderer
+            self._renderer = VoltageRenderer(self.model.phase.cells.cell_centres, **self.render_kwargs)
+        with self.profiler.section('render'):
+            frame = self._renderer.render(voltages)
+        if mode == 'rgb_array':
+            return frame
+        if mode != 'human':
+            raise ValueError(f"Unknown render mode '{mode}'.")
+        from matplotlib import pyplot as plt
+        if self._window is None or not plt.fignum_exists(self._window.figure.number):
+            axes = plt.figure().add_subplot()
+            axes.set_axis_off()
+            self._window = axes.imshow(frame)
+        else:
+            self._window.set_data(frame)
+        plt.pause(0.001)
+
+    def start_recording(self, path, fps=10, frame_skip=1):
+        """
+        Records a frame after every frame_skip-th step to path (.gif, or a video format with imageio).
+        """
+        from gym_betse.utils.rendering import FrameRecorder
+        self.stop_recording()
+        self._recorder = FrameRecorder(path, fps=fps, frame_skip=frame_skip)
+
+    def stop_recording(self):
+        """
+        Finishes the recording file, if one is being written.
+        """
+        if self._recorder is not None:
+            self._recorder.close()
+            self._recorder = None
 
     def close(self):
         # Clean up resources
+        self.stop_recording()
+        if self._window is not None:
+            from matplotlib import pyplot as plt
+            plt.close(self._window.figure)
+            self._window = None
 
         # delete working config
-        shutil.rmtree(self.working_config)
+        if os.path.exists(self.working_config):
+            os.remove(self.working_config)
 
         #TODO: BETSE's native cleanup procedures may suffice here
         pass
 
     def compute_goal_dist(self): # TODO: idk man, we're gonna have to get creative with this function if we want to incorporate masks n stuff.
-        # sum of squared errors
-        dist = 0
-        for voltage in self.get_observation():
-            dist += abs((voltage - self.goal_state))**2
-        return dist
+        # sum of squared errors; reward.TargetReward handles per-cell targets, masks and weights
+        return float(np.sum(np.square(np.asarray(self.get_observation(), dtype=np.float64) - self.goal_state)))
 
 
     # You all are my heroes. Good luck with this project! I'm jealous of the nobel prize winners you all will become.
@@ -0,0 +1,45 @@
+# gym_betse/utils/betse_wrapper.py
+
+from betse.science.wrapper import BetseWrapper
+from betse.science.parameters import Parameters
+from betse.science.phase.phasecls import SimPhase
+from betse.science.enum.enumphase import SimPhaseKind
+
+
+class ContinuableBetseWrapper(BetseWrapper):
+    """
+    BetseWrapper that can keep advancing the sim/cells objects it already holds in memory,
+    instead of unpickling the last phase from disk and pickling the result back every run.
+    """
+
+    def continue_sim(self, config_filename=None, persist=False, verbose=False):
+        """
+        Runs a sim phase starting from the state left in self.phase by the previous seed/init/sim.
+
+        :param config_filename: Config to re-read parameters from (e.g. after an action edited it).
+        :param persist: Also pickle the resulting phase to the sim file, like run_sim does.
+        """
+        if config_filename is not None:
+            self._config_filename = config_filename
+        self.p = Parameters.make(self._config_filename)
+        self._set_logging(verbose=verbose)
+        phase = SimPhase(kind=SimPhaseKind.SIM, p=self.p, cells=self.phase.cells, sim=self.phase.sim)
+
+        sim = phase.sim
+        if not persist:
+            # shadow the pickling step for this run only
+            sim._pickle_phase = lambda phase: None
+        try:
+            sim.run_sim_core(phase)
+        finally:
+            if not persist:
+                del sim._pickle_phase
+        self.phase = phase
+        self._assign_shorts(phase.cells)
+
+    def save_sim(self):
+        """
+        Pickles the phase currently held in memory to the sim file named by the config.
+        """
+        if self.phase.kind is SimPhaseKind.SIM:
+            self.phase.sim._pickle_phase(self.phase)
@@ -1,59 +1,395 @@
 # gym_betse/utils/data_storage.py
 
+import argparse
+import glob
 import os
 import h5py
 import numpy as np
 
+# Target size of one HDF5 chunk; rows per chunk are derived from it and the flush size
+CHUNK_BYTES = 1 << 20
+
+# Per-transition datasets shared by both layouts, as (name, dtype)
+ROW_FIELDS = [('action', 'int32'), ('reward', 'float32'), ('done', 'bool'), ('seq_len', 'int32')]
+
+
 class DataStorage:
     """
     Class for storing simulation data using HDF5.
+
+    Transitions are staged in memory and written in blocks of flush_every rows. Datasets grow
+    geometrically, so the number of resizes is logarithmic in the number of transitions; the
+    number of valid rows is kept in the 'length' attribute of the transitions group and the
+    datasets are trimmed to it on close().
+
+    Two layouts are supported for next_states:
+
+    - 'ragged' (default for new files): all sequences concatenated in one flat
+      (total_states, state_size) dataset; transition i owns rows offsets[i]:offsets[i] + seq_len[i].
+    - 'padded': a (N, max_seq_length, state_size) dataset, zero-padded past seq_len.
+
+    Existing files keep the layout they were created with.
+
+    An HDF5 file takes a single writer, so parallel collectors each pass their own shard and write
+    to shard_filename(filename, shard); merge_shards then indexes all shards as one dataset.
+
+    With swmr=True the file is written in HDF5 single-writer/multiple-reader mode, so readers
+    (koopman.dataset.StreamingKoopmanDataset) can open it and follow new transitions while it is
+    being written. Attribute updates are not reliably visible to SWMR readers, so such files keep
+    their datasets at exactly the written size instead, and write seq_len last on every flush, after
+    the other fields are flushed: readers count the leading non-zero seq_len rows and only ever see
+    complete transitions.
     """
-    def __init__(self, storage_path='data/', filename='dataset.h5', state_size=None, max_seq_length=50):
+    def __init__(self, storage_path='data/', filename='dataset.h5', state_size=None, max_seq_length=50,
+                 flush_every=256, compression=None, compression_opts=None, growth_factor=2.0, layout='ragged',
+                 shard=None, swmr=False):
+        """
+        :param flush_every: Number of transitions staged in memory before they are written.
+        :param compression: HDF5 filter for new datasets ('gzip', 'lzf' or None).
+        :param compression_opts: Filter options, e.g. the gzip level.
+        :param growth_factor: Factor the dataset capacity grows by when it runs out.
+        :param layout: 'ragged' or 'padded', used when the file is created.
+        :param shard: Id of this writer (e.g. a worker index); None writes to filename itself.
+        :param swmr: Create the file for SWMR access. Existing files keep the mode they were created with.
+        """
+        if layout not in ('ragged', 'padded'):
+            raise ValueError(f"Unknown layout '{layout}'.")
         self.storage_path = storage_path
-        self.filename = filename
+        self.filename = filename if shard is None else shard_filename(filename, shard)
         self.filepath = os.path.join(self.storage_path, self.filename)
         self.state_size = state_size
         self.max_seq_length = max_seq_length
+        self.flush_every = flush_every
+        self.compression = compression
+        self.compression_opts = compression_opts
+        self.growth_factor = growth_factor
+        self.layout = layout
+        self.swmr = swmr
         self.initialize_storage()
 
+    def _create_dataset(self, grp, name, row_shape, dtype, chunk_rows=None):
+        row_bytes = int(np.prod(row_shape, dtype=np.int64)) * np.dtype(dtype).itemsize
+        if chunk_rows is None:
+            chunk_rows = self.flush_every
+        chunk_rows = max(1, min(chunk_rows, CHUNK_BYTES // max(row_bytes, 1)))
+        grp.create_dataset(name, shape=(0,) + row_shape, maxshape=(None,) + row_shape, dtype=dtype,
+                           chunks=(chunk_rows,) + row_shape, compression=self.compression,
+                           compression_opts=self.compression_opts)
+
     def initialize_storage(self):
         if not os.path.exists(self.storage_path):
             os.makedirs(self.storage_path)
-        self.h5file = h5py.File(self.filepath, 'a')
+        # SWMR needs the HDF5 1.10 file format
+        self.h5file = h5py.File(self.filepath, 'a', libver='latest' if self.swmr else None)
         if 'transitions' not in self.h5file:
             grp = self.h5file.create_group('transitions')
-            maxshape = (None,)
-            grp.create_dataset('state', shape=(0, self.state_size), maxshape=(None, self.state_size), dtype='float32', chunks=True)
-            grp.create_dataset('action', shape=maxshape, maxshape=(None,), dtype='int32', chunks=True)
-            grp.create_dataset('next_states', shape=(0, self.max_seq_length, self.state_size), maxshape=(None, self.max_seq_length, self.state_size), dtype='float32', chunks=True)
-            grp.create_dataset('reward', shape=maxshape, maxshape=(None,), dtype='float32', chunks=True)
-            grp.create_dataset('done', shape=maxshape, maxshape=(None,), dtype='bool', chunks=True)
-            grp.create_dataset('seq_len', shape=maxshape, maxshape=(None,), dtype='int32', chunks=True)
+            self._create_dataset(grp, 'state', (self.state_size,), 'float32')
+            for name, dtype in ROW_FIELDS:
+                self._create_dataset(grp, name, (), dtype)
+            if self.layout == 'ragged':
+                self._create_dataset(grp, 'offsets', (), 'int64')
+                # a flush writes up to flush_every * max_seq_length states
+                self._create_dataset(grp, 'next_states', (self.state_size,), 'float32',
+                                     chunk_rows=self.flush_every * self.max_seq_length)
+                grp.attrs['max_seq_length'] = self.max_seq_length
+                grp.attrs['total_states'] = 0
+            else:
+                self._create_dataset(grp, 'next_states', (self.max_seq_length, self.state_size), 'float32')
+            grp.attrs['layout'] = self.layout
+            grp.attrs['length'] = 0
+            grp.attrs['swmr'] = self.swmr
+        else:
+            grp = self.h5file['transitions']
+            if 'shards' in grp.attrs:
+                self.h5file.close()
+                raise ValueError(f"'{self.filepath}' indexes shards written by other collectors and is read-only; "
+                                 f"write to a shard instead.")
+            if grp.attrs.get('swmr', False) != self.swmr:
+                self.h5file.close()
+                if self.swmr:
+                    raise ValueError(f"'{self.filepath}' was not created with swmr=True.")
+                self.swmr = True
+                return self.initialize_storage()
+            self.layout = grp.attrs.get('layout', 'padded')
+            self.state_size = grp['state'].shape[1]
+            if self.layout == 'ragged':
+                self.max_seq_length = int(grp.attrs['max_seq_length'])
+            else:
+                self.max_seq_length = grp['next_states'].shape[1]
+        self.length = int(grp.attrs.get('length', grp['state'].shape[0]))
+        self.capacity = grp['state'].shape[0]
+        if self.layout == 'ragged':
+            self.total_states = int(grp.attrs['total_states'])
+            self.states_capacity = grp['next_states'].shape[0]
+        if self.swmr:
+            # a writer stopped mid-flush leaves rows past the last complete transition, drop them
+            self.length = self.capacity = grp['seq_len'].shape[0]
+            for name in grp:
+                if name != 'next_states' or self.layout == 'padded':
+                    grp[name].resize(self.length, axis=0)
+            if self.layout == 'ragged':
+                self.total_states = self.states_capacity = \
+                    int(grp['offsets'][-1] + grp['seq_len'][-1]) if self.length else 0
+                grp['next_states'].resize(self.total_states, axis=0)
+                grp.attrs['total_states'] = self.total_states
+            grp.attrs['length'] = self.length
+
+        # staging buffers, flushed as one block
+        self._buffers = {'state': np.zeros((self.flush_every, self.state_size), dtype='float32')}
+        for name, dtype in ROW_FIELDS:
+            self._buffers[name] = np.zeros(self.flush_every, dtype=dtype)
+        if self.layout == 'ragged':
+            self._buffers['offsets'] = np.zeros(self.flush_every, dtype='int64')
+            self._states_buffer = np.zeros((self.flush_every * self.max_seq_length, self.state_size),
+                                           dtype='float32')
         else:
-            self.max_seq_length = self.h5file['transitions']['next_states'].shape[1]
+            self._buffers['next_states'] = np.zeros((self.flush_every, self.max_seq_length, self.state_size),
+                                                    dtype='float32')
+        self.pending = 0
+        self.pending_states = 0
+        if self.swmr:
+            # no new objects or attributes from here on
+            self.h5file.swmr_mode = True
 
     def store_transition(self, state, action, next_states, reward, done):
-        grp = self.h5file['transitions']
-        idx = grp['state'].shape[0]
+        i = self.pending
         seq_len = next_states.shape[0]
-        # Resize datasets
-        grp['state'].resize((idx + 1, self.state_size))
-        grp['action'].resize((idx + 1,))
-        grp['next_states'].resize((idx + 1, self.max_seq_length, self.state_size))
-        grp['reward'].resize((idx + 1,))
-        grp['done'].resize((idx + 1,))
-        grp['seq_len'].resize((idx + 1,))
-        # Pad next_states
-        padded_next_states = np.zeros((self.max_seq_length, self.state_size), dtype='float32')
-        padded_next_states[:seq_len] = next_states
-        # Store data
-        grp['state'][idx] = state
-        grp['action'][idx] = action
-        grp['next_states'][idx] = padded_next_states
-        grp['reward'][idx] = reward
-        grp['done'][idx] = done
-        grp['seq_len'][idx] = seq_len
+        if seq_len > self.max_seq_length:
+            raise ValueError(f"Sequence of length {seq_len} exceeds max_seq_length {self.max_seq_length}.")
+        # readers rely on seq_len >= 1: SWMR readers take seq_len == 0 for a row still being written
+        if seq_len == 0:
+            raise ValueError("Transitions need at least one next state.")
+        buffers = self._buffers
+        buffers['state'][i] = state
+        buffers['action'][i] = action
+        if self.layout == 'ragged':
+            buffers['offsets'][i] = self.total_states + self.pending_states
+            self._states_buffer[self.pending_states:self.pending_states + seq_len] = next_states
+            self.pending_states += seq_len
+        else:
+            # Pad next_states in place
+            buffers['next_states'][i, :seq_len] = next_states
+            buffers['next_states'][i, seq_len:] = 0
+        buffers['reward'][i] = reward
+        buffers['done'][i] = done
+        buffers['seq_len'][i] = seq_len
+        self.pending += 1
+        if self.pending == self.flush_every:
+            self.flush()
+
+    def _grow(self, datasets, capacity, needed):
+        if needed <= capacity:
+            return capacity
+        capacity = needed if self.swmr else max(needed, int(capacity * self.growth_factor))
+        for dataset in datasets:
+            dataset.resize(capacity, axis=0)
+        return capacity
+
+    def _row_datasets(self, grp):
+        return [grp[name] for name in self._buffers]
+
+    def flush(self):
+        """
+        Writes all staged transitions to the file.
+        """
+        if self.pending == 0:
+            return
+        grp = self.h5file['transitions']
+        start, stop = self.length, self.length + self.pending
+        if not self.swmr:
+            self.capacity = self._grow(self._row_datasets(grp), self.capacity, stop)
+        if self.layout == 'ragged':
+            states_stop = self.total_states + self.pending_states
+            self.states_capacity = self._grow([grp['next_states']], self.states_capacity, states_stop)
+            grp['next_states'][self.total_states:states_stop] = self._states_buffer[:self.pending_states]
+            self.total_states = states_stop
+            grp.attrs['total_states'] = self.total_states
+            self.pending_states = 0
+        # seq_len last, see the class docstring
+        for name in sorted(self._buffers, key=lambda name: name == 'seq_len'):
+            if self.swmr:
+                if name == 'seq_len':
+                    self.h5file.flush()
+                grp[name].resize(stop, axis=0)
+            grp[name][start:stop] = self._buffers[name][:self.pending]
+        self.capacity = max(self.capacity, stop)
+        self.length = stop
+        grp.attrs['length'] = self.length
+        self.pending = 0
+        if self.swmr:
+            self.h5file.flush()
+
+    def read_transition(self, idx):
+        """
+        :return: Dict with the stored state, action, next_states (seq_len rows), reward and done.
+        """
+        if idx >= self.length:
+            self.flush()
+        grp = self.h5file['transitions']
+        seq_len = int(grp['seq_len'][idx])
+        if self.layout == 'ragged':
+            offset = int(grp['offsets'][idx])
+            next_states = grp['next_states'][offset:offset + seq_len]
+        else:
+            next_states = grp['next_states'][idx, :seq_len]
+        return {
+            'state': grp['state'][idx],
+            'action': int(grp['action'][idx]),
+            'next_states': next_states,
+            'reward': float(grp['reward'][idx]),
+            'done': bool(grp['done'][idx]),
+        }
+
+    def __len__(self):
+        return self.length + self.pending
 
     def close(self):
+        self.flush()
+        # drop the unused capacity so the file holds exactly length rows
+        grp = self.h5file['transitions']
+        if self.capacity != self.length:
+            for dataset in self._row_datasets(grp):
+                dataset.resize(self.length, axis=0)
+            self.capacity = self.length
+        if self.layout == 'ragged' and self.states_capacity != self.total_states:
+            grp['next_states'].resize(self.total_states, axis=0)
+            self.states_capacity = self.total_states
         self.h5file.close()
 
+
+def convert_to_ragged(src_path, dst_path=None, block_size=4096, **storage_kwargs):
+    """
+    Rewrites a padded dataset.h5 in the ragged layout.
+
+    :param src_path: Padded HDF5 file written by DataStorage.
+    :param dst_path: Output file. Defaults to replacing src_path once the conversion succeeded.
+    :param block_size: Number of transitions read from src_path at a time.
+    """
+    target = dst_path if dst_path is not None else src_path + ".ragged.tmp"
+    with h5py.File(src_path, 'r') as src:
+        grp = src['transitions']
+        if grp.attrs.get('layout', 'padded') == 'ragged':
+            raise ValueError(f"'{src_path}' already uses the ragged layout.")
+        length = int(grp.attrs.get('length', grp['state'].shape[0]))
+        _, max_seq_length, state_size = grp['next_states'].shape
+        storage = DataStorage(storage_path=os.path.dirname(os.path.abspath(target)),
+                              filename=os.path.basename(target), state_size=state_size,
+                              max_seq_length=max_seq_length, layout='ragged', **storage_kwargs)
+        try:
+            for start in range(0, length, block_size):
+                stop = min(start + block_size, length)
+                block = {name: grp[name][start:stop] for name in ('state', 'action', 'next_states', 'reward',
+                                                                  'done', 'seq_len')}
+                for i in range(stop - start):
+                    storage.store_transition(block['state'][i], block['action'][i],
+                                             block['next_states'][i, :block['seq_len'][i]],
+                                             block['reward'][i], block['done'][i])
+        finally:
+            storage.close()
+    if dst_path is None:
+        os.replace(target, src_path)
+    return dst_path if dst_path is not None else src_path
+
+
+def shard_filename(filename, shard):
+    """
+    :return: Name of one writer's shard of filename, e.g. dataset.shard-3.h5 for dataset.h5.
+    """
+    stem, ext = os.path.splitext(filename)
+    return f"{stem}.shard-{shard}{ext}"
+
+
+def find_shards(storage_path='data/', filename='dataset.h5'):
+    """
+    :return: Sorted paths of the shards of filename in storage_path.
+    """
+    stem, ext = os.path.splitext(filename)
+    return sorted(glob.glob(os.path.join(glob.escape(storage_path), f"{glob.escape(stem)}.shard-*{ext}")))
+
+
+def merge_shards(shard_paths, output_path):
+    """
+    Writes an HDF5 file whose 'transitions' group concatenates the shards as virtual datasets, so
+    KoopmanDataset reads all of them as one dataset without copying any states. Only the offsets of
+    the ragged layout are rewritten (shifted by the states of the preceding shards).
+
+    Each shard contributes the rows it had flushed when the index was built; rerun the merge to pick
+    up rows written since. Sources are referenced relative to output_path, so the directory can be
+    moved as a whole, but the shards must stay where they are.
+
+    :param shard_paths: Files written by DataStorage, all with the same layout and state size.
+    :return: output_path.
+    """
+    shards = []
+    for path in shard_paths:
+        with h5py.File(path, 'r') as file:
+            grp = file['transitions']
+            layout = grp.attrs.get('layout', 'padded')
+            length = int(grp.attrs.get('length', grp['state'].shape[0]))
+            total_states = int(grp.attrs['total_states']) if layout == 'ragged' else length
+            shards.append({
+                'path': path, 'layout': layout, 'length': length, 'total_states': total_states,
+                'max_seq_length': int(grp.attrs['max_seq_length']) if layout == 'ragged'
+                else grp['next_states'].shape[1],
+                'row_shapes': {name: (dataset.shape[1:], dataset.dtype) for name, dataset in grp.items()},
+                'offsets': grp['offsets'][:length] if layout == 'ragged' else None,
+            })
+    if not shards:
+        raise ValueError("No shards to merge.")
+    if os.path.exists(output_path):
+        with h5py.File(output_path, 'r') as file:
+            if 'transitions' in file and 'shards' not in file['transitions'].attrs:
+                raise ValueError(f"'{output_path}' holds transitions of its own, not an index of shards.")
+    first = shards[0]
+    for shard in shards[1:]:
+        if shard['layout'] != first['layout'] or shard['row_shapes'] != first['row_shapes']:
+            raise ValueError(f"Shard '{shard['path']}' does not match the layout of '{first['path']}'.")
+
+    ragged = first['layout'] == 'ragged'
+    length = sum(shard['length'] for shard in shards)
+    total_states = sum(shard['total_states'] for shard in shards)
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    with h5py.File(output_path, 'w') as file:
+        grp = file.create_group('transitions')
+        for name, (row_shape, dtype) in first['row_shapes'].items():
+            if name == 'offsets':
+                continue
+            rows = total_states if ragged and name == 'next_states' else length
+            layout = h5py.VirtualLayout(shape=(rows,) + row_shape, dtype=dtype)
+            start = 0
+            for shard in shards:
+                count = shard['total_states'] if ragged and name == 'next_states' else shard['length']
+                if count == 0:
+                    continue
+                with h5py.File(shard['path'], 'r') as source_file:
+                    shape = source_file['transitions'][name].shape
+                source = h5py.VirtualSource(os.path.relpath(os.path.abspath(shard['path']), output_dir),
+                                            f'transitions/{name}', shape=shape, dtype=dtype)
+                layout[start:start + count] = source[:count]
+                start += count
+            grp.create_virtual_dataset(name, layout)
+        if ragged:
+            bases = np.cumsum([0] + [shard['total_states'] for shard in shards[:-1]])
+            grp.create_dataset('offsets', data=np.concatenate(
+                [shard['offsets'] + base for shard, base in zip(shards, bases)]).astype('int64'))
+            grp.attrs['max_seq_length'] = max(shard['max_seq_length'] for shard in shards)
+            grp.attrs['total_states'] = total_states
+        grp.attrs['layout'] = first['layout']
+        grp.attrs['length'] = length
+        grp.attrs['shards'] = len(shards)
+    return output_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a padded dataset.h5 to the ragged layout, or with --merge "
+                                                 "index shard files as one dataset.")
+    parser.add_argument("src", help="padded HDF5 file, e.g. data/dataset.h5 (with --merge: the index to write)")
+    parser.add_argument("dst", nargs="?", default=None, help="output file (default: convert in place)")
+    parser.add_argument("--merge", nargs="*", default=None, metavar="SHARD",
+                        help="shard files to index (default: the shards of src found next to it)")
+    args = parser.parse_args()
+    if args.merge is not None:
+        shard_paths = args.merge or find_shards(os.path.dirname(args.src) or '.', os.path.basename(args.src))
+        print(f"Wrote {merge_shards(shard_paths, args.src)} ({len(shard_paths)} shards)")
+    else:
+        print(f"Wrote {convert_to_ragged(args.src, args.dst)}")
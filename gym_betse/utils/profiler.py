@@ -0,0 +1,125 @@
+# gym_betse/utils/profiler.py
+
+import csv
+import json
+import os
+import sys
+import time
+from contextlib import nullcontext
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Shared no-op context returned by disabled profilers, so an instrumented call costs one method call
+_NULL_SECTION = nullcontext()
+
+REPORT_FIELDS = ['section', 'count', 'total_s', 'mean_s', 'min_s', 'max_s']
+
+
+def peak_rss():
+    """
+    :return: Peak resident set size of this process in bytes, or None where it is not available.
+    """
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return usage if sys.platform == 'darwin' else usage * 1024
+
+
+class _Section:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Profiler:
+    """
+    Wall-clock timings and call counts of named sections of an env step.
+
+    Sections are timed with `with profiler.section('run_sim'):`. Totals are kept for the whole run
+    (report(), export()), and the time spent in each section since the last begin_step() is available
+    from step_timings() for the info dict of BetseEnv.step. A disabled profiler hands out one shared
+    no-op context and records nothing.
+    """
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.stats = {}
+        self._step = {}
+
+    def section(self, name):
+        if not self.enabled:
+            return _NULL_SECTION
+        return _Section(self, name)
+
+    def record(self, name, seconds):
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = {'count': 0, 'total_s': 0.0, 'min_s': seconds, 'max_s': seconds}
+        stats['count'] += 1
+        stats['total_s'] += seconds
+        stats['min_s'] = min(stats['min_s'], seconds)
+        stats['max_s'] = max(stats['max_s'], seconds)
+        self._step[name] = self._step.get(name, 0.0) + seconds
+
+    def begin_step(self):
+        self._step = {}
+
+    def step_timings(self):
+        """
+        :return: Seconds spent per section since the last begin_step().
+        """
+        return dict(self._step)
+
+    def report(self):
+        """
+        :return: Dict with 'sections', the per-section rows (see REPORT_FIELDS) slowest total first,
+            and 'peak_rss_bytes'.
+        """
+        rows = []
+        for name, stats in self.stats.items():
+            rows.append({'section': name, 'count': stats['count'], 'total_s': stats['total_s'],
+                         'mean_s': stats['total_s'] / stats['count'], 'min_s': stats['min_s'],
+                         'max_s': stats['max_s']})
+        rows.sort(key=lambda row: row['total_s'], reverse=True)
+        return {'sections': rows, 'peak_rss_bytes': peak_rss()}
+
+    def format_report(self):
+        report = self.report()
+        lines = [f"{'section':20s} {'count':>7s} {'total s':>10s} {'mean ms':>10s} {'max ms':>10s}"]
+        for row in report['sections']:
+            lines.append(f"{row['section']:20s} {row['count']:7d} {row['total_s']:10.3f} "
+                         f"{row['mean_s'] * 1e3:10.3f} {row['max_s'] * 1e3:10.3f}")
+        if report['peak_rss_bytes'] is not None:
+            lines.append(f"peak RSS: {report['peak_rss_bytes'] / 2 ** 20:.1f} MiB")
+        return "\n".join(lines)
+
+    def export(self, path):
+        """
+        Writes the report to path, as CSV if it ends in .csv and as JSON otherwise.
+        """
+        report = self.report()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if path.endswith('.csv'):
+            with open(path, 'w', newline='') as file:
+                writer = csv.DictWriter(file, fieldnames=REPORT_FIELDS)
+                writer.writeheader()
+                writer.writerows(report['sections'])
+        else:
+            with open(path, 'w') as file:
+                json.dump(report, file, indent=2)
+        return path
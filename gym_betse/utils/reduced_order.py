@@ -0,0 +1,337 @@
+# gym_betse/utils/reduced_order.py
+"""
+Reduced-order NumPy model of the transmembrane voltage of a small cell cluster, plus
+ReducedOrderWrapper, a BetseWrapper-like front end that BetseSimulation runs in place of BETSE
+(BetseSimulation(..., wrapper_cls='reduced_order')).
+
+Every cell is a membrane capacitor with one leak current per ion (Na+, K+, Cl-, Ca2+), whose
+conductance follows from the membrane diffusion constant Dm through the linearized
+Goldman-Hodgkin-Katz flux, an electrogenic Na/K-ATPase current and gap-junction currents to its
+neighbours on a hexagonal lattice. Ion concentrations stay at the config's customized ion profile,
+except for the extracellular K+ scaled by the "change K env" event during sims. Voltages are
+advanced with semi-implicit Euler steps batched over any number of environments and come out in
+volts, like BETSE's vm_ave.
+"""
+
+import os
+from types import SimpleNamespace
+
+import numpy as np
+
+from gym_betse.utils import yaml_friend
+
+FARADAY = 96485.332  # [C/mol]
+GAS_CONSTANT = 8.314462  # [J/(mol K)]
+MEMBRANE_THICKNESS = 7.5e-9  # [m], as in BETSE
+MEMBRANE_CAPACITANCE = 0.022  # [F/m2], as in BETSE
+
+# appended to the seed/init/sim file names of the config, so the model's states never replace BETSE's
+ARTIFACT_SUFFIX = '.reduced.npy'
+
+IONS = ('Na', 'K', 'Cl', 'Ca')
+VALENCES = np.array([1.0, 1.0, -1.0, 2.0])
+# free diffusion constants in water [m2/s], setting the gap-junction conductance
+FREE_DIFFUSION = np.array([1.33e-9, 1.96e-9, 2.03e-9, 0.79e-9])
+# half-saturation constants [mmol/L] of the Na/K-ATPase for cytosolic Na+ and extracellular K+
+PUMP_KM_NA = 10.0
+PUMP_KM_K = 0.6
+
+_DIFFUSION = "config/tissue profile definition/tissue/default/diffusion constants"
+_GAP_JUNCTIONS = "config/variable settings/gap junctions"
+_ION_PROFILE = "config/general options/customized ion profile"
+
+# Model parameter -> (config parameter path, default when the config doesn't have it). The paths
+# are those of yaml_friend/params.txt, so actions written for BETSE apply to this model unchanged.
+PARAMETER_PATHS = {
+    'Dm_Na': (f"{_DIFFUSION}/Dm_Na", 3.0e-18),
+    'Dm_K': (f"{_DIFFUSION}/Dm_K", 1.0e-18),
+    'Dm_Cl': (f"{_DIFFUSION}/Dm_Cl", 1.0e-18),
+    'Dm_Ca': (f"{_DIFFUSION}/Dm_Ca", 1.0e-18),
+    'gj_surface_area': (f"{_GAP_JUNCTIONS}/gap junction surface area", 1.0e-15),
+    'gj_voltage_sensitive': (f"{_GAP_JUNCTIONS}/voltage sensitive gj", False),
+    'gj_voltage_threshold': (f"{_GAP_JUNCTIONS}/gj voltage threshold", 15.0),
+    'gj_voltage_window': (f"{_GAP_JUNCTIONS}/gj voltage window", 15.0),
+    'gj_minimum': (f"{_GAP_JUNCTIONS}/gj minimum", 0.1),
+    'cell_spacing': ("config/world options/cell spacing", 26.0e-9),
+    'temperature': ("config/variable settings/temperature", 310.0),
+    'pump_max_rate': ("config/general network/transporters/max rate_NaKATPase", 5.0e-7),
+    'K_env_event': ("config/change K env/event happens", False),
+    'K_env_start': ("config/change K env/change start", 0.0),
+    'K_env_finish': ("config/change K env/change finish", 0.0),
+    'K_env_rate': ("config/change K env/change rate", 1.0),
+    'K_env_multiplier': ("config/change K env/multiplier", 1.0),
+    'Na_env': (f"{_ION_PROFILE}/extracellular Na+ concentration", 145.0),
+    'K_env': (f"{_ION_PROFILE}/extracellular K+ concentration", 5.0),
+    'Cl_env': (f"{_ION_PROFILE}/extracellular Cl- concentration", 105.0),
+    'Ca_env': (f"{_ION_PROFILE}/extracellular Ca2+ concentration", 1.0),
+    'Na_cell': (f"{_ION_PROFILE}/cytosolic Na+ concentration", 8.0),
+    'K_cell': (f"{_ION_PROFILE}/cytosolic K+ concentration", 125.0),
+    'Cl_cell': (f"{_ION_PROFILE}/cytosolic Cl- concentration", 20.0),
+    'Ca_cell': (f"{_ION_PROFILE}/cytosolic Ca2+ concentration", 1.0e-4),
+}
+PATH_PARAMETERS = {path: name for name, (path, _) in PARAMETER_PATHS.items()}
+
+
+def hex_cluster(rings, cell_radius=5.0e-6, cell_spacing=26.0e-9):
+    """
+    :param rings: Rings of cells around the central one (1 gives the 7-cell cluster).
+    :return: (cell centres of shape (cells, 2) in metres, boolean adjacency matrix of shape (cells, cells)).
+    """
+    distance = 2 * cell_radius + cell_spacing
+    axial = [(q, r) for q in range(-rings, rings + 1) for r in range(-rings, rings + 1) if abs(q + r) <= rings]
+    axial.sort(key=lambda qr: (max(abs(qr[0]), abs(qr[1]), abs(qr[0] + qr[1])), qr))
+    axial = np.array(axial, dtype=np.float64)
+    centres = distance * np.stack([axial[:, 0] + axial[:, 1] / 2, axial[:, 1] * np.sqrt(3) / 2], axis=1)
+    gaps = np.linalg.norm(centres[:, None] - centres[None], axis=-1)
+    adjacency = (gaps > 0) & (gaps < 1.01 * distance)
+    return centres, adjacency
+
+
+class ReducedOrderModel:
+    """
+    The membrane voltage of num_envs independent clusters, stepped together.
+
+    Parameters are held as arrays of shape (num_envs,) in self.parameters and can be set per
+    environment from parameter-vector actions with set_parameters.
+    """
+    def __init__(self, config_path, num_envs=1, rings=1):
+        self.num_envs = num_envs
+        self.rings = rings
+        self.parameters = {}
+        self.ignored_paths = set()
+        self.load_config(config_path)
+        self.centres, self.adjacency = hex_cluster(rings, self.cell_radius, float(self.parameters['cell_spacing'][0]))
+        self.num_cells = len(self.centres)
+        self.vm = np.zeros((num_envs, self.num_cells))
+
+    def load_config(self, config_path):
+        """
+        (Re-)reads every parameter from a config, for all environments.
+        """
+        accessor = yaml_friend.ParamAccessor(config_path, [])
+        for name, (path, default) in PARAMETER_PATHS.items():
+            value = accessor.get(path, default)
+            self.parameters[name] = np.full(self.num_envs, float(default if value is None else value))
+        self.cell_radius = float(accessor.get("config/world options/cell radius", 5.0e-6))
+        self.time_settings = {}
+        for phase in ('init', 'sim'):
+            settings = accessor.get(f"config/{phase} time settings", {}) or {}
+            self.time_settings[phase] = (float(settings.get('total time', 60.0)),
+                                         float(settings.get('time step', 1.0e-2)),
+                                         float(settings.get('sampling rate', 1.0)))
+        self.cell_profiles = self._tissue_profiles(accessor.config)
+        # next to where BETSE would save the seed, init and sim phases of this config, never over BETSE's files
+        config_dir = os.path.dirname(os.path.abspath(config_path))
+        init_saving = accessor.get("config/init file saving", {}) or {}
+        sim_saving = accessor.get("config/sim file saving", {}) or {}
+        init_dir = os.path.join(config_dir, init_saving.get('directory', 'INITS'))
+        self.phase_files = {
+            'seed': os.path.join(init_dir, init_saving.get('worldfile', 'world') + ARTIFACT_SUFFIX),
+            'init': os.path.join(init_dir, init_saving.get('file', 'init') + ARTIFACT_SUFFIX),
+            'sim': os.path.join(config_dir, sim_saving.get('directory', 'SIMS'),
+                                sim_saving.get('file', 'sim') + ARTIFACT_SUFFIX),
+        }
+
+    def _tissue_profiles(self, config):
+        # (cell indices, Dm per ion) of the "indices" tissue profiles, which override the default Dm
+        tissue = config.get("tissue profile definition", {}) or {}
+        if not tissue.get("profiles enabled"):
+            return []
+        overrides = []
+        for profile in (tissue.get("tissue", {}) or {}).get("profiles", []) or []:
+            targets = profile.get("cell targets", {}) or {}
+            constants = profile.get("diffusion constants", {}) or {}
+            if targets.get("type") == "indices" and all(f"Dm_{ion}" in constants for ion in IONS):
+                overrides.append((list(targets.get("indices", [])), [float(constants[f"Dm_{ion}"]) for ion in IONS]))
+        return overrides
+
+    def set_parameters(self, paths, values):
+        """
+        :param paths: Parameter paths, e.g. from yaml_friend.get_param_list.
+        :param values: Array of shape (len(paths),) applied to every environment, or
+            (num_envs, len(paths)) with one parameter vector per environment. Paths the model doesn't
+            depend on are recorded in self.ignored_paths.
+        """
+        values = np.broadcast_to(np.asarray(values, dtype=np.float64), (self.num_envs, len(paths)))
+        for column, path in enumerate(paths):
+            name = PATH_PARAMETERS.get(path)
+            if name is None:
+                self.ignored_paths.add(path)
+            else:
+                self.parameters[name] = values[:, column].copy()
+
+    def _membrane_diffusion(self):
+        dm = np.stack([self.parameters[f"Dm_{ion}"] for ion in IONS], axis=-1)
+        dm = np.repeat(dm[:, None, :], self.num_cells, axis=1)
+        for cells, constants in self.cell_profiles:
+            cells = [cell for cell in cells if 0 <= cell < self.num_cells]
+            dm[:, cells] = constants
+        return dm
+
+    def run(self, total_time, time_step, sampling_rate, events=True):
+        """
+        Advances self.vm by total_time seconds.
+
+        :param events: Apply the scheduled "change K env" event (sims only, as in BETSE).
+        :return: Voltages sampled every sampling_rate seconds, of shape (num_envs, samples, cells).
+        """
+        p = self.parameters
+        steps = max(1, int(round(total_time / time_step)))
+        sample_every = max(1, int(round(sampling_rate / time_step)))
+        thermal = GAS_CONSTANT * p['temperature'] / FARADAY  # RT/F [V], (N,)
+        env = np.stack([p[f"{ion}_env"] for ion in IONS], axis=-1)
+        cell = np.stack([p[f"{ion}_cell"] for ion in IONS], axis=-1)
+        nernst = thermal[:, None] / VALENCES * np.log(env / cell)  # (N, ions)
+
+        # leak conductance per membrane area [S/m2]: z^2 F^2 / (RT) * Dm / thickness * mean concentration
+        permeability = self._membrane_diffusion() / MEMBRANE_THICKNESS
+        conductance = (VALENCES ** 2 / thermal[:, None])[:, None, :] * FARADAY * permeability \
+            * (0.5 * (env + cell))[:, None, :]
+        total_conductance = conductance.sum(axis=-1)
+        driving = (conductance * nernst[:, None, :]).sum(axis=-1)
+        k_conductance = conductance[..., IONS.index('K')]
+
+        # gap junction conductance between neighbours, as a fraction of the cytosolic conductance
+        gj = p['gj_surface_area'] * FARADAY / thermal * (VALENCES ** 2 * FREE_DIFFUSION * cell).sum(axis=-1) \
+            / p['cell_spacing']
+        coupling = gj[:, None, None] * self.adjacency
+        gated = p['gj_voltage_sensitive'] > 0
+
+        capacitance = MEMBRANE_CAPACITANCE / time_step
+        diagonal = np.eye(self.num_cells) * (capacitance + total_conductance)[:, :, None]
+        if not gated.any():
+            system_inverse = np.linalg.inv(diagonal + self._laplacian(coupling))
+
+        pump_na = (cell[:, 0] / (cell[:, 0] + PUMP_KM_NA)) ** 3 * FARADAY * p['pump_max_rate']
+        k_event = events & (p['K_env_event'] > 0)
+        vm = self.vm
+        samples = []
+        for step in range(1, steps + 1):
+            t = step * time_step
+            k_env = env[:, 1]
+            forcing = driving
+            if k_event.any():
+                # smooth pulse between change start and change finish, as BETSE's global events
+                rate = np.maximum(p['K_env_rate'], 1e-12)
+                pulse = 0.5 * (np.tanh((t - p['K_env_start']) / rate) - np.tanh((t - p['K_env_finish']) / rate))
+                k_env = k_env * np.where(k_event, 1 + (p['K_env_multiplier'] - 1) * pulse, 1.0)
+                k_nernst = thermal * np.log(k_env / cell[:, 1])
+                forcing = driving + k_conductance * (k_nernst - nernst[:, 1])[:, None]
+            # net one charge out per pump cycle (3 Na+ out, 2 K+ in)
+            pump = pump_na * (k_env / (k_env + PUMP_KM_K)) ** 2
+            rhs = capacitance * vm + forcing - pump[:, None]
+            if gated.any():
+                difference = np.abs(vm[:, :, None] - vm[:, None, :]) * 1e3
+                gate = p['gj_minimum'][:, None, None] + (1 - p['gj_minimum'][:, None, None]) / (
+                    1 + np.exp((difference - p['gj_voltage_threshold'][:, None, None])
+                               / np.maximum(p['gj_voltage_window'], 1e-12)[:, None, None]))
+                gate = np.where(gated[:, None, None], gate, 1.0)
+                vm = np.linalg.solve(diagonal + self._laplacian(coupling * gate), rhs[..., None])[..., 0]
+            else:
+                vm = np.einsum('nij,nj->ni', system_inverse, rhs)
+            if step % sample_every == 0:
+                samples.append(vm)
+        self.vm = vm
+        if not samples:
+            samples.append(vm)
+        return np.stack(samples, axis=1)
+
+    @staticmethod
+    def _laplacian(weights):
+        return np.eye(weights.shape[-1]) * weights.sum(axis=-1)[..., None] - weights
+
+
+class ReducedOrderWrapper:
+    """
+    Runs ReducedOrderModel behind the phase methods BetseSimulation calls on a BetseWrapper, and
+    exposes the result as phase.sim.vm_ave / vm_ave_time / phase.cells.cell_centres.
+
+    The seed, init and sim states are saved next to BETSE's, under the file names the config gives
+    plus ARTIFACT_SUFFIX, so load_init/load_sim and SnapshotCache work as they do with BETSE without
+    touching BETSE's own files.
+    """
+    artifact_suffix = ARTIFACT_SUFFIX
+    rings = 1
+    # seconds per model step; None uses the config's time step (the scheme is stable for larger ones)
+    time_step = None
+
+    def __init__(self, config_filename, log_filename=None, log_level=None):
+        self._config_filename = config_filename
+        self.model = None
+
+    def _model(self):
+        # re-read the config on every phase, as BETSE does, so edited parameters take effect
+        if self.model is None:
+            self.model = ReducedOrderModel(self._config_filename, rings=self.rings)
+        else:
+            self.model.load_config(self._config_filename)
+        return self.model
+
+    def _save(self, phase, array):
+        path = self.model.phase_files[phase]
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            np.save(file, array)
+
+    def _set_phase(self, kind, history):
+        self.phase = SimpleNamespace(
+            kind=kind,
+            sim=SimpleNamespace(vm_ave=history[-1], vm_ave_time=list(history)),
+            cells=SimpleNamespace(cell_centres=self.model.centres),
+        )
+
+    def _run(self, kind, events):
+        total_time, time_step, sampling_rate = self.model.time_settings[kind]
+        history = self.model.run(total_time, self.time_step or time_step, sampling_rate, events=events)[0]
+        self._set_phase(kind, history)
+
+    def _restore(self, kind):
+        # loads a saved phase into the model, returns False if there is none
+        path = self.model.phase_files[kind]
+        if not os.path.exists(path):
+            return False
+        with open(path, 'rb') as file:
+            history = np.atleast_2d(np.load(file))
+        self.model.vm = history[-1][None].copy()
+        self._set_phase(kind, history)
+        return True
+
+    def run_seed(self, verbose=False):
+        self._model()
+        self._save('seed', self.model.centres)
+
+    def run_init(self, verbose=False):
+        self._model()
+        self.model.vm = np.zeros_like(self.model.vm)
+        self._run('init', events=False)
+        self._save('init', self.model.vm[0])
+
+    def load_init(self, verbose=False):
+        self._model()
+        if not self._restore('init'):
+            self.run_init(verbose)
+
+    def load_sim(self, verbose=False):
+        # like BETSE's, leaves self.phase unset when no sim was saved yet
+        self._model()
+        self._restore('sim')
+
+    def run_sim(self, verbose=False):
+        self.load_init(verbose)
+        self._run('sim', events=True)
+        self.save_sim()
+
+    def continue_sim(self, config_filename=None, persist=False, verbose=False):
+        if config_filename is not None:
+            self._config_filename = config_filename
+        if self.model is None:
+            self.load_init(verbose)
+        else:
+            self._model()
+        self._run('sim', events=True)
+        if persist:
+            self.save_sim()
+
+    def save_sim(self):
+        if getattr(self, 'phase', None) is not None and self.phase.kind == 'sim':
+            self._save('sim', np.asarray(self.phase.sim.vm_ave_time))
@@ -0,0 +1,111 @@
+# gym_betse/utils/rendering.py
+
+import os
+
+import numpy as np
+
+
+class VoltageRenderer:
+    """
+    Draws the transmembrane voltage of every cell, interpolated over the cluster, on an offscreen
+    Agg canvas. The triangulation, figure and colour bar are built once and everything static is
+    cached as a background; a frame swaps the colour data, restores the background and redraws
+    only the mesh (plus the colour bar when the limits follow the data). No pyplot state is
+    involved, so nothing leaks and no display is needed.
+    """
+    def __init__(self, cell_centres, clim=None, figsize=(4, 4), dpi=100):
+        """
+        :param cell_centres: (cells, 2) array of cell positions, e.g. phase.cells.cell_centres.
+        :param clim: Fixed (low, high) colour limits in mV, so colours are comparable across frames
+            (e.g. in a recording) and frames skip redrawing the colour bar, which is about ten times
+            faster; None rescales every frame to its own range.
+        """
+        # the object-oriented API draws with Agg regardless of the pyplot backend
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        from matplotlib.tri import Triangulation
+
+        cell_centres = np.asarray(cell_centres)
+        self.num_cells = len(cell_centres)
+        self.clim = clim
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.axes = self.figure.add_subplot()
+        triangulation = Triangulation(cell_centres[:, 0], cell_centres[:, 1])
+        self.mesh = self.axes.tripcolor(triangulation, np.zeros(self.num_cells), shading='gouraud')
+        self.axes.set_aspect('equal')
+        self.axes.set_axis_off()
+        self.colorbar = self.figure.colorbar(self.mesh, ax=self.axes, label='Vmem (mV)')
+        if clim is not None:
+            self.mesh.set_clim(*clim)
+        # animated artists are left out of the full draw that captures the background
+        self.mesh.set_animated(True)
+        self.colorbar.ax.set_animated(clim is None)
+        self.canvas.draw()
+        self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+
+    def render(self, voltages):
+        """
+        :param voltages: Voltage of every cell in volts, e.g. vm_ave_time[-1].
+        :return: (height, width, 3) uint8 RGB frame.
+        """
+        voltages = np.asarray(voltages, dtype=np.float64) * 1e3
+        self.mesh.set_array(voltages)
+        self.canvas.restore_region(self._background)
+        if self.clim is None:
+            low, high = voltages.min(), voltages.max()
+            self.mesh.set_clim(low, high if high > low else low + 1e-6)
+            self.figure.draw_artist(self.colorbar.ax)
+        self.axes.draw_artist(self.mesh)
+        return np.asarray(self.canvas.buffer_rgba())[..., :3].copy()
+
+
+class FrameRecorder:
+    """
+    Writes every frame_skip-th captured frame to a GIF (with Pillow, buffered until close()) or to
+    any format imageio supports, e.g. .mp4 (streamed; needs the optional imageio[ffmpeg] package).
+    Skipped frames are never rendered.
+    """
+    def __init__(self, path, fps=10, frame_skip=1):
+        self.path = path
+        self.fps = fps
+        self.frame_skip = frame_skip
+        self.captured = 0
+        self.written = 0
+        self._frames = []
+        self._writer = None
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if os.path.splitext(path)[1].lower() != '.gif':
+            try:
+                import imageio
+            except ImportError as e:
+                raise ImportError(f"Recording '{path}' needs imageio (pip install imageio[ffmpeg]); "
+                                  f"use a .gif path to record with Pillow instead.") from e
+            self._writer = imageio.get_writer(path, fps=fps)
+
+    def capture(self, render_fn):
+        """
+        Counts a frame and, if it is due, records render_fn() (an RGB array).
+        """
+        self.captured += 1
+        if (self.captured - 1) % self.frame_skip:
+            return
+        self.append(render_fn())
+
+    def append(self, frame):
+        if self._writer is not None:
+            self._writer.append_data(frame)
+        else:
+            from PIL import Image
+            # palette images keep the buffered GIF frames at a third of the RGB size
+            self._frames.append(Image.fromarray(frame).quantize(colors=256))
+        self.written += 1
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        elif self._frames:
+            self._frames[0].save(self.path, save_all=True, append_images=self._frames[1:],
+                                 duration=int(1000 / self.fps), loop=0)
+            self._frames = []
@@ -0,0 +1,165 @@
+# gym_betse/utils/result_cache.py
+
+import hashlib
+import os
+import tempfile
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class ResultCache:
+    """
+    Memoizes simulation outcomes: the observation history of a run, keyed on a hash of the state the
+    run started from and the parameter vector it ran with.
+
+    Lookups go through an in-memory LRU tier first and then an on-disk, content-addressed tier
+    (one .npy file per key). Disk entries are published with an atomic rename, and writers racing on
+    a key write identical content, so several workers can share one cache directory.
+    """
+    def __init__(self, cache_dir=None, max_entries=4096, max_bytes=None, max_age=None):
+        """
+        :param cache_dir: Directory of the on-disk tier; None keeps results in memory only.
+        :param max_entries: Size of the in-memory LRU tier.
+        :param max_bytes: Evict least recently used disk entries once the directory grows past this size.
+        :param max_age: Evict disk entries that have not been used for this many seconds.
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.memory = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(namespace, state, action):
+        """
+        :param namespace: Anything else the outcome depends on (config contents, backend), as a string.
+        :param state: Observation the run starts from.
+        :param action: Resolved parameter vector the run applies.
+        """
+        digest = hashlib.sha256(namespace.encode())
+        for array in (state, action):
+            array = np.ascontiguousarray(() if array is None else array, dtype=np.float64)
+            digest.update(str(array.shape).encode())
+            digest.update(array.tobytes())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.npy")
+
+    def _remember(self, key, result):
+        self.memory[key] = result
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def get(self, key):
+        """
+        :return: The cached result (a read-only array), or None on a miss.
+        """
+        result = self.memory.get(key)
+        if result is not None:
+            self.memory.move_to_end(key)
+            self.memory_hits += 1
+            return result
+        if self.cache_dir is not None:
+            path = self._path(key)
+            try:
+                result = np.load(path)
+            except (OSError, ValueError):
+                result = None
+            if result is not None:
+                result.flags.writeable = False
+                self._remember(key, result)
+                # mark as recently used for eviction
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+                self.disk_hits += 1
+                return result
+        self.misses += 1
+        return None
+
+    def put(self, key, result):
+        result = np.array(result)
+        result.flags.writeable = False
+        self._remember(key, result)
+        self.stores += 1
+        if self.cache_dir is None:
+            return
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, staging = tempfile.mkstemp(prefix=".tmp-", suffix=".npy", dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as file:
+            np.save(file, result)
+        os.replace(staging, path)
+        if self.max_bytes is not None or self.max_age is not None:
+            self.evict()
+
+    def _entries(self):
+        entries = []
+        for shard in os.listdir(self.cache_dir):
+            shard_dir = os.path.join(self.cache_dir, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                if name.startswith(".tmp-"):
+                    continue
+                path = os.path.join(shard_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    def evict(self):
+        """
+        Drops disk entries older than max_age, then least recently used ones until under max_bytes.
+        """
+        entries = self._entries()
+        if self.max_age is not None:
+            cutoff = time.time() - self.max_age
+            for _, _, path in [e for e in entries if e[0] < cutoff]:
+                self._remove(path)
+            entries = [e for e in entries if e[0] >= cutoff]
+        if self.max_bytes is not None:
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        stats = {
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            'stores': self.stores,
+            'memory_entries': len(self.memory),
+        }
+        if self.cache_dir is not None:
+            entries = self._entries()
+            stats['disk_entries'] = len(entries)
+            stats['disk_bytes'] = sum(size for _, size, _ in entries)
+        return stats
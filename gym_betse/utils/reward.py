@@ -0,0 +1,166 @@
+# gym_betse/utils/reward.py
+
+import h5py
+import numpy as np
+
+
+def _is_tensor(array):
+    # checked by module name so that NumPy callers never import torch
+    return type(array).__module__.startswith('torch')
+
+
+class TargetReward:
+    """
+    Reward for driving the cluster towards a spatial voltage pattern.
+
+    The distance of a state from the target is the weighted mean, over the cells in mask, of
+    |voltage - target| ** power. Everything is evaluated on whole arrays with the cells on the last
+    axis, so one call scores a single step of BetseEnv, a (batch, time, cells) block of stored
+    transitions, or a torch tensor of (num_envs, cells) surrogate observations, on any device.
+
+    The reward of a transition from state through next_states is
+
+        -terminal_weight * d(final) - path_weight * mean_t d(next_states[t])
+        + shaping * (d(state) - discount * d(final)) + success_bonus * [d(final) <= tolerance]
+
+    where the shaping term is the potential-based progress bonus (Ng et al., 1999), which leaves
+    the optimal policy unchanged.
+    """
+    def __init__(self, target, mask=None, weights=None, power=2, terminal_weight=1.0, path_weight=0.0,
+                 shaping=0.0, discount=1.0, success_bonus=0.0, tolerance=None, num_cells=None):
+        """
+        :param target: Target voltage in volts, per cell (cells,) or one value for all cells.
+        :param mask: Boolean (cells,) array of the cells that count; None counts all of them.
+        :param weights: Relative (cells,) importance of every cell; None weighs them equally.
+        :param power: 2 scores squared errors, 1 absolute errors.
+        :param num_cells: Number of cells, needed only when target, mask and weights are all scalars.
+        """
+        target = np.asarray(target, dtype=np.float64)
+        sizes = {np.size(a) for a in (target, mask, weights) if a is not None and np.ndim(a) > 0}
+        if num_cells is not None:
+            sizes.add(num_cells)
+        if len(sizes) != 1:
+            raise ValueError(f"Cannot tell the number of cells from target, mask and weights (sizes {sizes}).")
+        cells = sizes.pop()
+        self.target = np.broadcast_to(target, (cells,)).copy()
+        weights = np.ones(cells) if weights is None else np.asarray(weights, dtype=np.float64)
+        if mask is not None:
+            weights = np.where(np.asarray(mask, dtype=bool), weights, 0.0)
+        if weights.sum() <= 0:
+            raise ValueError("The mask and weights leave no cell to score.")
+        # normalized, so distances are comparable between masks
+        self.weights = weights / weights.sum()
+        self.power = power
+        self.terminal_weight = terminal_weight
+        self.path_weight = path_weight
+        self.shaping = shaping
+        self.discount = discount
+        self.success_bonus = success_bonus
+        self.tolerance = tolerance
+        self._tensors = {}
+
+    def _parameters(self, states):
+        if not _is_tensor(states):
+            return self.target, self.weights
+        import torch
+        key = (states.dtype, states.device)
+        if key not in self._tensors:
+            self._tensors[key] = tuple(torch.as_tensor(a, dtype=states.dtype, device=states.device)
+                                       for a in (self.target, self.weights))
+        return self._tensors[key]
+
+    def distance(self, states):
+        """
+        :param states: Array or tensor of shape (..., cells).
+        :return: Distance of every state from the target, shape (...).
+        """
+        if not _is_tensor(states):
+            states = np.asarray(states, dtype=np.float64)
+        target, weights = self._parameters(states)
+        return (abs(states - target) ** self.power * weights).sum(-1)
+
+    def _bonus(self, distance):
+        if self.tolerance is None or not self.success_bonus:
+            return 0.0
+        return self.success_bonus * (distance <= self.tolerance)
+
+    def state_reward(self, states):
+        """
+        Reward of being in states, e.g. a KoopmanSurrogateEnv reward_fn.
+
+        :param states: Array or tensor of shape (..., cells).
+        :return: Shape (...).
+        """
+        distance = self.distance(states)
+        return -self.terminal_weight * distance + self._bonus(distance)
+
+    def __call__(self, state, next_states, seq_len=None):
+        """
+        :param state: States the transitions start from, shape (..., cells).
+        :param next_states: Sequences they produced, shape (..., time, cells), padded past seq_len.
+        :param seq_len: Valid steps per sequence, shape (...); None if no sequence is padded.
+        :return: Reward per transition, shape (...); a float for a single transition.
+        """
+        tensor = _is_tensor(next_states)
+        distances = self.distance(next_states)
+        steps = distances.shape[-1]
+        if seq_len is None:
+            final = distances[..., -1]
+            path = distances.mean(-1) if self.path_weight else 0.0
+        else:
+            if tensor:
+                import torch
+                seq_len = torch.as_tensor(seq_len, device=distances.device)
+                last = (seq_len.long() - 1).unsqueeze(-1)
+                final = torch.take_along_dim(distances, last, -1).squeeze(-1)
+                valid = torch.arange(steps, device=distances.device) < seq_len.unsqueeze(-1)
+            else:
+                seq_len = np.asarray(seq_len)
+                final = np.take_along_axis(distances, (seq_len.astype(np.int64) - 1)[..., None], -1)[..., 0]
+                valid = np.arange(steps) < seq_len[..., None]
+            path = (distances * valid).sum(-1) / seq_len if self.path_weight else 0.0
+
+        reward = -self.terminal_weight * final - self.path_weight * path + self._bonus(final)
+        if self.shaping:
+            reward = reward + self.shaping * (self.distance(state) - self.discount * final)
+        if not tensor and np.ndim(reward) == 0:
+            return float(reward)
+        return reward
+
+
+def _padded_block(transitions, layout, start, stop):
+    # next_states of transitions start:stop as a (rows, longest sequence, cells) array
+    seq_len = transitions['seq_len'][start:stop]
+    longest = int(seq_len.max())
+    if layout != 'ragged':
+        return transitions['next_states'][start:stop, :longest], seq_len
+    offsets = transitions['offsets'][start:stop]
+    first = int(offsets[0])
+    flat = transitions['next_states'][first:int(offsets[-1] + seq_len[-1])]
+    # rows past a sequence's end repeat its last state; they are masked by seq_len anyway
+    rows = offsets[:, None] - first + np.minimum(np.arange(longest), seq_len[:, None] - 1)
+    return flat[rows], seq_len
+
+
+def relabel_rewards(filepath, reward_fn, block_size=4096, write=False):
+    """
+    Scores every transition stored by DataStorage with reward_fn, a block of transitions at a time.
+
+    :param reward_fn: Callable like TargetReward: (state, next_states, seq_len) arrays -> rewards.
+    :param write: Replace the stored rewards; the file must not be open for writing elsewhere.
+    :return: float32 array of the new rewards.
+    """
+    with h5py.File(filepath, 'r+' if write else 'r') as h5file:
+        transitions = h5file['transitions']
+        layout = transitions.attrs.get('layout', 'padded')
+        length = int(transitions.attrs.get('length', transitions['state'].shape[0]))
+        if transitions.attrs.get('swmr', False):
+            length = min(length, transitions['seq_len'].shape[0])
+        rewards = np.zeros(length, dtype=np.float32)
+        for start in range(0, length, block_size):
+            stop = min(start + block_size, length)
+            next_states, seq_len = _padded_block(transitions, layout, start, stop)
+            rewards[start:stop] = reward_fn(transitions['state'][start:stop], next_states, seq_len)
+        if write:
+            transitions['reward'][:length] = rewards
+    return rewards
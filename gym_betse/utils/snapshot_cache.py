@@ -0,0 +1,150 @@
+# gym_betse/utils/snapshot_cache.py
+
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import yaml
+from gym_betse.utils.yaml_friend import get_grn_config_path
+from gym_betse.utils.workspace import get_init_artifacts
+
+
+class SnapshotCache:
+    """
+    Content-addressed cache of the post-init state of a BETSE simulation.
+
+    Entries are keyed on the hash of the config file (plus the GRN config it references and the
+    simulator backend, whose saved states are not interchangeable) and hold the
+    files written by the seed and init phases. Restoring an entry places those files where BETSE
+    expects them, so the simulation can be loaded with load_init instead of re-running seed and init.
+    Entries are published with an atomic rename, so several workers can share one cache directory.
+    """
+    def __init__(self, cache_dir='cache/snapshots', max_bytes=None, max_age=None, link=True):
+        """
+        :param cache_dir: Directory holding one sub-directory per cached config.
+        :param max_bytes: Evict least recently used entries once the cache grows past this size.
+        :param max_age: Evict entries that have not been used for this many seconds.
+        :param link: Restore entries as hard links instead of copies where the filesystem allows it.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.link = link
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def config_key(self, config_path, backend=None):
+        """
+        :param backend: Qualified name of the simulator wrapper class; None for plain BETSE.
+        """
+        digest = hashlib.sha256()
+        if backend is not None:
+            digest.update(f"backend:{backend}\n".encode())
+        with open(config_path, 'rb') as file:
+            data = file.read()
+        digest.update(data)
+        grn_config_path = get_grn_config_path(yaml.safe_load(data) or {}, config_path)
+        if grn_config_path and os.path.isfile(grn_config_path):
+            with open(grn_config_path, 'rb') as file:
+                digest.update(file.read())
+        return digest.hexdigest()
+
+    def _entry_files(self, entry, artifacts):
+        # prefix with the index so artifacts sharing a basename cannot collide
+        return [os.path.join(entry, f"{i}_{os.path.basename(path)}") for i, path in enumerate(artifacts)]
+
+    def restore(self, config_path, suffix='', backend=None):
+        """
+        Places the cached seed/init files for this config in its output folders.
+
+        :param suffix: File name suffix of the simulator backend's artifacts (see get_init_artifacts).
+        :param backend: Simulator backend the entry was stored for (see config_key).
+        :return: True on a cache hit, False if the config has not been cached yet.
+        """
+        entry = os.path.join(self.cache_dir, self.config_key(config_path, backend))
+        artifacts = get_init_artifacts(config_path, suffix)
+        cached = self._entry_files(entry, artifacts)
+        if not all(os.path.isfile(path) for path in cached):
+            self.misses += 1
+            return False
+
+        for source, target in zip(cached, artifacts):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            if os.path.lexists(target):
+                os.remove(target)
+            try:
+                if not self.link:
+                    raise OSError("linking disabled")
+                os.link(source, target)
+            except OSError:
+                shutil.copy2(source, target)
+        # mark as recently used for eviction
+        os.utime(entry)
+        self.hits += 1
+        return True
+
+    def release(self, config_path, suffix=''):
+        """
+        Removes the seed/init files of this config from its output folders. Call this before
+        re-running seed/init, so BETSE never writes through a hard link into a cache entry.
+        """
+        for path in get_init_artifacts(config_path, suffix):
+            if os.path.lexists(path):
+                os.remove(path)
+
+    def store(self, config_path, suffix='', backend=None):
+        """
+        Adds the seed/init files BETSE just wrote for this config to the cache.
+        """
+        entry = os.path.join(self.cache_dir, self.config_key(config_path, backend))
+        if os.path.isdir(entry):
+            return
+        artifacts = get_init_artifacts(config_path, suffix)
+        staging = tempfile.mkdtemp(prefix=".tmp-", dir=self.cache_dir)
+        for source, target in zip(artifacts, self._entry_files(staging, artifacts)):
+            shutil.copy2(source, target)
+        try:
+            os.rename(staging, entry)
+        except OSError:
+            # another worker published the same entry first
+            shutil.rmtree(staging, ignore_errors=True)
+        self.evict()
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.startswith(".tmp-") or not os.path.isdir(path):
+                continue
+            size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+            entries.append((os.path.getmtime(path), size, path))
+        return sorted(entries)
+
+    def evict(self):
+        """
+        Drops entries older than max_age, then least recently used entries until under max_bytes.
+        """
+        entries = self._entries()
+        if self.max_age is not None:
+            cutoff = time.time() - self.max_age
+            for mtime, _, path in [e for e in entries if e[0] < cutoff]:
+                shutil.rmtree(path, ignore_errors=True)
+            entries = [e for e in entries if e[0] >= cutoff]
+        if self.max_bytes is not None:
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+
+    def stats(self):
+        entries = self._entries()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+        }
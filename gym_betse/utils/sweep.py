@@ -0,0 +1,246 @@
+# gym_betse/utils/sweep.py
+"""
+Parameter sweeps: sample_parameters draws many parameter vectors at once, and run_sweep simulates a
+config for each of them in a process pool. Every finished run is appended to a manifest in the
+sweep directory, so running the same sweep again only simulates what is missing.
+
+Run from the repository root, e.g.:
+    python -m gym_betse.utils.sweep gym_betse/config/betse_config.yaml sweeps/lhs --samples 1000 --method lhs
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from gym_betse.utils import yaml_friend
+from gym_betse.utils.workspace import create_workspace
+
+SAMPLING_METHODS = ('uniform', 'log_uniform', 'lhs')
+MANIFEST = "manifest.jsonl"
+
+
+def parameter_bounds(base_values, spread=0.5):
+    """
+    :return: (low, high) arrays spanning +-spread of each base value, the range perturb_values draws from.
+    """
+    base_values = np.asarray(base_values, dtype=np.float64)
+    return np.minimum(base_values * (1 - spread), base_values * (1 + spread)), \
+        np.maximum(base_values * (1 - spread), base_values * (1 + spread))
+
+
+def sample_parameters(low, high, num_samples, method='uniform', seed=None, significant_figures=None):
+    """
+    Draws num_samples parameter vectors within [low, high] per parameter.
+
+    :param method: 'uniform', 'log_uniform' (uniform in log space, needs positive bounds) or 'lhs'
+        (Latin hypercube: each parameter's range is cut into num_samples strata that are each
+        sampled exactly once).
+    :param significant_figures: Round the samples, e.g. to keep the written configs readable.
+    :return: Array of shape (num_samples, num_parameters).
+    """
+    low = np.asarray(low, dtype=np.float64)
+    high = np.asarray(high, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    shape = (num_samples, len(low))
+    if method == 'uniform':
+        samples = rng.uniform(low, high, size=shape)
+    elif method == 'log_uniform':
+        if np.any(low <= 0) or np.any(high <= 0):
+            raise ValueError("Log-uniform sampling needs positive bounds.")
+        samples = np.exp(rng.uniform(np.log(low), np.log(high), size=shape))
+    elif method == 'lhs':
+        strata = rng.permuted(np.tile(np.arange(num_samples)[:, None], (1, len(low))), axis=0)
+        samples = low + (high - low) * (strata + rng.uniform(size=shape)) / num_samples
+    else:
+        raise ValueError(f"Unknown sampling method '{method}', expected one of {SAMPLING_METHODS}.")
+    if significant_figures is not None:
+        # clip to bounds that are themselves rounded, so clipped samples keep the precision too
+        low = _round_inward(low, significant_figures, 1.0)
+        high = _round_inward(high, significant_figures, -1.0)
+        if np.any(low > high):
+            raise ValueError(f"Some bounds hold no value with {significant_figures} significant figures.")
+        samples = np.clip(yaml_friend.round_significant(samples, significant_figures), low, high)
+    return samples
+
+
+def _round_inward(bounds, significant_figures, direction):
+    # rounds to significant figures, then steps one unit in the last place in direction (+1 up, -1 down)
+    # wherever rounding moved a bound the other way
+    rounded = yaml_friend.round_significant(bounds, significant_figures)
+    magnitude = np.floor(np.log10(np.where(rounded == 0, 1.0, np.abs(rounded))))
+    unit = 10.0 ** (magnitude - significant_figures + 1)
+    outside = (rounded - bounds) * direction < 0
+    return yaml_friend.round_significant(np.where(outside, rounded + direction * unit, rounded), significant_figures)
+
+
+def run_key(paths, values):
+    """
+    :return: Content hash identifying a run by its parameter paths and values.
+    """
+    digest = hashlib.sha256("\n".join(paths).encode())
+    digest.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def materialize_config(config_path, paths, values, run_dir):
+    """
+    Mirrors the config into run_dir (see create_workspace) and writes the values at the given paths.
+
+    :return: Path to the run's config.
+    """
+    run_config = create_workspace(config_path, run_dir)
+    accessor = yaml_friend.ParamAccessor(run_config, paths)
+    accessor.set_values([float(value) for value in values])
+    accessor.write(run_config, force=True)
+    return run_config
+
+
+def simulate_config(config_path, backend='betse'):
+    """
+    Runs seed, init and sim for one config.
+
+    :param backend: Name in betse_interface.SIMULATOR_BACKENDS.
+    :return: vm_ave_time of the sim as an array of shape (samples, cells).
+    """
+    from gym_betse.utils.betse_interface import simulator_backend
+    log_path = os.path.join(os.path.dirname(os.path.abspath(config_path)), "experiment_log.txt")
+    model = simulator_backend(backend)(config_path, log_filename=log_path, log_level="NONE")
+    model.run_seed()
+    model.run_init()
+    model.run_sim()
+    return np.asarray(model.phase.sim.vm_ave_time)
+
+
+def _run(task):
+    # process pool entry point: build the run's config, simulate it and save the result next to it
+    index, key, config_path, paths, values, run_dir, backend = task
+    start = time.perf_counter()
+    try:
+        run_config = materialize_config(config_path, paths, values, run_dir)
+        result = simulate_config(run_config, backend)
+        np.save(os.path.join(run_dir, "vm_ave_time.npy"), result)
+    except Exception as e:
+        return {'run': index, 'key': key, 'status': 'failed', 'error': repr(e),
+                'seconds': time.perf_counter() - start}
+    return {'run': index, 'key': key, 'status': 'done', 'result': os.path.join(os.path.basename(run_dir),
+                                                                                "vm_ave_time.npy"),
+            'seconds': time.perf_counter() - start}
+
+
+def read_manifest(sweep_dir):
+    """
+    :return: Dict of run key to the last manifest record of that run.
+    """
+    records = {}
+    path = os.path.join(sweep_dir, MANIFEST)
+    if not os.path.exists(path):
+        return records
+    with open(path, 'r') as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # a line cut short by an interruption
+                continue
+            records[record['key']] = record
+    return records
+
+
+def run_sweep(config_path, paths, values, sweep_dir, workers=None, backend='betse', log_every=10.0):
+    """
+    Simulates config_path once per row of values, skipping rows the manifest records as done.
+
+    Each run gets its own directory sweep_dir/run_<index> holding the config and vm_ave_time.npy.
+    Only this process writes the manifest, one JSON line per finished run, so an interruption loses
+    at most the runs in flight. Failed runs are recorded and retried on the next call.
+
+    :param paths: Parameter paths the columns of values map onto (as in params.txt).
+    :param values: Array of shape (runs, len(paths)), e.g. from sample_parameters.
+    :param workers: Number of processes (default: CPU count); 1 runs in this process.
+    :return: Dict with the number of runs done now, skipped as already done, and failed.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    os.makedirs(sweep_dir, exist_ok=True)
+    config_path = os.path.abspath(config_path)
+    np.save(os.path.join(sweep_dir, "values.npy"), values)
+    with open(os.path.join(sweep_dir, "sweep.json"), 'w') as file:
+        json.dump({'config_path': config_path, 'paths': list(paths), 'backend': backend}, file, indent=2)
+
+    completed = {key for key, record in read_manifest(sweep_dir).items() if record['status'] == 'done'}
+    tasks = []
+    for index, row in enumerate(values):
+        key = run_key(paths, row)
+        if key not in completed:
+            tasks.append((index, key, config_path, list(paths), row,
+                          os.path.abspath(os.path.join(sweep_dir, f"run_{index:05d}")), backend))
+    summary = {'done': 0, 'skipped': len(values) - len(tasks), 'failed': 0}
+
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+    start = last_log = time.perf_counter()
+    manifest_path = os.path.join(sweep_dir, MANIFEST)
+    with open(manifest_path, 'a+') as manifest:
+        # terminate a line an interruption cut short, so the next record starts on its own line
+        if manifest.tell() > 0:
+            manifest.seek(manifest.tell() - 1)
+            if manifest.read(1) != "\n":
+                manifest.write("\n")
+        def record(result):
+            manifest.write(json.dumps(result) + "\n")
+            manifest.flush()
+            summary['done' if result['status'] == 'done' else 'failed'] += 1
+
+        if workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(_run, task) for task in tasks]
+                for future in as_completed(futures):
+                    record(future.result())
+                    now = time.perf_counter()
+                    if log_every and now - last_log >= log_every:
+                        finished = summary['done'] + summary['failed']
+                        print(f"{finished}/{len(tasks)} runs ({finished / (now - start):.2f}/s)")
+                        last_log = now
+        else:
+            for task in tasks:
+                record(_run(task))
+    return summary
+
+
+def load_results(sweep_dir):
+    """
+    :return: (values of the finished runs, list of their vm_ave_time arrays), in run order.
+    """
+    values = np.load(os.path.join(sweep_dir, "values.npy"))
+    with open(os.path.join(sweep_dir, "sweep.json"), 'r') as file:
+        paths = json.load(file)['paths']
+    # records of rows that were since replaced by other values don't count
+    records = {record['run']: record for record in read_manifest(sweep_dir).values()
+               if record['status'] == 'done' and record['run'] < len(values)
+               and record['key'] == run_key(paths, values[record['run']])}
+    runs = sorted(records)
+    return values[runs], [np.load(os.path.join(sweep_dir, records[run]['result'])) for run in runs]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("config", help="BETSE config to sweep")
+    parser.add_argument("sweep_dir", help="output directory; rerunning with the same one resumes the sweep")
+    parser.add_argument("--params", default=None, help="parameter paths (default: params.txt next to the config)")
+    parser.add_argument("--samples", type=int, default=100)
+    parser.add_argument("--method", choices=SAMPLING_METHODS, default='lhs')
+    parser.add_argument("--spread", type=float, default=0.5, help="relative range around the config's values")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--backend", default='betse', help="simulator backend, e.g. reduced_order")
+    args = parser.parse_args()
+
+    params_path = args.params or os.path.join(os.path.dirname(os.path.abspath(args.config)), "params.txt")
+    param_paths = yaml_friend.get_param_list(params_path)
+    base = yaml_friend.ParamAccessor(args.config, param_paths).get_values()
+    samples = sample_parameters(*parameter_bounds(base, args.spread), args.samples, method=args.method,
+                                seed=args.seed, significant_figures=3)
+    print(run_sweep(args.config, param_paths, samples, args.sweep_dir, workers=args.workers, backend=args.backend))
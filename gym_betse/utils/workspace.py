@@ -0,0 +1,80 @@
+# gym_betse/utils/workspace.py
+
+import os
+import shutil
+import yaml
+
+# Config keys naming the folders BETSE writes into, relative to the config file.
+OUTPUT_DIR_KEYS = [
+    ("init file saving", "directory"),
+    ("sim file saving", "directory"),
+    ("results file saving", "init directory"),
+    ("results file saving", "sim directory"),
+]
+
+
+def get_output_dirs(config_path):
+    """
+    :param config_path: Path to a BETSE config file.
+    :return: Set of top-level folder names (relative to the config file) that BETSE writes into.
+    """
+    with open(config_path, 'r') as file:
+        config = yaml.safe_load(file) or {}
+
+    output_dirs = set()
+    for section, key in OUTPUT_DIR_KEYS:
+        directory = config.get(section, {}).get(key)
+        if directory and not os.path.isabs(directory):
+            output_dirs.add(os.path.normpath(directory).split(os.sep)[0])
+    return output_dirs
+
+
+def get_init_artifacts(config_path, suffix=''):
+    """
+    :param config_path: Path to a BETSE config file.
+    :param suffix: Appended to the file names, for simulator backends that save beside BETSE's files.
+    :return: Absolute paths of the files written by the seed phase (cell cluster) and the init phase.
+    """
+    with open(config_path, 'r') as file:
+        config = yaml.safe_load(file) or {}
+
+    init_saving = config.get("init file saving", {})
+    init_dir = os.path.join(os.path.dirname(os.path.abspath(config_path)), init_saving.get("directory", ""))
+    return [os.path.join(init_dir, init_saving[key] + suffix) for key in ("worldfile", "file")]
+
+
+def create_workspace(config_path, working_dir):
+    """
+    Mirrors the directory of a BETSE config file into a private working directory, so that several
+    simulations built from the same config do not clobber each other's outputs.
+
+    Inputs that BETSE only reads (geometry images, extra configs, parameter lists) are symlinked,
+    falling back to a copy where symlinks are unavailable. The folders BETSE writes into are left out
+    and get recreated inside the workspace on the first seed/init.
+
+    :param config_path: Path to the BETSE config file to mirror.
+    :param working_dir: Directory to mirror it into. Created if it does not exist.
+    :return: Path to the copy of the config file inside the workspace.
+    """
+    config_path = os.path.abspath(config_path)
+    config_dir = os.path.dirname(config_path)
+    config_name = os.path.basename(config_path)
+    os.makedirs(working_dir, exist_ok=True)
+
+    skip = get_output_dirs(config_path) | {config_name}
+    for entry in os.listdir(config_dir):
+        target = os.path.join(working_dir, entry)
+        if entry in skip or os.path.lexists(target):
+            continue
+        source = os.path.join(config_dir, entry)
+        try:
+            os.symlink(source, target, target_is_directory=os.path.isdir(source))
+        except OSError:
+            if os.path.isdir(source):
+                shutil.copytree(source, target)
+            else:
+                shutil.copy2(source, target)
+
+    workspace_config = os.path.join(working_dir, config_name)
+    shutil.copy(config_path, workspace_config)
+    return workspace_config
@@ -1,10 +1,34 @@
 import yaml
 import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
 
+# libyaml-backed loader/dumper are several times faster; fall back to pure Python without them
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
+
 EXTRA_CONFIGS = "extra_configs"
 
+# Parameters extracted by create_params_dataset when no parameter file is given
+DEFAULT_PARAMS = [
+    "config/tissue profile definition/tissue/default/diffusion constants/Dm_Cl",
+    "config/tissue profile definition/tissue/default/diffusion constants/Dm_Na",
+    "config/tissue profile definition/tissue/default/diffusion constants/Dm_K",
+    "config/tissue profile definition/tissue/default/diffusion constants/Dm_Ca",
+    "config/variable settings/gap junctions/gap junction surface area",
+    "config/variable settings/gap junctions/gj minimum",
+    "config/variable settings/gap junctions/gj voltage threshold",
+    "grn/biomolecules/Dgj",
+    "grn/biomolecules/cell conc",
+    "grn/biomolecules/growth and decay/decay rate",
+    "grn/biomolecules/growth and decay/production rate",
+    "grn/biomolecules/z",
+]
+
 def extract_params_recursive(config, param_path, prefix=""):
     """
     Recursively extracts parameters from a nested dictionary or list based on a parameter path.
@@ -37,34 +61,55 @@ def extract_params_recursive(config, param_path, prefix=""):
             extracted.update(extract_params_recursive(item, remaining_path, item_prefix))
     return extracted
 
-def extract_params(params, config_path, params_to_extract):
+def get_grn_config_path(config, config_path):
     """
-    Extracts desired parameters from YAML files and saves them to a dictionary.
+    :param config: Parsed main BETSE config.
+    :param config_path: Path the config was read from, used to resolve relative GRN paths.
+    :return: Path to the GRN config referenced by the main config, or None if there is none.
+    """
+    grn_config_path = config.get("gene regulatory network settings", {}).get("gene regulatory network config")
+    if not grn_config_path or not isinstance(grn_config_path, str):
+        return None
+    if not os.path.isabs(grn_config_path):
+        grn_config_path = os.path.join(os.path.dirname(config_path), grn_config_path)
+    return grn_config_path
+
+
+def extract_file_params(config_path, params_to_extract):
+    """
+    Extracts the desired parameters from one config (and the GRN config it references).
+
+    :return: Dict of column name to value, or None if the config can't be read. Parameters that
+        expand over a list of named entries produce one column per entry (e.g. ".../change rate_X");
+        missing parameters are left out.
     """
+    return _extract_file(config_path, params_to_extract)[0]
+
+
+def _extract_file(config_path, params_to_extract):
+    row = {}
     # Load the main YAML configuration
     try:
         with open(config_path, 'r') as file:
-            config = yaml.safe_load(file)
+            config = yaml.load(file, Loader=SafeLoader)
     except Exception as e:
         print(f"Error reading {config_path}: {e}")
-        return params
+        return None, None
 
     # Attempt to load the GRN config if specified
     grn_config = None
-    grn_config_path = config.get("gene regulatory network settings", {}).get("gene regulatory network config")
+    grn_config_path = get_grn_config_path(config, config_path)
     if grn_config_path:
-        if not os.path.isabs(grn_config_path):
-            grn_config_path = os.path.join(os.path.dirname(config_path), grn_config_path)
         try:
             with open(grn_config_path, 'r') as file:
-                grn_config = yaml.safe_load(file)
+                grn_config = yaml.load(file, Loader=SafeLoader)
         except Exception as e:
             print(f"Error reading GRN config {grn_config_path}: {e}")
 
     # Extract parameters
     for param in params_to_extract:
         if "ID" in param:
-            params[param].append(os.path.basename(os.path.dirname(config_path)))
+            row[param] = os.path.basename(os.path.dirname(config_path))
             continue
 
         param_parts = param.split("/")
@@ -72,20 +117,104 @@ def extract_params(params, config_path, params_to_extract):
 
         source_config = config if filetype == "config" else grn_config
         if source_config is None:
-            params[param].append(None)
             continue
+        row.update(extract_params_recursive(source_config, param_parts, param))
+    return row, grn_config_path
 
-        extracted = extract_params_recursive(source_config, param_parts, param)
-        for key, value in extracted.items():
-            if key not in params:
-                params[key] = []
-                # Fill with None for previous entries
-                params[key].extend([None] * len(params[param]))
-            params[key].append(value)
 
+def extract_params(params, config_path, params_to_extract):
+    """
+    Extracts desired parameters from YAML files and saves them to a dictionary.
+    """
+    row = extract_file_params(config_path, params_to_extract)
+    if row is None:
+        return params
+    length = max((len(v) for v in params.values()), default=0)
+    for key, value in row.items():
+        if key not in params:
+            params[key] = []
+        # Fill with None for previous entries
+        params[key].extend([None] * (length - len(params[key])))
+        params[key].append(value)
     return params
 
 
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _scan_file(task):
+    # process pool entry point: extract one file and record the files its row depends on
+    config_path, params_to_extract = task
+    row, grn_config_path = _extract_file(config_path, params_to_extract)
+    dependencies = {config_path: _file_signature(config_path)}
+    if grn_config_path:
+        dependencies[grn_config_path] = _file_signature(grn_config_path)
+    return config_path, row, dependencies
+
+
+def find_configs(directory_to_analyze):
+    """
+    :return: Sorted paths of the .yaml configs under directory_to_analyze, skipping extra_configs folders.
+    """
+    config_paths = []
+    for root, dirs, files in os.walk(directory_to_analyze):
+        if EXTRA_CONFIGS in root:
+            continue
+        config_paths.extend(os.path.join(root, file) for file in files if file.endswith(".yaml"))
+    return sorted(config_paths)
+
+
+def scan_configs(config_paths, params_to_extract, cache_path=None, workers=None):
+    """
+    Extracts params_to_extract from every config, in a process pool.
+
+    :param cache_path: Pickle file holding the rows of earlier scans keyed on path. A file is only
+        parsed again when its own or its GRN config's mtime or size changed, or when
+        params_to_extract differs from the cached scan.
+    :param workers: Number of worker processes (default: CPU count); 1 scans in this process.
+    :return: List of rows (dicts of column name to value), in the order of config_paths.
+    """
+    cache = {}
+    if cache_path is not None and os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'rb') as file:
+                stored = pickle.load(file)
+            if stored.get('params') == list(params_to_extract):
+                cache = stored['files']
+        except Exception as e:
+            print(f"Ignoring unreadable cache {cache_path}: {e}")
+
+    def is_fresh(entry):
+        return all(_file_signature(path) == signature for path, signature in entry['dependencies'].items())
+
+    stale = [path for path in config_paths if path not in cache or not is_fresh(cache[path])]
+    tasks = [(path, list(params_to_extract)) for path in stale]
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_scan_file, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+    else:
+        results = [_scan_file(task) for task in tasks]
+    for config_path, row, dependencies in results:
+        cache[config_path] = {'row': row, 'dependencies': dependencies}
+
+    if cache_path is not None and (results or len(cache) != len(config_paths)):
+        # keep only files that still exist in the tree, written atomically
+        cache = {path: cache[path] for path in config_paths}
+        directory = os.path.dirname(os.path.abspath(cache_path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as file:
+            pickle.dump({'params': list(params_to_extract), 'files': cache}, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    return [cache[path]['row'] for path in config_paths if cache[path]['row'] is not None]
+
+
 def get_param_list(params_to_extract):
     """
     :param params_to_extract: Text file with newline-separated parameter paths.
@@ -99,42 +228,30 @@ def get_param_list(params_to_extract):
     return params
 
 
-def create_params_dataset(directory_to_analyze, params_to_extract=None, save_param_path=None):
+def create_params_dataset(directory_to_analyze, params_to_extract=None, save_param_path=None,
+                          output_path="Physiology/params_initial_values.csv", cache_path=None, workers=None):
     """
     Creates a pandas DataFrame with parameters extracted from YAML files.
+
+    :param output_path: Where to write the table. The format follows the extension: .parquet or
+        .feather for columnar files (these need pyarrow), .csv otherwise. None skips writing.
+    :param cache_path: Per-file extraction cache (see scan_configs), so reruns only parse changed files.
+    :param workers: Processes parsing configs in parallel (default: CPU count).
+    :return: The DataFrame.
     """
     if params_to_extract is None:
-        params_to_extract = [
-            "ID",
-            "config/tissue profile definition/tissue/default/diffusion constants/Dm_Cl",
-            "config/tissue profile definition/tissue/default/diffusion constants/Dm_Na",
-            "config/tissue profile definition/tissue/default/diffusion constants/Dm_K",
-            "config/tissue profile definition/tissue/default/diffusion constants/Dm_Ca",
-            "config/variable settings/gap junctions/gap junction surface area",
-            "config/variable settings/gap junctions/gj minimum",
-            "config/variable settings/gap junctions/gj voltage threshold",
-            "grn/biomolecules/Dgj",
-            "grn/biomolecules/cell conc",
-            "grn/biomolecules/growth and decay/decay rate",
-            "grn/biomolecules/growth and decay/production rate",
-            "grn/biomolecules/z",
-        ]
+        params_to_extract = ["ID"] + DEFAULT_PARAMS
     else:
         params_to_extract = get_param_list(params_to_extract)
 
-    params_dict = {param: [] for param in params_to_extract}
-    for root, dirs, files in os.walk(directory_to_analyze):
-        if "extra_configs" in root:
-            continue
-        for file in files:
-            if file.endswith(".yaml"):
-                config_path = os.path.join(root, file)
-                params_dict = extract_params(params_dict, config_path, params_to_extract)
-                # see if any lists were not updated (size max - 1) and fill with None
-                max_len = max(len(v) for v in params_dict.values())
-                for k, v in params_dict.items():
-                    if len(v) < max_len:
-                        params_dict[k].extend([None] * (max_len - len(v)))
+    rows = scan_configs(find_configs(directory_to_analyze), params_to_extract, cache_path=cache_path,
+                        workers=workers)
+
+    # columns in order of first appearance, each assembled in one pass over the rows
+    columns = dict.fromkeys(params_to_extract)
+    for row in rows:
+        columns.update(dict.fromkeys(row))
+    params_dict = {key: [row.get(key) for row in rows] for key in columns}
 
     # remove all keys with all None values
     params_dict = {k: v for k, v in params_dict.items() if any(x is not None for x in v)}
@@ -144,12 +261,22 @@ def create_params_dataset(directory_to_analyze, params_to_extract=None, save_par
         params_dict.pop("")
 
     df = pd.DataFrame(params_dict)
-    df.to_csv("Physiology/params_initial_values.csv")
+    if output_path is not None:
+        directory = os.path.dirname(output_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if output_path.endswith(".parquet"):
+            df.to_parquet(output_path)
+        elif output_path.endswith(".feather"):
+            df.to_feather(output_path)
+        else:
+            df.to_csv(output_path)
 
     if save_param_path:
         with open(save_param_path, 'w') as file:
             for key in params_dict.keys():
                 file.write(f"{key}\n")
+    return df
 
 
 def gather_initial_values(values_csv, params_list):
@@ -251,11 +378,165 @@ def update_yaml(file_path, paths, values, write_path=None):
         raise RuntimeError(f"Failed to write updated YAML file '{write_path}': {e}")
 
 
+class ParamAccessor:
+    """
+    Keeps a BETSE config (and the GRN config it references) parsed in memory, with every parameter
+    path resolved once into its parent container and key, so applying an action is a handful of
+    item assignments instead of a full read/parse/walk/dump cycle like update_yaml.
+
+    Paths follow the same rules as update_yaml: a leading "config" or "grn" selects the file, list
+    levels are matched on their "name" field using the "_<name>" suffix of the last path element,
+    and a key with a "_<name>" suffix falls back to the part before the underscore.
+    """
+    def __init__(self, config_path, paths):
+        """
+        :param config_path: Path to the BETSE config to load.
+        :param paths: List of parameter paths, e.g. from get_param_list.
+        """
+        self.config_path = config_path
+        with open(config_path, 'r') as file:
+            self.config = yaml.load(file, Loader=SafeLoader) or {}
+
+        self.grn_config = None
+        self.grn_config_path = get_grn_config_path(self.config, config_path)
+        self.paths = list(paths)
+        self.targets = [self._resolve(path) for path in self.paths]
+        self.dirty = False
+        self.grn_dirty = False
+
+    def _load_grn(self):
+        if self.grn_config is None:
+            if self.grn_config_path is None:
+                raise KeyError(f"'{self.config_path}' does not reference a GRN config.")
+            with open(self.grn_config_path, 'r') as file:
+                self.grn_config = yaml.load(file, Loader=SafeLoader) or {}
+        return self.grn_config
+
+    def _resolve(self, path):
+        """
+        :return: (container, key, is_grn) such that container[key] is the value the path points at.
+        """
+        param_path = path.split("/")
+        is_grn = param_path[0] == "grn"
+        if param_path[0] in ("config", "grn"):
+            param_path.pop(0)
+        node = self._load_grn() if is_grn else self.config
+
+        while True:
+            key = param_path[0]
+            if isinstance(node, list):
+                if "_" not in param_path[-1]:
+                    raise ValueError(f"Key '{key}' does not specify a target name in a list.")
+                _, name_suffix = param_path[-1].split("_", 1)
+                for item in node:
+                    if isinstance(item, dict) and item.get("name") == name_suffix:
+                        node = item
+                        break
+                else:
+                    raise KeyError(f"No list element with 'name' matching '{name_suffix}' found.")
+            elif isinstance(node, dict):
+                if key not in node:
+                    if "_" in key:
+                        key, _ = key.split("_", 1)
+                    else:
+                        raise KeyError(f"Key '{key}' not found in the configuration.")
+                if len(param_path) == 1:
+                    return node, key, is_grn
+                node = node[key]
+                param_path = param_path[1:]
+            else:
+                raise TypeError(f"Unexpected type {type(node)} encountered while traversing '{path}'.")
+
+    def get_values(self):
+        return [container.get(key) for container, key, _ in self.targets]
+
+    def get(self, path, default=None):
+        """
+        :return: Value at a path that need not be one of self.paths, or default if it doesn't resolve.
+        """
+        try:
+            container, key, _ = self._resolve(path)
+        except (KeyError, ValueError, TypeError):
+            return default
+        return container.get(key, default)
+
+    def set_values(self, values):
+        """
+        Assigns the given values to the compiled paths, in order.
+
+        :return: True if any value actually changed.
+        """
+        if len(values) != len(self.targets):
+            raise ValueError("Paths and values must have the same length.")
+        changed = False
+        for (container, key, is_grn), value in zip(self.targets, values):
+            # numpy scalars cannot go through the safe dumper
+            if isinstance(value, np.generic):
+                value = value.item()
+            if key in container and container[key] == value:
+                continue
+            container[key] = value
+            changed = True
+            if is_grn:
+                self.grn_dirty = True
+            else:
+                self.dirty = True
+        return changed
+
+    def write(self, write_path, grn_write_path=None, force=False):
+        """
+        Dumps the config to write_path if anything changed since the last write.
+        Modified GRN parameters go to grn_write_path (default: next to write_path), and the config is
+        pointed at that copy so the original GRN file is never touched.
+        """
+        if self.grn_dirty or (force and self.grn_config is not None):
+            if grn_write_path is None:
+                stem = os.path.splitext(os.path.basename(write_path))[0]
+                grn_write_path = os.path.join(os.path.dirname(write_path), f"{stem}_grn.yaml")
+            try:
+                with open(grn_write_path, 'w') as file:
+                    yaml.dump(self.grn_config, file, Dumper=SafeDumper)
+            except Exception as e:
+                raise RuntimeError(f"Failed to write updated GRN config '{grn_write_path}': {e}")
+            grn_settings = self.config.setdefault("gene regulatory network settings", {})
+            grn_settings["gene regulatory network config"] = os.path.abspath(grn_write_path)
+            self.grn_dirty = False
+            self.dirty = True
+
+        if not (self.dirty or force):
+            return False
+        try:
+            with open(write_path, 'w') as file:
+                yaml.dump(self.config, file, Dumper=SafeDumper)
+        except Exception as e:
+            raise RuntimeError(f"Failed to write updated YAML file '{write_path}': {e}")
+        self.dirty = False
+        return True
+
+
+def round_significant(values, digits):
+    """
+    Rounds every element to the given number of significant figures, like formatting with
+    f"{x:.{digits - 1}e}" and parsing the result back.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    magnitude = np.floor(np.log10(np.where(values == 0, 1.0, np.abs(values))))
+    exponent = digits - 1 - magnitude
+    # scale by exact powers of ten (up to 1e22) and divide by them last, so the result is the nearest double
+    scale = 10.0 ** np.abs(exponent)
+    with np.errstate(over='ignore', invalid='ignore'):
+        rounded = np.where(exponent >= 0, np.round(values * scale) / scale, np.round(values / scale) * scale)
+    inexact = np.abs(exponent) > 22
+    if inexact.any():
+        rounded[inexact] = [float(f"{value:.{digits - 1}e}") for value in values[inexact]]
+    return rounded
+
+
 def perturb_values(values):
     """
     Perturbs the given values by up to 200% of the magnitude of the value in either direction.
     """
-    new_vals = [value + (np.random.uniform(-0.5, 0.5) * value) for value in values]
-    # truncate floats to 2 significant figures
-    new_vals = [f"{x:.2e}" for x in new_vals]
-    return [float(x) for x in new_vals]
\ No newline at end of file
+    values = np.asarray(values, dtype=np.float64)
+    new_vals = values + np.random.uniform(-0.5, 0.5, size=values.shape) * values
+    # truncate floats to 3 significant figures
+    return round_significant(new_vals, 3).tolist()
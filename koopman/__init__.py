@@ -1,8 +1,32 @@
 # koopman/__init__.py
 
-from koopman.dataset import KoopmanDataset
-from koopman.models import KoopmanModel
-from koopman.train_koopman import train_koopman_model
+import importlib
 
-__all__ = ['KoopmanDataset', 'KoopmanModel', 'train_koopman_model']
+# public name -> defining module; torch and h5py load with the first name used, not with the package.
+# edmd() is exported as fit_edmd: the import system binds koopman.edmd to the submodule on first import.
+_MODULES = {
+    'KoopmanDataset': 'koopman.dataset',
+    'ContiguousBatchSampler': 'koopman.dataset',
+    'StreamingKoopmanDataset': 'koopman.dataset',
+    'export_memmap': 'koopman.dataset',
+    'KoopmanModel': 'koopman.models',
+    'train_koopman_model': 'koopman.train_koopman',
+    'EDMDStatistics': 'koopman.edmd',
+    'fit_edmd': ('koopman.edmd', 'edmd'),
+}
 
+__all__ = ['KoopmanDataset', 'ContiguousBatchSampler', 'StreamingKoopmanDataset', 'export_memmap', 'KoopmanModel',
+           'train_koopman_model', 'EDMDStatistics', 'fit_edmd']
+
+
+def __getattr__(name):
+    if name not in _MODULES:
+        raise AttributeError(f"module 'koopman' has no attribute '{name}'")
+    module, attr = _MODULES[name] if isinstance(_MODULES[name], tuple) else (_MODULES[name], name)
+    value = getattr(importlib.import_module(module), attr)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
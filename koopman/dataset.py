@@ -1,31 +1,291 @@
 # koopman/dataset.py
 
+import os
+import time
+import numpy as np
 import torch
-from torch.utils.data import Dataset
+from torch.utils.data import Dataset, IterableDataset, Sampler, get_worker_info
 import h5py
 
+# Arrays written by export_memmap, one .npy file each
+MEMMAP_FIELDS = ['state', 'seq_len', 'offsets', 'next_states']
+
+
+def available_transitions(transitions):
+    """
+    :param transitions: The 'transitions' group of a file written by DataStorage.
+    :return: (number of complete transitions, number of next_states rows they use; None for padded files).
+    """
+    ragged = transitions.attrs.get('layout', 'padded') == 'ragged'
+    if not transitions.attrs.get('swmr', False):
+        # datasets may be over-allocated while DataStorage is writing, 'length' counts the valid rows
+        length = int(transitions.attrs.get('length', transitions['state'].shape[0]))
+        return length, int(transitions.attrs['total_states']) if ragged else None
+    # SWMR files are sized exactly and extend seq_len last, their attributes may be stale
+    for dataset in transitions.values():
+        dataset.refresh()
+    length = min(dataset.shape[0] for name, dataset in transitions.items() if name != 'next_states' or not ragged)
+    # a flush in progress can have extended seq_len before its rows are written; real rows have seq_len >= 1
+    unwritten = np.flatnonzero(transitions['seq_len'][:length] == 0)
+    if unwritten.size:
+        length = int(unwritten[0])
+    if not ragged:
+        return length, None
+    return length, int(transitions['offsets'][length - 1] + transitions['seq_len'][length - 1]) if length else 0
+
+
+def _read_block(source, layout, start, stop):
+    # transitions start:stop with one read per field, as (states, next_states sequences, seq_lens)
+    # np.array copies out of read-only memmaps / shared buffers once per block
+    states = torch.from_numpy(np.array(source['state'][start:stop], dtype=np.float32))
+    seq_lens = np.array(source['seq_len'][start:stop], dtype=np.int64)
+    if layout == 'ragged':
+        offsets = source['offsets'][start:stop]
+        flat = torch.from_numpy(np.array(source['next_states'][offsets[0]:offsets[-1] + seq_lens[-1]],
+                                         dtype=np.float32))
+        sequences = [flat[s:s + n] for s, n in zip(offsets - offsets[0], seq_lens)]
+    else:
+        block = torch.from_numpy(np.array(source['next_states'][start:stop, :seq_lens.max()], dtype=np.float32))
+        sequences = [block[i, :n] for i, n in enumerate(seq_lens)]
+    return states, sequences, torch.from_numpy(seq_lens)
+
+
 class KoopmanDataset(Dataset):
-    def __init__(self, filepath='data/dataset.h5'):
+    """
+    Transitions written by DataStorage, either from an HDF5 file or from a directory produced by
+    export_memmap.
+
+    The HDF5 file is opened lazily and re-opened in every process that touches it, so the dataset
+    is safe to use with DataLoader(num_workers>0). __getitems__ serves a whole batch with one read
+    per field, which pairs well with ContiguousBatchSampler. With preload=True the whole dataset is
+    read into shared-memory tensors up front (or preload='auto' to do so when it fits in
+    max_preload_bytes).
+    """
+    def __init__(self, filepath='data/dataset.h5', preload=False, max_preload_bytes=2 << 30):
         self.filepath = filepath
-        self.h5file = h5py.File(self.filepath, 'r')
-        self.transitions = self.h5file['transitions']
-        self.length = self.transitions['state'].shape[0]
+        self._h5file = None
+        self._pid = None
+        self._arrays = None
+
+        if os.path.isdir(filepath):
+            self.layout = 'ragged'
+            self._arrays = {name: np.load(os.path.join(filepath, f"{name}.npy"), mmap_mode='r')
+                            for name in MEMMAP_FIELDS}
+            self.length = len(self._arrays['state'])
+        else:
+            with h5py.File(self.filepath, 'r', swmr=True) as h5file:
+                transitions = h5file['transitions']
+                self.length, self.total_states = available_transitions(transitions)
+                # 'ragged': next_states is flat and indexed by offsets, 'padded': one padded sequence per row
+                self.layout = transitions.attrs.get('layout', 'padded')
+                nbytes = sum(dataset.size * dataset.dtype.itemsize for dataset in transitions.values())
+            if preload == 'auto':
+                preload = nbytes <= max_preload_bytes
+            if preload:
+                self._preload()
+
+    @property
+    def transitions(self):
+        # (re)open per process: h5py handles must not be shared across fork
+        if self._h5file is None or self._pid != os.getpid():
+            self._h5file = h5py.File(self.filepath, 'r', swmr=True)
+            self._pid = os.getpid()
+        return self._h5file['transitions']
+
+    def _preload(self):
+        transitions = self.transitions
+        names = ['state', 'seq_len', 'next_states'] + (['offsets'] if self.layout == 'ragged' else [])
+        self._arrays = {}
+        for name in names:
+            dataset = transitions[name]
+            rows = self.total_states if name == 'next_states' and self.layout == 'ragged' else self.length
+            # shared memory lets forked DataLoader workers read it without copies
+            self._arrays[name] = torch.from_numpy(dataset[:rows]).share_memory_().numpy()
+        self.close()
+
+    def _source(self):
+        return self._arrays if self._arrays is not None else self.transitions
 
     def __len__(self):
         return self.length
 
     def __getitem__(self, idx):
-        state = self.transitions['state'][idx]
-        next_states = self.transitions['next_states'][idx]
-        seq_len = self.transitions['seq_len'][idx]
-        # Truncate to actual sequence length
-        next_states = next_states[:seq_len]
-        # Convert to tensors
-        state = torch.tensor(state, dtype=torch.float32)
-        next_states = torch.tensor(next_states, dtype=torch.float32)
-        seq_len = torch.tensor(seq_len, dtype=torch.int64)
-        return {'state': state, 'next_states': next_states, 'seq_len': seq_len}
+        return self.__getitems__([idx])[0]
+
+    def __getitems__(self, indices):
+        """
+        Reads a batch of transitions with one read per field instead of three per sample.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        # HDF5 fancy indexing needs increasing, unique indices
+        order, inverse = np.unique(indices, return_inverse=True)
+        source = self._source()
+        if order[-1] - order[0] + 1 == len(order):
+            states, sequences, seq_lens = _read_block(source, self.layout, order[0], order[-1] + 1)
+        else:
+            states, sequences, seq_lens = self._read_rows(source, order)
+        return [{'state': states[i], 'next_states': sequences[i], 'seq_len': seq_lens[i]} for i in inverse]
+
+    def _read_rows(self, source, rows):
+        # _read_block for increasing, non-contiguous rows
+        states = torch.from_numpy(np.array(source['state'][rows], dtype=np.float32))
+        seq_lens = np.array(source['seq_len'][rows], dtype=np.int64)
+        if self.layout == 'ragged':
+            offsets = source['offsets'][rows]
+            # one fancy-indexed read of exactly the rows the batch needs
+            flat = source['next_states'][np.concatenate([np.arange(o, o + n) for o, n in zip(offsets, seq_lens)])]
+            flat = torch.from_numpy(np.array(flat, dtype=np.float32))
+            starts = np.concatenate([[0], np.cumsum(seq_lens[:-1])])
+            sequences = [flat[s:s + n] for s, n in zip(starts, seq_lens)]
+        else:
+            block = torch.from_numpy(np.array(source['next_states'][rows, :seq_lens.max()], dtype=np.float32))
+            sequences = [block[i, :n] for i, n in enumerate(seq_lens)]
+        return states, sequences, torch.from_numpy(seq_lens)
 
     def close(self):
-        self.h5file.close()
+        if self._h5file is not None:
+            self._h5file.close()
+            self._h5file = None
+
+    def __getstate__(self):
+        # open handles do not pickle (spawned DataLoader workers), they are reopened on first use
+        state = self.__dict__.copy()
+        state['_h5file'] = None
+        return state
+
+
+class StreamingKoopmanDataset(IterableDataset):
+    """
+    Follows a file DataStorage is still appending to: iterating yields the transitions already
+    written and then polls the file for new ones, so training can run alongside collection.
+
+    The writer should use DataStorage(swmr=True) and open the file before the first reader does
+    (HDF5 locks it against writers opening it later); other files are read up to their current
+    length only, since HDF5 does not let readers open them while they are being written. Items pass
+    through a shuffle buffer of shuffle_buffer transitions (1 keeps the file order). With
+    DataLoader(num_workers>0) every worker follows its own share of block_size-row blocks.
+    """
+    def __init__(self, filepath='data/dataset.h5', shuffle_buffer=1024, block_size=256, follow=True,
+                 poll_interval=1.0, idle_timeout=None, start=0, seed=None):
+        """
+        :param follow: Keep polling for new transitions; False stops at the end of the file.
+        :param idle_timeout: Stop once no new transitions arrived for this many seconds (None: never).
+        :param start: Index of the first transition to read.
+        :param seed: Seed of the shuffle buffer (offset by the DataLoader worker id).
+        """
+        self.filepath = filepath
+        self.shuffle_buffer = shuffle_buffer
+        self.block_size = block_size
+        self.follow = follow
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        self.start = start
+        self.seed = seed
+
+    def _follow(self):
+        # complete transitions as they appear, in file order, limited to this worker's blocks
+        worker = get_worker_info()
+        worker_id, num_workers = (worker.id, worker.num_workers) if worker is not None else (0, 1)
+        position = self.start
+        last_data = time.monotonic()
+        with h5py.File(self.filepath, 'r', swmr=True) as h5file:
+            transitions = h5file['transitions']
+            layout = transitions.attrs.get('layout', 'padded')
+            swmr = transitions.attrs.get('swmr', False)
+            while True:
+                if (position // self.block_size) % num_workers != worker_id:
+                    # skip to the start of this worker's next block
+                    block = position // self.block_size
+                    block += (worker_id - block) % num_workers
+                    position = block * self.block_size
+                length, _ = available_transitions(transitions)
+                if position < length:
+                    stop = min(length, (position // self.block_size + 1) * self.block_size)
+                    states, sequences, seq_lens = _read_block(transitions, layout, position, stop)
+                    for i in range(len(states)):
+                        yield {'state': states[i], 'next_states': sequences[i], 'seq_len': seq_lens[i]}
+                    position = stop
+                    last_data = time.monotonic()
+                    continue
+                if not (self.follow and swmr) or \
+                        (self.idle_timeout is not None and time.monotonic() - last_data >= self.idle_timeout):
+                    return
+                time.sleep(self.poll_interval)
+
+    def __iter__(self):
+        worker = get_worker_info()
+        rng = np.random.default_rng(None if self.seed is None else self.seed + (worker.id if worker else 0))
+        buffer = []
+        for item in self._follow():
+            if len(buffer) < max(self.shuffle_buffer, 1):
+                buffer.append(item)
+                continue
+            # emit a random buffered item and keep the new one in its place
+            i = rng.integers(len(buffer))
+            yield buffer[i]
+            buffer[i] = item
+        rng.shuffle(buffer)
+        yield from buffer
+
+
+class ContiguousBatchSampler(Sampler):
+    """
+    Yields batches of consecutive indices, shuffling the order of the batches rather than the
+    individual samples, so every batch is a single contiguous read from disk.
+    """
+    def __init__(self, data_source, batch_size, shuffle=True, drop_last=False, generator=None):
+        self.num_samples = len(data_source)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.generator = generator
+
+    def __iter__(self):
+        starts = torch.arange(0, self.num_samples, self.batch_size)
+        if self.drop_last and self.num_samples % self.batch_size:
+            starts = starts[:-1]
+        if self.shuffle:
+            starts = starts[torch.randperm(len(starts), generator=self.generator)]
+        for start in starts.tolist():
+            yield list(range(start, min(start + self.batch_size, self.num_samples)))
+
+    def __len__(self):
+        if self.drop_last:
+            return self.num_samples // self.batch_size
+        return (self.num_samples + self.batch_size - 1) // self.batch_size
+
+
+def export_memmap(filepath, out_dir, block_size=65536):
+    """
+    Exports an HDF5 dataset to uncompressed .npy files that KoopmanDataset(out_dir) memory-maps.
+    Padded files are converted to the ragged layout on the way.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    with h5py.File(filepath, 'r') as h5file:
+        transitions = h5file['transitions']
+        length = int(transitions.attrs.get('length', transitions['state'].shape[0]))
+        layout = transitions.attrs.get('layout', 'padded')
+        seq_len = transitions['seq_len'][:length].astype(np.int32)
+        offsets = np.zeros(length, dtype=np.int64)
+        np.cumsum(seq_len[:-1], out=offsets[1:])
+        total_states = int(seq_len.sum())
+        state_size = transitions['state'].shape[1]
 
+        np.save(os.path.join(out_dir, 'state.npy'), transitions['state'][:length])
+        np.save(os.path.join(out_dir, 'seq_len.npy'), seq_len)
+        np.save(os.path.join(out_dir, 'offsets.npy'), offsets)
+        next_states = np.lib.format.open_memmap(os.path.join(out_dir, 'next_states.npy'), mode='w+',
+                                                dtype=np.float32, shape=(total_states, state_size))
+        for start in range(0, length, block_size):
+            stop = min(start + block_size, length)
+            if layout == 'ragged':
+                source_offsets = transitions['offsets'][start:stop]
+                first, last = source_offsets[0], source_offsets[-1] + seq_len[stop - 1]
+                next_states[offsets[start]:offsets[start] + last - first] = transitions['next_states'][first:last]
+            else:
+                block = transitions['next_states'][start:stop]
+                for i in range(stop - start):
+                    next_states[offsets[start + i]:offsets[start + i] + seq_len[start + i]] = \
+                        block[i, :seq_len[start + i]]
+        next_states.flush()
+    return out_dir
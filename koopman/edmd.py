@@ -0,0 +1,115 @@
+# koopman/edmd.py
+
+import torch
+from torch.utils.data import DataLoader
+from koopman.dataset import KoopmanDataset, ContiguousBatchSampler
+from koopman.train_koopman import custom_collate_fn
+
+
+def lifted_pairs(model, state, next_states, seq_len):
+    """
+    Encodes a padded batch and returns the one-step pairs (z_k, z_k+1) of every valid step.
+
+    As in compute_koopman_loss, next_states[:, k] is taken to be k steps after state, so the
+    trajectory is state, next_states[:, 1], ..., next_states[:, seq_len - 1].
+
+    :return: (X, Y), two (num_pairs, lifted_size) tensors.
+    """
+    trajectory = torch.cat([state.unsqueeze(1), next_states[:, 1:]], dim=1)
+    lifted = model(trajectory)
+    steps = trajectory.shape[1] - 1
+    mask = torch.arange(1, steps + 1, device=seq_len.device) < seq_len.unsqueeze(1)
+    return lifted[:, :-1][mask], lifted[:, 1:][mask]
+
+
+class EDMDStatistics:
+    """
+    Sufficient statistics of the EDMD least-squares problem min_K |X K - Y|^2 for a fixed encoder.
+
+    Only the Gram matrices G = X^T X and A = X^T Y are kept (in float64), so new transitions can be
+    folded in as they are appended to the dataset and K refreshed with one lifted_size x lifted_size
+    solve, without revisiting old data. The row-vector convention matches
+    KoopmanModel.predict_next_lifted: z_k+1 = z_k @ K.
+    """
+    def __init__(self, lifted_size, device='cpu'):
+        self.G = torch.zeros(lifted_size, lifted_size, dtype=torch.float64, device=device)
+        self.A = torch.zeros(lifted_size, lifted_size, dtype=torch.float64, device=device)
+        self.num_pairs = 0
+        # rows of the dataset already folded in, update_from_dataset resumes from here
+        self.num_transitions = 0
+
+    def update(self, X, Y):
+        X = X.to(self.G)
+        Y = Y.to(self.G)
+        self.G += X.T @ X
+        self.A += X.T @ Y
+        self.num_pairs += X.shape[0]
+
+    @torch.no_grad()
+    def update_from_batch(self, model, state, next_states, seq_len):
+        self.update(*lifted_pairs(model, state, next_states, seq_len))
+
+    @torch.no_grad()
+    def update_from_dataset(self, model, dataset, batch_size=1024, num_workers=0):
+        """
+        Folds in the transitions of dataset that have not been seen yet.
+
+        :param dataset: KoopmanDataset or path to the file DataStorage writes to. A path is reopened
+            on every call, so transitions flushed since the last call are picked up.
+        :return: Number of new transitions.
+        """
+        if not isinstance(dataset, KoopmanDataset):
+            dataset = KoopmanDataset(dataset)
+        start = self.num_transitions
+        if start >= len(dataset):
+            return 0
+        device = next(model.parameters()).device
+        batches = [list(range(i, min(i + batch_size, len(dataset)))) for i in range(start, len(dataset), batch_size)]
+        loader = DataLoader(dataset, batch_sampler=batches, num_workers=num_workers, collate_fn=custom_collate_fn)
+        for batch in loader:
+            self.update_from_batch(model, batch['state'].to(device), batch['next_states'].to(device),
+                                   batch['seq_len'].to(device))
+        self.num_transitions = len(dataset)
+        return self.num_transitions - start
+
+    def solve(self, regularization=1e-8):
+        """
+        :param regularization: Ridge term, relative to the mean eigenvalue of G.
+        :return: K as a float64 (lifted_size, lifted_size) tensor.
+        """
+        if self.num_pairs == 0:
+            raise ValueError("No transitions have been added.")
+        lifted_size = self.G.shape[0]
+        ridge = regularization * torch.trace(self.G) / lifted_size
+        eye = torch.eye(lifted_size, dtype=self.G.dtype, device=self.G.device)
+        return torch.linalg.solve(self.G + ridge * eye, self.A)
+
+    def apply(self, model, regularization=1e-8):
+        """
+        Writes the fitted operator into model.K.
+        """
+        with torch.no_grad():
+            model.K.copy_(self.solve(regularization))
+        return model
+
+    def state_dict(self):
+        return {'G': self.G, 'A': self.A, 'num_pairs': self.num_pairs, 'num_transitions': self.num_transitions}
+
+    def load_state_dict(self, state_dict):
+        self.G = state_dict['G'].to(self.G)
+        self.A = state_dict['A'].to(self.A)
+        self.num_pairs = state_dict['num_pairs']
+        self.num_transitions = state_dict['num_transitions']
+
+
+def edmd(model, dataset, batch_size=1024, regularization=1e-8, num_workers=0):
+    """
+    Fits model.K in closed form from the lifted states of dataset, in one pass over the data.
+
+    :param dataset: KoopmanDataset or path to a dataset.h5.
+    :return: EDMDStatistics, which can be updated later as more transitions are stored.
+    """
+    statistics = EDMDStatistics(model.K.shape[0])
+    statistics.update_from_dataset(model, dataset, batch_size=batch_size, num_workers=num_workers)
+    statistics.apply(model, regularization)
+    return statistics
@@ -1,10 +1,11 @@
 # koopman/train_koopman.py
 
+import argparse
 import torch
-import torch.nn as nn
 from torch.utils.data import DataLoader
 from koopman.models import KoopmanModel
-from koopman.dataset import KoopmanDataset
+from koopman.utils import compute_koopman_loss
+from koopman.dataset import KoopmanDataset, ContiguousBatchSampler, StreamingKoopmanDataset
 
 def custom_collate_fn(batch):
     batch_state = torch.stack([item['state'] for item in batch])
@@ -17,18 +18,28 @@ def custom_collate_fn(batch):
         batch_next_states[i, :seq_len] = item['next_states']
     return {'state': batch_state, 'next_states': batch_next_states, 'seq_len': batch_seq_len}
 
-def train_koopman_model():
+def train_koopman_model(filepath='data/dataset.h5', stream=False, idle_timeout=600.0):
+    """
+    :param stream: Train on transitions as DataStorage(swmr=True) appends them to filepath instead
+        of on a finished dataset: a single pass that follows the file until no new transitions
+        arrived for idle_timeout seconds, reporting the loss every 100 batches.
+    """
     state_size = 7  # Adjust accordingly
     lifted_size = 50
     batch_size = 32
     num_epochs = 100
     learning_rate = 1e-3
 
-    dataset = KoopmanDataset(filepath='data/dataset.h5')
-    dataloader = DataLoader(dataset, batch_size=batch_size, shuffle=True, collate_fn=custom_collate_fn)
+    if stream:
+        num_epochs = 1
+        dataset = StreamingKoopmanDataset(filepath=filepath, idle_timeout=idle_timeout)
+        dataloader = DataLoader(dataset, batch_size=batch_size, collate_fn=custom_collate_fn)
+    else:
+        dataset = KoopmanDataset(filepath=filepath, preload='auto')
+        dataloader = DataLoader(dataset, batch_sampler=ContiguousBatchSampler(dataset, batch_size),
+                                collate_fn=custom_collate_fn)
 
     model = KoopmanModel(state_size=state_size, lifted_size=lifted_size)
-    criterion = nn.MSELoss()
     optimizer = torch.optim.Adam(model.parameters(), lr=learning_rate)
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
     model.to(device)
@@ -36,32 +47,31 @@ def train_koopman_model():
     model.train()
     for epoch in range(num_epochs):
         epoch_loss = 0.0
+        num_batches = 0
         for batch in dataloader:
             state = batch['state'].to(device)
             next_states = batch['next_states'].to(device)
             seq_len = batch['seq_len'].to(device)
-            batch_size, max_seq_len, _ = next_states.shape
 
             optimizer.zero_grad()
-            lifted_state = model(state)
-            total_loss = 0.0
-
-            for t in range(max_seq_len - 1):
-                lifted_state = model.predict_next_lifted(lifted_state)
-                reconstructed_state = model.reconstruct(lifted_state)
-                actual_next_state = next_states[:, t+1, :]
-                mask = (seq_len > t+1).float().unsqueeze(1).to(device)
-                loss = criterion(reconstructed_state * mask, actual_next_state * mask)
-                total_loss += loss
-
+            total_loss = compute_koopman_loss(model, state, next_states, seq_len)
             total_loss.backward()
             optimizer.step()
             epoch_loss += total_loss.item()
+            num_batches += 1
+            if stream and num_batches % 100 == 0:
+                print(f"Batch {num_batches}, Loss: {epoch_loss/num_batches}")
 
-        print(f"Epoch {epoch+1}/{num_epochs}, Loss: {epoch_loss/len(dataloader)}")
+        print(f"Epoch {epoch+1}/{num_epochs}, Loss: {epoch_loss/max(num_batches, 1)}")
 
     torch.save(model.state_dict(), 'models/koopman_model.pth')
 
 if __name__ == "__main__":
-    train_koopman_model()
+    parser = argparse.ArgumentParser(description="Train the Koopman model on transitions written by DataStorage.")
+    parser.add_argument("--data", default='data/dataset.h5')
+    parser.add_argument("--stream", action='store_true', help="train while the dataset is still being collected")
+    parser.add_argument("--idle-timeout", type=float, default=600.0,
+                        help="with --stream, stop after this many seconds without new transitions")
+    args = parser.parse_args()
+    train_koopman_model(args.data, stream=args.stream, idle_timeout=args.idle_timeout)
 
@@ -1,10 +1,67 @@
 # koopman/utils.py
 
-# Additional utility functions if needed
+import torch
+
+
+def koopman_powers(K, steps):
+    """
+    Returns the stacked powers K^1, ..., K^steps as a (steps, lifted, lifted) tensor, built by
+    repeated doubling so only O(log steps) batched matmuls are recorded in the graph.
+    """
+    powers = K.unsqueeze(0)
+    while powers.shape[0] < steps:
+        # [K^1..K^n] @ K^n = [K^(n+1)..K^(2n)]
+        powers = torch.cat([powers, torch.matmul(powers, powers[-1])], dim=0)
+    return powers[:steps]
+
+
+def compute_koopman_loss(model, state, next_states, seq_len, reconstruction_weight=0.0, linearity_weight=0.0):
+    """
+    Multi-step prediction loss of a KoopmanModel over a padded batch of sequences.
+
+    The lifted state is advanced k steps with z_0 @ K^k and compared, after decoding, against
+    next_states[:, k] for every k < seq_len. All steps are decoded in one call and reduced with a
+    single masked sum, which gives the same value as summing one masked nn.MSELoss per step.
+
+    :param state: (B, state_size) initial states.
+    :param next_states: (B, T, state_size) sequences, zero-padded past seq_len.
+    :param seq_len: (B,) number of valid rows in next_states.
+    :param reconstruction_weight: Weight of the autoencoder term |dec(enc(x)) - x|^2 over the
+        initial state and all valid next states.
+    :param linearity_weight: Weight of the lifted-space term |enc(x_k) - z_0 @ K^k|^2.
+    :return: Scalar loss tensor.
+    """
+    batch_size, max_seq_len, state_size = next_states.shape
+    lifted_state = model(state)
+    lifted_size = lifted_state.shape[-1]
+    steps = max_seq_len - 1
+    if steps < 1:
+        loss = lifted_state.sum() * 0.0
+    else:
+        targets = next_states[:, 1:]
+        mask = (torch.arange(1, max_seq_len, device=seq_len.device) < seq_len.unsqueeze(1)).unsqueeze(-1)
+        mask = mask.to(next_states.dtype)
+
+        # (B, T-1, lifted): z_0 @ K^k for k = 1..T-1
+        lifted = torch.einsum('bl,tlm->btm', lifted_state, koopman_powers(model.K, steps))
+        predicted = model.reconstruct(lifted)
+        # per-step MSELoss averages over B * state_size, summing the steps gives one normalizer
+        loss = ((predicted - targets) * mask).pow(2).sum() / (batch_size * state_size)
+
+        if linearity_weight:
+            encoded = model(targets)
+            loss = loss + linearity_weight * ((encoded - lifted) * mask).pow(2).sum() / (batch_size * lifted_size)
+
+    if reconstruction_weight:
+        valid = (torch.arange(max_seq_len, device=seq_len.device) < seq_len.unsqueeze(1)).unsqueeze(-1)
+        valid = valid.to(next_states.dtype)
+        states = torch.cat([state.unsqueeze(1), next_states], dim=1)
+        valid = torch.cat([torch.ones_like(valid[:, :1]), valid], dim=1)
+        reconstructed = model.reconstruct(model(states))
+        loss = loss + reconstruction_weight * ((reconstructed - states) * valid).pow(2).sum() / \
+            (batch_size * state_size)
+    return loss
 
-def compute_koopman_loss():
-    pass
 
 def evaluate_model():
     pass
-
@@ -0,0 +1,58 @@
+# tests/env_fixtures.py
+"""
+Shared setup for tests that step a real BetseEnv without BETSE, on the reduced_order backend or a
+benchmarks.fake_betse wrapper.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from gym_betse.envs.betse_env import BetseEnv
+from gym_betse.utils import yaml_friend
+
+CONFIG_DIR = os.path.join(os.path.dirname(__file__), "..", "gym_betse", "config")
+CONFIG_PATH = os.path.join(CONFIG_DIR, "betse_config.yaml")
+
+
+def make_action_values(config_dir=CONFIG_DIR, scale=10):
+    """
+    :return: Two actions, the config's initial parameter values and the same values times scale.
+    """
+    initial = yaml_friend.ParamAccessor(os.path.join(config_dir, "betse_config.yaml"), yaml_friend.get_param_list(
+        os.path.join(config_dir, "params.txt"))).get_values()
+    return [initial, [value * scale for value in initial]]
+
+
+def make_env_kwargs(root, config_dir=CONFIG_DIR, wrapper_cls='reduced_order', continuation=True, scale=10,
+                    simulation_kwargs=None, **env_kwargs):
+    """
+    :param root: Directory that receives the env's working copy of the config and its dataset.
+    :return: BetseEnv keyword arguments for a single-run env on the given backend.
+    """
+    simulation_kwargs = {'wrapper_cls': wrapper_cls, 'continuation': continuation,
+                         'action_values': make_action_values(config_dir, scale), **(simulation_kwargs or {})}
+    return {'config_path': os.path.join(config_dir, "betse_config.yaml"),
+            'working_dir': os.path.join(root, "config"), 'storage_path': os.path.join(root, "data"),
+            'single_run': True, 'simulation_kwargs': simulation_kwargs, **env_kwargs}
+
+
+class BetseEnvTestCase(unittest.TestCase):
+    """
+    Runs each test in its own temporary working directory; make_env() builds envs inside it.
+    """
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmp)
+
+    def make_env(self, name='', **kwargs):
+        """
+        :param name: Subdirectory of the temporary directory, so several envs can coexist.
+        """
+        return BetseEnv(**make_env_kwargs(os.path.join(self.tmp, name), **kwargs))
@@ -0,0 +1,51 @@
+import unittest
+
+import numpy as np
+import torch
+
+from gym_betse.agents.dqn_agent import DQNAgent
+
+
+class TestDQNAgent(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(0)
+        np.random.seed(0)
+
+    def fill(self, agent, count):
+        for i in range(count):
+            agent.step(np.random.rand(3), i % 2, 1.0, np.random.rand(3), False)
+
+    def test_batched_act(self):
+        agent = DQNAgent(state_size=3, action_size=4)
+        states = np.random.rand(16, 3).astype(np.float32)
+        agent.epsilon = 0.0
+        actions = agent.act(states)
+        self.assertEqual(actions.shape, (16,))
+        expected = torch.argmax(agent.model(torch.from_numpy(states)), dim=1).numpy()
+        np.testing.assert_array_equal(actions, expected)
+        self.assertEqual(agent.act(states[3]), expected[3])
+        agent.epsilon = 1.0
+        self.assertTrue(((agent.act(states) >= 0) & (agent.act(states) < 4)).all())
+
+    def test_hard_target_sync(self):
+        agent = DQNAgent(state_size=3, action_size=2, target_sync_every=10, gradient_steps=2)
+        self.fill(agent, 68)
+        # 4 steps past the batch size with 2 gradient steps each
+        self.assertEqual(agent.updates, 8)
+        self.assertFalse(torch.equal(agent.model[0].weight, agent.target_model[0].weight))
+        self.fill(agent, 1)
+        self.assertEqual(agent.updates, 10)
+        self.assertTrue(torch.equal(agent.model[0].weight, agent.target_model[0].weight))
+
+    def test_soft_target_sync(self):
+        agent = DQNAgent(state_size=3, action_size=2, tau=0.5)
+        before = agent.target_model[0].weight.clone()
+        self.fill(agent, 65)
+        expected = 0.5 * before + 0.5 * agent.model[0].weight
+        torch.testing.assert_close(agent.target_model[0].weight, expected)
+        self.assertFalse(agent.target_model[0].weight.requires_grad)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+
+import numpy as np
+
+from gym_betse.agents.dqn_agent import DQNAgent
+from gym_betse.agents.replay_buffer import ReplayBuffer, PrioritizedReplayBuffer, SumTree
+
+
+class TestReplayBuffer(unittest.TestCase):
+
+    def test_ring_buffer_overwrites_oldest(self):
+        buffer = ReplayBuffer(state_size=2, capacity=5, seed=0)
+        for i in range(7):
+            buffer.add(np.full(2, i), i % 3, float(i), np.full(2, i + 1), i % 2)
+        self.assertEqual(len(buffer), 5)
+        self.assertEqual(sorted(buffer.rewards.tolist()), [2.0, 3.0, 4.0, 5.0, 6.0])
+
+        batch = buffer.sample(16)
+        self.assertEqual(tuple(batch['states'].shape), (16, 2))
+        np.testing.assert_array_equal(batch['next_states'].numpy(), batch['states'].numpy() + 1)
+        np.testing.assert_array_equal(batch['rewards'].numpy(), batch['states'][:, 0].numpy())
+
+    def test_add_batch_wraps(self):
+        buffer = ReplayBuffer(state_size=1, capacity=4)
+        buffer.add_batch(np.arange(3)[:, None], np.zeros(3), np.arange(3), np.zeros((3, 1)), np.zeros(3))
+        indices = buffer.add_batch(np.arange(3, 6)[:, None], np.zeros(3), np.arange(3, 6), np.zeros((3, 1)),
+                                   np.zeros(3))
+        np.testing.assert_array_equal(indices, [3, 0, 1])
+        np.testing.assert_array_equal(buffer.rewards, [4, 5, 2, 3])
+        self.assertEqual(buffer.position, 2)
+        self.assertEqual(len(buffer), 4)
+
+    def test_add_batch_edge_sizes(self):
+        for buffer in (ReplayBuffer(state_size=1, capacity=4), PrioritizedReplayBuffer(state_size=1, capacity=4)):
+            with self.subTest(buffer=type(buffer).__name__):
+                buffer.add(np.zeros(1), 0, -1.0, np.zeros(1), 0)
+                indices = buffer.add_batch(np.zeros((0, 1)), np.zeros(0), np.zeros(0), np.zeros((0, 1)), np.zeros(0))
+                self.assertEqual(len(indices), 0)
+                self.assertEqual((buffer.position, len(buffer)), (1, 1))
+
+                # only the last capacity transitions of an oversized batch are kept, each at its own index
+                indices = buffer.add_batch(np.arange(6)[:, None], np.zeros(6), np.arange(6), np.zeros((6, 1)),
+                                           np.zeros(6))
+                np.testing.assert_array_equal(indices, [3, 0, 1, 2])
+                np.testing.assert_array_equal(buffer.rewards, [3, 4, 5, 2])
+                self.assertEqual((buffer.position, len(buffer)), (3, 4))
+
+
+class TestPrioritizedReplayBuffer(unittest.TestCase):
+
+    def test_sum_tree(self):
+        tree = SumTree(5)
+        tree.update(np.arange(5), [1.0, 2.0, 3.0, 4.0, 0.0])
+        self.assertEqual(tree.total, 10.0)
+        np.testing.assert_array_equal(tree.find([0.5, 1.5, 3.5, 9.9]), [0, 1, 2, 3])
+        tree.update([3], [0.0])
+        self.assertEqual(tree.total, 6.0)
+
+    def test_sampling_follows_priorities(self):
+        buffer = PrioritizedReplayBuffer(state_size=1, capacity=4, alpha=1.0, beta=1.0, epsilon=0.0, seed=0)
+        for i in range(4):
+            buffer.add(np.zeros(1), 0, float(i), np.zeros(1), 0)
+        buffer.update_priorities([0, 1, 2, 3], [1.0, 0.0, 0.0, 3.0])
+        batch = buffer.sample(4000)
+        counts = np.bincount(batch['indices'], minlength=4)
+        self.assertEqual(counts[1] + counts[2], 0)
+        self.assertAlmostEqual(counts[3] / counts.sum(), 0.75, delta=0.03)
+        # rarer transitions get larger importance weights
+        weights = batch['weights'].numpy()
+        self.assertAlmostEqual(weights[batch['indices'] == 0][0], 1.0)
+        self.assertAlmostEqual(weights[batch['indices'] == 3][0], 1 / 3, places=5)
+
+    def test_agent_updates_priorities(self):
+        agent = DQNAgent(state_size=3, action_size=2, buffer_size=100, prioritized=True)
+        for i in range(70):
+            agent.step(np.random.rand(3), i % 2, 1.0, np.random.rand(3), False)
+        tree = agent.memory.tree
+        priorities = tree.nodes[tree.leaf_offset:tree.leaf_offset + 70]
+        self.assertGreater(len(np.unique(priorities)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import io
+import os
+import unittest
+from contextlib import redirect_stdout
+
+import numpy as np
+
+from benchmarks.fake_betse import make_fake_wrapper, fake_config_dir
+from tests.env_fixtures import BetseEnvTestCase, make_action_values
+
+
+class TestBetseEnvFakeBackend(BetseEnvTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.action_values = make_action_values(fake_config_dir(), scale=2)
+        self.env = self.make_env(config_dir=fake_config_dir(), wrapper_cls=make_fake_wrapper(num_samples=20),
+                                 scale=2, profile=True, profile_path=os.path.join(self.tmp, "profile.json"))
+
+    def test_discrete_actions_drive_the_pipeline(self):
+        self.assertEqual(self.env.action_space.n, 2)
+        observation, info = self.env.reset(seed=0)
+        self.assertEqual(observation.shape, (7,))
+        self.assertIn('run_init', info['timings'])
+
+        first, _, _, _, info = self.env.step(1)
+        self.assertEqual(self.env.simulation.curr_action, self.action_values[1])
+        self.assertIn('run_sim', info['timings'])
+        second, _, _, _, _ = self.env.step(0)
+        # a different config gives a different (but deterministic) fake run
+        self.assertFalse(np.allclose(first, second))
+        self.assertEqual(len(self.env.data_storage), 2)
+        self.assertEqual(self.env.data_storage.read_transition(0)['action'], 1)
+        self.assertIn('run_sim', [row['section'] for row in self.env.profiler.report()['sections']])
+
+        # the report goes to profile_path, not stdout
+        output = io.StringIO()
+        with redirect_stdout(output):
+            self.env.close()
+        self.assertEqual(output.getvalue(), "")
+        self.assertTrue(os.path.exists(os.path.join(self.tmp, "profile.json")))
+
+
+if __name__ == '__main__':
+    unittest.main()
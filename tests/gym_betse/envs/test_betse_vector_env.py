@@ -0,0 +1,117 @@
+import os
+import unittest
+from unittest import mock
+
+import numpy as np
+from gymnasium.vector.vector_env import AutoresetMode
+
+from gym_betse.envs.betse_vector_env import BetseVectorEnv
+from gym_betse.utils.betse_interface import BetseSimulation
+from koopman.dataset import KoopmanDataset
+from tests.env_fixtures import CONFIG_PATH, BetseEnvTestCase, make_action_values
+
+
+def every_second_step(simulation):
+    # stand-in for BetseSimulation.is_done, which never ends an episode
+    return simulation.steps_completed % 2 == 0
+
+
+class TestBetseVectorEnv(BetseEnvTestCase):
+
+    def make_vector_env(self, simulation_kwargs=None, storage_kwargs=None, **kwargs):
+        # fork, so workers inherit patches made in the test
+        simulation_kwargs = dict({'wrapper_cls': 'reduced_order', 'continuation': True,
+                                  'action_values': make_action_values()}, **(simulation_kwargs or {}))
+        env_kwargs = {'single_run': True, 'simulation_kwargs': simulation_kwargs, 'storage_kwargs': storage_kwargs}
+        return BetseVectorEnv(CONFIG_PATH, num_envs=2, context='fork', env_kwargs=env_kwargs, **kwargs)
+
+    def test_batches_reset_and_step(self):
+        envs = self.make_vector_env()
+        observations, _ = envs.reset(seed=0)
+        self.assertEqual(observations.shape, (2, 7))
+        self.assertEqual(observations.dtype, np.float32)
+        np.testing.assert_array_equal(observations[0], observations[1])
+
+        observations, rewards, terminations, truncations, _ = envs.step(np.array([1, 1]))
+        self.assertEqual(observations.shape, (2, 7))
+        np.testing.assert_array_equal(observations[0], observations[1])
+        self.assertEqual((rewards.shape, terminations.tolist(), truncations.tolist()), ((2,), [False] * 2, [False] * 2))
+        observations, _, _, _, _ = envs.step(np.array([1, 0]))
+        self.assertFalse(np.allclose(observations[0], observations[1]))
+
+        # every worker runs BETSE in its own scratch directory
+        for workdir in envs.worker_dirs:
+            self.assertTrue(os.path.exists(os.path.join(workdir, "config", "temp.yaml")))
+            self.assertTrue(os.path.exists(os.path.join(workdir, "data", "dataset.h5")))
+        scratch_dir = envs.scratch_dir
+        envs.close()
+        self.assertFalse(os.path.exists(scratch_dir))
+        self.assertFalse(any(process.is_alive() for process in envs.processes))
+
+    @mock.patch.object(BetseSimulation, 'is_done', every_second_step)
+    def test_autoreset_modes(self):
+        for mode in (AutoresetMode.NEXT_STEP, AutoresetMode.SAME_STEP):
+            with self.subTest(mode=mode):
+                envs = self.make_vector_env(autoreset_mode=mode)
+                initial, _ = envs.reset(seed=0)
+                envs.step(np.array([1, 1]))
+                observations, _, terminations, _, infos = envs.step(np.array([1, 1]))
+                self.assertEqual(terminations.tolist(), [True, True])
+                if mode == AutoresetMode.NEXT_STEP:
+                    self.assertNotIn('final_obs', infos)
+                    self.assertFalse(np.allclose(observations, initial))
+                    # the step after termination only resets
+                    observations, rewards, terminations, _, _ = envs.step(np.array([1, 1]))
+                    self.assertEqual((rewards.tolist(), terminations.tolist()), ([0.0, 0.0], [False, False]))
+                else:
+                    # the final observation moves to infos, the returned one starts the next episode
+                    self.assertFalse(np.allclose(infos['final_obs'][0], initial[0]))
+                    self.assertTrue(infos['_final_obs'].all())
+                np.testing.assert_allclose(observations, initial)
+                envs.close()
+
+    def test_shared_storage_path(self):
+        storage_path = os.path.join(self.tmp, "shared")
+        for storage_kwargs, filename in ((None, "dataset.h5"), ({'filename': 'runs.h5'}, "runs.h5")):
+            with self.subTest(filename=filename):
+                envs = self.make_vector_env(storage_kwargs=storage_kwargs, storage_path=storage_path)
+                envs.reset(seed=0)
+                for actions in ([1, 0], [0, 1], [1, 1]):
+                    envs.step(np.array(actions))
+                envs.close()
+                stem = os.path.splitext(filename)[0]
+                for shard in range(2):
+                    self.assertTrue(os.path.exists(os.path.join(storage_path, f"{stem}.shard-{shard}.h5")))
+
+                # the index is a virtual dataset over both shards
+                dataset = KoopmanDataset(os.path.join(storage_path, filename))
+                self.assertEqual(len(dataset), 6)
+                self.assertEqual(dataset.__getitems__(list(range(6)))[5]['state'].shape, (7,))
+                dataset.close()
+
+    def test_relative_scratch_dir(self):
+        # the test runs in self.tmp
+        envs = self.make_vector_env(scratch_dir="scratch", storage_path="shared")
+        envs.reset(seed=0)
+        envs.step(np.array([1, 0]))
+        envs.close()
+        for i in range(2):
+            workdir = os.path.join(self.tmp, "scratch", f"worker_{i}")
+            self.assertTrue(os.path.exists(os.path.join(workdir, "config", "betse_config.yaml")))
+        self.assertFalse(os.path.exists(os.path.join(self.tmp, "scratch", "worker_0", "scratch")))
+        self.assertEqual(len(KoopmanDataset(os.path.join(self.tmp, "shared", "dataset.h5"))), 2)
+
+    def test_worker_errors_reach_the_caller(self):
+        with self.assertRaisesRegex(RuntimeError, "worker 0"):
+            self.make_vector_env(simulation_kwargs={'wrapper_cls': 'no_such_backend'},
+                                 scratch_dir=os.path.join(self.tmp, "scratch"))
+
+        envs = self.make_vector_env()
+        envs.reset(seed=0)
+        with self.assertRaisesRegex(RuntimeError, "IndexError"):
+            envs.step(np.array([0, 5]))
+        envs.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
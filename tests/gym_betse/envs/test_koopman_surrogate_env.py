@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import torch
+
+from gym_betse.envs.koopman_surrogate_env import KoopmanSurrogateEnv
+from gym_betse.utils.data_storage import DataStorage
+from koopman.models import KoopmanModel
+
+
+class TestKoopmanSurrogateEnv(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(0)
+        self.tmp = tempfile.mkdtemp()
+        self.model_path = os.path.join(self.tmp, 'koopman_model.pth')
+        self.model = KoopmanModel(state_size=3, lifted_size=4)
+        torch.save(self.model.state_dict(), self.model_path)
+        self.dataset_path = os.path.join(self.tmp, 'dataset.h5')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def make_env(self, **kwargs):
+        return KoopmanSurrogateEnv(model_path=self.model_path, num_envs=8, num_actions=2,
+                                   dataset_path=self.dataset_path, **kwargs)
+
+    def test_step_matches_model(self):
+        env = self.make_env(initial_states=np.ones(3), max_episode_steps=2)
+        self.assertEqual(env.observation_space.shape, (8, 3))
+        observations, _ = env.reset(seed=0)
+        with torch.no_grad():
+            lifted = self.model(torch.ones(1, 3))
+            np.testing.assert_allclose(observations[0], self.model.reconstruct(lifted)[0].numpy(), rtol=1e-5)
+            expected = self.model.reconstruct(self.model.predict_next_lifted(lifted))[0].numpy()
+
+        observations, rewards, terminated, truncated, _ = env.step(np.zeros(8, dtype=int))
+        np.testing.assert_allclose(observations[3], expected, rtol=1e-5, atol=1e-6)
+        self.assertFalse(truncated.any())
+        _, _, _, truncated, _ = env.step(np.ones(8, dtype=int))
+        self.assertTrue(truncated.all())
+        # truncated envs restart on the next step
+        observations, rewards, _, truncated, _ = env.step(np.ones(8, dtype=int))
+        np.testing.assert_allclose(observations[0], env.model.reconstruct(lifted)[0].detach().numpy(), rtol=1e-5)
+        self.assertFalse(truncated.any())
+
+    def test_recalibrate_per_action(self):
+        storage = DataStorage(storage_path=self.tmp, state_size=3, max_seq_length=6, flush_every=4)
+        rng = np.random.default_rng(0)
+        for i in range(40):
+            storage.store_transition(rng.random(3), i % 2, rng.random((6, 3)), 0.0, False)
+        storage.close()
+
+        env = self.make_env()
+        self.assertEqual(env.initial_states.shape, (40, 3))
+        self.assertEqual(env.recalibrate(), 40)
+        self.assertEqual(env.statistics[0].num_pairs, 20 * 5)
+        self.assertFalse(torch.allclose(env.operators[0], env.operators[1]))
+        torch.testing.assert_close(env.operators[1], env.statistics[1].solve().float())
+        self.assertEqual(env.recalibrate(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
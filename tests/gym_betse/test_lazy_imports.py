@@ -0,0 +1,37 @@
+import unittest
+
+import gym_betse
+import gym_betse.utils
+import koopman
+from benchmarks.bench_import_time import MODULES, measure
+
+
+class TestLazyImports(unittest.TestCase):
+
+    def test_entry_points_load_only_their_dependencies(self):
+        for module, allowed in MODULES:
+            with self.subTest(module=module):
+                _, loaded = measure(module, repeats=1)
+                self.assertEqual(set(loaded) - set(allowed), set())
+
+    def test_public_names_resolve(self):
+        from gym_betse.envs.betse_env import BetseEnv
+        from gym_betse.utils.data_storage import DataStorage
+        from koopman.dataset import KoopmanDataset
+        self.assertIs(gym_betse.BetseEnv, BetseEnv)
+        self.assertIs(gym_betse.utils.DataStorage, DataStorage)
+        self.assertIs(koopman.KoopmanDataset, KoopmanDataset)
+        for package in (gym_betse, gym_betse.utils, koopman):
+            self.assertTrue(set(package.__all__) <= set(dir(package)))
+            with self.assertRaises(AttributeError):
+                package.missing
+
+    def test_fit_edmd_survives_submodule_import(self):
+        import koopman.edmd
+        from koopman import fit_edmd
+        self.assertTrue(callable(koopman.fit_edmd))
+        self.assertIs(fit_edmd, koopman.edmd.edmd)
+
+
+if __name__ == '__main__':
+    unittest.main()
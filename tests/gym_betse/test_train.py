@@ -0,0 +1,44 @@
+import functools
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import gymnasium as gym
+
+from gym_betse.train import actor_epsilon, main, train_async
+
+
+class TestTrainAsync(unittest.TestCase):
+
+    def test_actor_epsilon(self):
+        self.assertEqual(actor_epsilon(0, 1), 0.4)
+        epsilons = [actor_epsilon(i, 4) for i in range(4)]
+        self.assertEqual(epsilons[0], 0.4)
+        self.assertAlmostEqual(epsilons[-1], 0.4 ** 8)
+        self.assertEqual(epsilons, sorted(epsilons, reverse=True))
+
+    def test_actors_feed_learner(self):
+        agent, stats = train_async(functools.partial(gym.make, 'CartPole-v1'), num_actors=2, total_updates=20,
+                                   sync_every=5, log_every=0, context='fork')
+        self.assertEqual(stats['updates'], 20)
+        self.assertGreaterEqual(stats['env_steps'], agent.batch_size)
+        self.assertEqual(len(agent.memory), stats['env_steps'])
+
+
+class TestMain(unittest.TestCase):
+
+    def test_env_options_reach_the_env(self):
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch('gym_betse.train.BetseEnv', side_effect=RuntimeError) as env_cls:
+            with self.assertRaises(RuntimeError):
+                main('my_config.yaml', snapshot_cache_dir=os.path.join(tmp, 'snapshots'),
+                     result_cache_dir=os.path.join(tmp, 'results'))
+        kwargs = env_cls.call_args.kwargs
+        self.assertEqual(kwargs['config_path'], 'my_config.yaml')
+        self.assertIsNotNone(kwargs['snapshot_cache'])
+        self.assertIn('result_cache', kwargs['simulation_kwargs'])
+
+
+if __name__ == '__main__':
+    unittest.main()
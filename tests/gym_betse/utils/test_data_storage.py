@@ -0,0 +1,171 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import h5py
+import numpy as np
+
+from gym_betse.utils.data_storage import DataStorage, convert_to_ragged, find_shards, merge_shards
+
+
+class TestDataStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def make_storage(self, filename='dataset.h5', **kwargs):
+        return DataStorage(storage_path=self.tmp, filename=filename, state_size=3, max_seq_length=5, **kwargs)
+
+    def store(self, storage, count, offset=0):
+        for i in range(offset, offset + count):
+            next_states = np.full((i % 5 + 1, 3), i, dtype='float32')
+            storage.store_transition(np.full(3, i), i, next_states, float(i), i % 2 == 0)
+
+    def check_transition(self, storage, i):
+        transition = storage.read_transition(i)
+        np.testing.assert_array_equal(transition['state'], np.full(3, i))
+        np.testing.assert_array_equal(transition['next_states'], np.full((i % 5 + 1, 3), i))
+        self.assertEqual(transition['action'], i)
+        self.assertEqual(transition['done'], i % 2 == 0)
+
+    def test_buffered_writes_round_trip(self):
+        for layout in ('ragged', 'padded'):
+            with self.subTest(layout=layout):
+                filename = f'{layout}.h5'
+                storage = self.make_storage(filename, flush_every=4, compression='gzip', layout=layout)
+                self.store(storage, 10)
+                self.assertEqual(len(storage), 10)
+                self.check_transition(storage, 9)
+                storage.close()
+
+                storage = self.make_storage(filename)
+                self.assertEqual(storage.layout, layout)
+                for i in range(10):
+                    self.check_transition(storage, i)
+                storage.close()
+
+    def test_ragged_layout_has_no_padding(self):
+        storage = self.make_storage(flush_every=4)
+        self.store(storage, 10)
+        storage.close()
+
+        with h5py.File(storage.filepath, 'r') as file:
+            grp = file['transitions']
+            self.assertEqual(grp['state'].shape, (10, 3))
+            self.assertEqual(grp['next_states'].shape, (int(grp['seq_len'][:].sum()), 3))
+            np.testing.assert_array_equal(grp['offsets'][1:], np.cumsum(grp['seq_len'][:-1]))
+
+    def test_append_to_existing_file(self):
+        storage = self.make_storage(flush_every=3)
+        self.store(storage, 5)
+        storage.close()
+        storage = self.make_storage(flush_every=3)
+        self.store(storage, 4, offset=5)
+        storage.close()
+
+        storage = self.make_storage()
+        for i in range(9):
+            self.check_transition(storage, i)
+        storage.close()
+
+    def test_flushed_rows_are_readable_before_close(self):
+        storage = self.make_storage(flush_every=2)
+        self.store(storage, 3)
+        grp = storage.h5file['transitions']
+        self.assertEqual(grp.attrs['length'], 2)
+        self.assertGreaterEqual(grp['state'].shape[0], 2)
+        storage.close()
+
+    def test_convert_to_ragged(self):
+        storage = self.make_storage('padded.h5', layout='padded', flush_every=4)
+        self.store(storage, 7)
+        storage.close()
+
+        convert_to_ragged(storage.filepath, block_size=3)
+        storage = self.make_storage('padded.h5')
+        self.assertEqual(storage.layout, 'ragged')
+        self.assertEqual(len(storage), 7)
+        for i in range(7):
+            self.check_transition(storage, i)
+        storage.close()
+
+    def test_empty_sequences_are_rejected(self):
+        for swmr in (False, True):
+            with self.subTest(swmr=swmr):
+                storage = self.make_storage(f'empty-{swmr}.h5', flush_every=2, swmr=swmr)
+                self.store(storage, 1)
+                with self.assertRaises(ValueError):
+                    storage.store_transition(np.zeros(3), 0, np.zeros((0, 3), dtype='float32'), 0.0, True)
+                self.store(storage, 2, offset=1)
+                self.assertEqual(len(storage), 3)
+                for i in range(3):
+                    self.check_transition(storage, i)
+                storage.close()
+
+    def test_swmr_files_are_sized_exactly(self):
+        storage = self.make_storage(flush_every=4, swmr=True)
+        self.store(storage, 10)
+        grp = storage.h5file['transitions']
+        self.assertEqual(grp['seq_len'].shape[0], 8)
+        self.assertEqual(grp['next_states'].shape[0], grp['offsets'][7] + grp['seq_len'][7])
+        storage.close()
+
+        # existing files keep their mode
+        storage = self.make_storage()
+        self.assertTrue(storage.swmr)
+        self.store(storage, 3, offset=10)
+        storage.close()
+        storage = self.make_storage()
+        for i in range(13):
+            self.check_transition(storage, i)
+        storage.close()
+
+        self.make_storage('plain.h5').close()
+        with self.assertRaises(ValueError):
+            self.make_storage('plain.h5', swmr=True)
+
+    def test_merge_shards(self):
+        for layout in ('ragged', 'padded'):
+            with self.subTest(layout=layout):
+                filename = f'{layout}.h5'
+                for shard, (start, stop) in enumerate([(0, 6), (6, 6), (6, 17)]):
+                    storage = self.make_storage(filename, flush_every=4, layout=layout, shard=shard)
+                    self.store(storage, stop - start, offset=start)
+                    storage.close()
+                # a collector that is still running contributes the rows it has flushed
+                running = self.make_storage(filename, flush_every=4, layout=layout, shard=3)
+                self.store(running, 6, offset=17)
+                running.h5file.flush()
+
+                shard_paths = find_shards(self.tmp, filename)
+                self.assertEqual(len(shard_paths), 4)
+                merge_shards(shard_paths, os.path.join(self.tmp, filename))
+                running.close()
+
+                with h5py.File(os.path.join(self.tmp, filename), 'r') as file:
+                    grp = file['transitions']
+                    self.assertEqual(grp.attrs['layout'], layout)
+                    self.assertEqual(grp.attrs['length'], 21)
+                    self.assertTrue(grp['state'].is_virtual)
+                    np.testing.assert_array_equal(grp['action'][:], np.arange(21))
+                    for i in range(21):
+                        seq_len = grp['seq_len'][i]
+                        next_states = grp['next_states'][grp['offsets'][i]:grp['offsets'][i] + seq_len] \
+                            if layout == 'ragged' else grp['next_states'][i, :seq_len]
+                        np.testing.assert_array_equal(next_states, np.full((i % 5 + 1, 3), i))
+                with self.assertRaises(ValueError):
+                    self.make_storage(filename)
+
+    def test_merge_shards_rejects_mismatched_layouts(self):
+        for shard, layout in enumerate(('ragged', 'padded')):
+            self.make_storage(layout=layout, shard=shard).close()
+        with self.assertRaises(ValueError):
+            merge_shards(find_shards(self.tmp), os.path.join(self.tmp, 'dataset.h5'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from gym_betse.utils.profiler import Profiler
+
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_sections_are_counted_per_step_and_in_total(self):
+        profiler = Profiler()
+        for _ in range(2):
+            profiler.begin_step()
+            with profiler.section('run_sim'):
+                time.sleep(0.01)
+            with profiler.section('store_transition'):
+                pass
+            with profiler.section('store_transition'):
+                pass
+        timings = profiler.step_timings()
+        self.assertGreaterEqual(timings['run_sim'], 0.01)
+        self.assertEqual(set(timings), {'run_sim', 'store_transition'})
+
+        report = profiler.report()
+        self.assertEqual(report['sections'][0]['section'], 'run_sim')
+        counts = {row['section']: row['count'] for row in report['sections']}
+        self.assertEqual(counts, {'run_sim': 2, 'store_transition': 4})
+        self.assertGreater(report['peak_rss_bytes'], 0)
+        self.assertIn('run_sim', profiler.format_report())
+
+    def test_disabled_records_nothing(self):
+        profiler = Profiler(enabled=False)
+        with profiler.section('run_sim'):
+            pass
+        self.assertIs(profiler.section('a'), profiler.section('b'))
+        self.assertEqual(profiler.report()['sections'], [])
+        self.assertEqual(profiler.step_timings(), {})
+
+    def test_export(self):
+        profiler = Profiler()
+        with profiler.section('get_observation'):
+            pass
+        with open(profiler.export(os.path.join(self.tmp, 'report.json'))) as file:
+            self.assertEqual(json.load(file)['sections'][0]['count'], 1)
+        with open(profiler.export(os.path.join(self.tmp, 'out', 'report.csv'))) as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual(rows[0]['section'], 'get_observation')
+
+
+if __name__ == '__main__':
+    unittest.main()
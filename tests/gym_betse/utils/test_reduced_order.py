@@ -0,0 +1,135 @@
+import hashlib
+import os
+import shutil
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from gym_betse.utils.reduced_order import ReducedOrderModel, PARAMETER_PATHS
+from gym_betse.utils.snapshot_cache import SnapshotCache
+from tests.env_fixtures import CONFIG_DIR, CONFIG_PATH, BetseEnvTestCase
+
+DM_K = PARAMETER_PATHS['Dm_K'][0]
+
+
+class TestReducedOrderModel(unittest.TestCase):
+
+    def test_batch_matches_single_environments(self):
+        dm_k = [1.0e-18, 5.0e-18, 2.0e-17]
+        batch = ReducedOrderModel(CONFIG_PATH, num_envs=3)
+        batch.set_parameters([DM_K], np.array(dm_k)[:, None])
+        history = batch.run(10.0, 0.05, 1.0)
+        self.assertEqual(history.shape, (3, 10, 7))
+
+        for i, value in enumerate(dm_k):
+            single = ReducedOrderModel(CONFIG_PATH)
+            single.set_parameters([DM_K], [value])
+            np.testing.assert_allclose(single.run(10.0, 0.05, 1.0)[0], history[i])
+
+        # more K+ permeability pulls the cells towards E_K; cell 0 keeps its tissue profile's Dm
+        self.assertTrue(np.all(np.diff(history[:, -1, 1:], axis=0) < 0))
+        np.testing.assert_allclose(history[:, -1, 0], history[0, -1, 0], atol=1e-6)
+
+    def test_voltage_gated_gap_junctions(self):
+        model = ReducedOrderModel(CONFIG_PATH, num_envs=2)
+        model.set_parameters([PARAMETER_PATHS['gj_surface_area'][0], PARAMETER_PATHS['gj_voltage_sensitive'][0]],
+                             [[1e-8, 0.0], [1e-8, 1.0]])
+        model.vm[:, 0] = 0.05
+        history = model.run(1.0, 0.01, 0.1, events=False)
+        self.assertTrue(np.all(np.isfinite(history)))
+        # junctions between cells more than the threshold apart close, so the centre cell's voltage spreads slower
+        spread = np.ptp(history, axis=-1)
+        self.assertGreater(spread[1, 0], 2 * spread[0, 0])
+        self.assertLess(spread[1, -1], spread[1, 0])
+
+    def test_unmodelled_paths_are_reported(self):
+        model = ReducedOrderModel(CONFIG_PATH)
+        model.set_parameters([DM_K, "config/change K env/unknown"], [2e-18, 1.0])
+        self.assertEqual(model.parameters['Dm_K'][0], 2e-18)
+        self.assertEqual(model.ignored_paths, {"config/change K env/unknown"})
+
+
+class TestBetseEnvReducedOrderBackend(BetseEnvTestCase):
+
+    def test_steps_with_the_betse_parameter_paths(self):
+        for continuation in (True, False):
+            env = self.make_env(continuation=continuation)
+            observation, _ = env.reset(seed=0)
+            self.assertEqual(observation.shape, (7,))
+
+            first, _, _, _, _ = env.step(1)
+            self.assertEqual(env.simulation.get_observation_history().shape, (60, 7))
+            second, _, _, _, _ = env.step(0)
+            self.assertTrue(np.all(np.abs(second) < 0.2))
+            if continuation:
+                self.assertFalse(np.allclose(first, second))
+            env.close()
+
+    def test_betse_files_are_left_alone(self):
+        # without a working_dir the backend saves next to the config, here a copy of the repo's
+        config_dir = os.path.join(self.tmp, "betse_config")
+        shutil.copytree(CONFIG_DIR, config_dir)
+        betse_files = [os.path.join(config_dir, "INITS", "world_circle_s.betse.gz"),
+                       os.path.join(config_dir, "INITS", "init_Feb_1.betse.gz"),
+                       os.path.join(config_dir, "SIMS", "sim_Feb_1.betse.gz")]
+
+        def digests():
+            return [hashlib.sha256(open(path, 'rb').read()).hexdigest() for path in betse_files]
+        before = digests()
+        env = self.make_env(config_dir=config_dir, working_dir=None, continuation=False)
+        env.reset(seed=0)
+        env.step(1)
+        env.close()
+        self.assertEqual(digests(), before)
+        # seed and init run on the config itself, later runs on the temp.yaml copy in the current directory
+        for path in betse_files[:2] + [os.path.join(self.tmp, "SIMS", "sim_Feb_1.betse.gz")]:
+            self.assertTrue(os.path.exists(path + ".reduced.npy"))
+
+    def test_snapshot_cache_holds_the_model_states(self):
+        cache = SnapshotCache(os.path.join(self.tmp, "snapshots"))
+        env = self.make_env(snapshot_cache=cache)
+        first, _ = env.reset(seed=0)
+        second, _ = env.reset(seed=0)
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+        np.testing.assert_array_equal(first, second)
+        env.close()
+
+    def test_observation_history_follows_each_run(self):
+        env = self.make_env()
+        env.reset(seed=0)
+        simulation = env.simulation
+        for action in (1, 0, 1, 0):
+            env.step(action)
+            history = simulation.get_observation_history()
+            self.assertIs(simulation.get_observation_history(), history)
+            np.testing.assert_array_equal(history[-1], simulation.get_observation())
+
+        # a new run whose sample list has the same id and length as the last one's
+        samples = simulation.model.phase.sim.vm_ave_time
+
+        def rerun(*args, **kwargs):
+            samples[:] = [sample + 0.01 for sample in samples]
+        with mock.patch.object(simulation.model, 'continue_sim', rerun):
+            simulation.step()
+        np.testing.assert_allclose(simulation.get_observation_history(), history + 0.01)
+        env.close()
+
+    def test_observation_sequence_counts_back_from_the_last_sample(self):
+        env = self.make_env()
+        env.reset(seed=0)
+        env.step(1)
+        simulation = env.simulation
+        history = simulation.get_observation_history()
+        self.assertEqual(len(history), 60)
+        np.testing.assert_array_equal(simulation.get_observation_sequence(), history)
+        np.testing.assert_array_equal(simulation.get_observation_sequence(stride=25), history[[9, 34, 59]])
+        sequence = simulation.get_observation_sequence(stride=7, window=4)
+        np.testing.assert_array_equal(sequence, history[[38, 45, 52, 59]])
+        self.assertTrue(np.shares_memory(sequence, history))
+        np.testing.assert_array_equal(simulation.get_observation_sequence(window=1), history[-1:])
+        env.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
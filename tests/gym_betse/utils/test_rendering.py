@@ -0,0 +1,70 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from gym_betse.utils.reduced_order import hex_cluster
+from gym_betse.utils.rendering import VoltageRenderer, FrameRecorder
+from tests.env_fixtures import BetseEnvTestCase
+
+
+class TestVoltageRenderer(unittest.TestCase):
+
+    def test_frames_follow_the_voltages(self):
+        centres = hex_cluster(1, 5e-6, 2.6e-5)[0]
+        for clim in (None, (-80, -20)):
+            with self.subTest(clim=clim):
+                renderer = VoltageRenderer(centres, clim=clim, figsize=(2, 2), dpi=50)
+                first = renderer.render(np.linspace(-0.07, -0.03, 7))
+                self.assertEqual(first.shape, (100, 100, 3))
+                self.assertEqual(first.dtype, np.uint8)
+                second = renderer.render(np.linspace(-0.03, -0.07, 7))
+                self.assertFalse(np.array_equal(first, second))
+                np.testing.assert_array_equal(renderer.render(np.linspace(-0.07, -0.03, 7)), first)
+
+
+class TestFrameRecorder(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_gif_keeps_every_nth_frame(self):
+        path = os.path.join(self.tmp, "out", "run.gif")
+        recorder = FrameRecorder(path, frame_skip=3)
+        rendered = []
+
+        def render():
+            rendered.append(len(rendered))
+            return np.full((8, 8, 3), 50 * len(rendered), dtype=np.uint8)
+
+        for _ in range(7):
+            recorder.capture(render)
+        recorder.close()
+        self.assertEqual((recorder.captured, recorder.written, len(rendered)), (7, 3, 3))
+        with Image.open(path) as gif:
+            self.assertEqual(gif.n_frames, 3)
+
+
+class TestBetseEnvRendering(BetseEnvTestCase):
+
+    def test_rgb_array_and_recording(self):
+        env = self.make_env(render_mode='rgb_array', record_path=os.path.join(self.tmp, "run.gif"),
+                            record_frame_skip=2, simulation_kwargs={'render_kwargs': {'clim': (-100, 0)}})
+        env.reset(seed=0)
+        for action in (1, 0, 1):
+            env.step(action)
+        frame = env.render()
+        self.assertEqual(frame.ndim, 3)
+        env.close()
+        with Image.open(os.path.join(self.tmp, "run.gif")) as gif:
+            self.assertEqual(gif.size, frame.shape[1::-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
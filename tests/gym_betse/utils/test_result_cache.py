@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from gym_betse.utils.result_cache import ResultCache
+from tests.env_fixtures import BetseEnvTestCase
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_tiers(self):
+        cache_dir = os.path.join(self.tmp, "cache")
+        cache = ResultCache(cache_dir, max_entries=1)
+        first = cache.make_key("config", np.zeros(7), [1.0, 2.0])
+        second = cache.make_key("config", np.zeros(7), [1.0, 3.0])
+        self.assertNotEqual(first, second)
+        self.assertIsNone(cache.get(first))
+        cache.put(first, np.ones((3, 7)))
+        cache.put(second, np.zeros((3, 7)))
+
+        # first fell out of the LRU tier but is still on disk, also for another process sharing the directory
+        np.testing.assert_array_equal(cache.get(first), np.ones((3, 7)))
+        np.testing.assert_array_equal(ResultCache(cache_dir).get(second), np.zeros((3, 7)))
+        stats = cache.stats()
+        self.assertEqual((stats['memory_hits'], stats['disk_hits'], stats['misses']), (0, 1, 1))
+        self.assertEqual(stats['disk_entries'], 2)
+        self.assertFalse(cache.get(first).flags.writeable)
+
+    def test_eviction(self):
+        cache = ResultCache(os.path.join(self.tmp, "cache"), max_bytes=1)
+        cache.put("ab" * 32, np.ones(10))
+        self.assertEqual(cache.stats()['disk_entries'], 0)
+
+
+class TestBetseEnvResultCache(BetseEnvTestCase):
+
+    def run_episode(self, env, actions):
+        env.reset(seed=0)
+        results = [env.step(action) for action in actions]
+        return [result[0] for result in results], [result[4].get('cached') for result in results]
+
+    def test_repeated_episodes_are_served_from_the_cache(self):
+        cache = ResultCache(os.path.join(self.tmp, "cache"))
+        env = self.make_env("cached", simulation_kwargs={'result_cache': cache})
+        reference = self.make_env("reference")
+        first, cached = self.run_episode(env, [1, 0, 1])
+        self.assertEqual(cached, [False, False, False])
+        second, cached = self.run_episode(env, [1, 0, 1])
+        self.assertEqual(cached, [True, True, True])
+        for a, b in zip(first, second):
+            np.testing.assert_array_equal(a, b)
+
+        # a miss after cached steps first runs the skipped actions, so the result matches an uncached env
+        observations, cached = self.run_episode(env, [1, 0, 0])
+        self.assertEqual(cached, [True, True, False])
+        expected, _ = self.run_episode(reference, [1, 0, 0])
+        np.testing.assert_allclose(observations[-1], expected[-1])
+        self.assertEqual(env.simulation.steps_completed, 9)
+        stats = env.cache_stats()
+        self.assertEqual((stats['memory_hits'], stats['misses']), (5, 4))
+        self.assertIsNone(reference.cache_stats())
+        env.close()
+        reference.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+
+import h5py
+import numpy as np
+import torch
+
+from gym_betse.utils.data_storage import DataStorage
+from gym_betse.utils.reward import TargetReward, relabel_rewards
+from tests.env_fixtures import BetseEnvTestCase
+
+TARGET = np.array([-0.05, -0.05, -0.02, -0.02, -0.05, -0.05, -0.05])
+MASK = np.array([True, True, True, True, False, True, True])
+WEIGHTS = np.array([1.0, 1.0, 3.0, 3.0, 1.0, 1.0, 1.0])
+
+
+def loop_reward(state, next_states, seq_len, reward):
+    # straightforward per-cell, per-step version of TargetReward for comparison
+    def distance(voltages):
+        total, norm = 0.0, 0.0
+        for cell in range(len(voltages)):
+            if MASK[cell]:
+                total += WEIGHTS[cell] * abs(voltages[cell] - TARGET[cell]) ** reward.power
+                norm += WEIGHTS[cell]
+        return total / norm
+
+    final = distance(next_states[seq_len - 1])
+    path = sum(distance(next_states[t]) for t in range(seq_len)) / seq_len
+    value = -reward.terminal_weight * final - reward.path_weight * path
+    value += reward.shaping * (distance(state) - reward.discount * final)
+    if reward.tolerance is not None and final <= reward.tolerance:
+        value += reward.success_bonus
+    return value
+
+
+class TestTargetReward(unittest.TestCase):
+
+    def setUp(self):
+        self.reward = TargetReward(TARGET, mask=MASK, weights=WEIGHTS, path_weight=0.5, shaping=2.0, discount=0.9,
+                                   success_bonus=1.0, tolerance=2e-4)
+        rng = np.random.default_rng(0)
+        self.state = rng.normal(-0.04, 0.02, (6, 7))
+        self.next_states = rng.normal(-0.04, 0.02, (6, 5, 7))
+        self.seq_len = np.array([5, 1, 3, 5, 2, 4])
+
+    def test_batch_matches_loop(self):
+        rewards = self.reward(self.state, self.next_states, self.seq_len)
+        self.assertEqual(rewards.shape, (6,))
+        for i in range(6):
+            self.assertAlmostEqual(rewards[i], loop_reward(self.state[i], self.next_states[i], self.seq_len[i],
+                                                           self.reward))
+        # a single unpadded transition gives a float
+        single = self.reward(self.state[0], self.next_states[0])
+        self.assertIsInstance(single, float)
+        self.assertAlmostEqual(single, rewards[0])
+
+    def test_torch_matches_numpy(self):
+        expected = self.reward(self.state, self.next_states, self.seq_len)
+        rewards = self.reward(torch.tensor(self.state), torch.tensor(self.next_states), torch.tensor(self.seq_len))
+        self.assertIsInstance(rewards, torch.Tensor)
+        np.testing.assert_allclose(rewards.numpy(), expected)
+        states = torch.tensor(self.state, dtype=torch.float32)
+        np.testing.assert_allclose(self.reward.state_reward(states).numpy(), self.reward.state_reward(self.state),
+                                   rtol=1e-5)
+
+    def test_scalar_target_needs_the_number_of_cells(self):
+        with self.assertRaises(ValueError):
+            TargetReward(-0.05)
+        self.assertEqual(TargetReward(-0.05, num_cells=7).target.shape, (7,))
+        with self.assertRaises(ValueError):
+            TargetReward(TARGET, mask=np.zeros(7, dtype=bool))
+
+
+class TestRelabelRewards(BetseEnvTestCase):
+
+    def test_relabels_both_layouts(self):
+        reward = TargetReward(TARGET, mask=MASK, weights=WEIGHTS, path_weight=1.0)
+        rng = np.random.default_rng(1)
+        transitions = [(rng.normal(-0.04, 0.02, 7), rng.normal(-0.04, 0.02, (rng.integers(1, 6), 7)))
+                       for _ in range(23)]
+        expected = [reward(state, next_states) for state, next_states in transitions]
+        for layout in ('ragged', 'padded'):
+            with self.subTest(layout=layout):
+                storage = DataStorage(storage_path=self.tmp, filename=f'{layout}.h5', state_size=7, max_seq_length=5,
+                                      flush_every=4, layout=layout)
+                for state, next_states in transitions:
+                    storage.store_transition(state, 0, next_states, 0.0, False)
+                storage.close()
+
+                rewards = relabel_rewards(storage.filepath, reward, block_size=5, write=True)
+                np.testing.assert_allclose(rewards, expected, rtol=1e-5)
+                with h5py.File(storage.filepath, 'r') as file:
+                    np.testing.assert_array_equal(file['transitions/reward'][:], rewards)
+
+    def test_env_rewards_match_relabeling(self):
+        reward = TargetReward(TARGET, mask=MASK, path_weight=1.0, shaping=1.0)
+        env = self.make_env(reward_fn=reward)
+        env.reset(seed=0)
+        rewards = [env.step(action)[1] for action in (1, 0, 1)]
+        env.close()
+        np.testing.assert_allclose(relabel_rewards(env.data_storage.filepath, reward), rewards, rtol=1e-4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from gym_betse.utils.snapshot_cache import SnapshotCache
+
+CONFIG = """\
+init file saving:
+    directory: INITS
+    worldfile: world.betse.gz
+    file: init.betse.gz
+gene regulatory network settings:
+    gene regulatory network config: grn.yaml
+"""
+
+
+class TestSnapshotCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.config_path = os.path.join(self.tmp, "config.yaml")
+        with open(self.config_path, 'w') as file:
+            file.write(CONFIG)
+        self.grn_path = os.path.join(self.tmp, "grn.yaml")
+        with open(self.grn_path, 'w') as file:
+            file.write("biomolecules: []\n")
+        self.cache = SnapshotCache(os.path.join(self.tmp, "cache"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def write_artifacts(self, content):
+        os.makedirs(os.path.join(self.tmp, "INITS"), exist_ok=True)
+        for name in ("world.betse.gz", "init.betse.gz"):
+            with open(os.path.join(self.tmp, "INITS", name), 'w') as file:
+                file.write(content)
+
+    def test_miss_store_hit(self):
+        self.assertFalse(self.cache.restore(self.config_path))
+        self.write_artifacts("state")
+        self.cache.store(self.config_path)
+
+        self.cache.release(self.config_path)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp, "INITS", "init.betse.gz")))
+        self.assertTrue(self.cache.restore(self.config_path))
+        with open(os.path.join(self.tmp, "INITS", "init.betse.gz")) as file:
+            self.assertEqual(file.read(), "state")
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    def test_key_follows_grn_config(self):
+        key = self.cache.config_key(self.config_path)
+        with open(self.grn_path, 'a') as file:
+            file.write("# changed\n")
+        self.assertNotEqual(key, self.cache.config_key(self.config_path))
+
+    def test_backends_do_not_share_entries(self):
+        backend = 'gym_betse.utils.reduced_order.ReducedOrderWrapper'
+        self.write_artifacts("reduced")
+        self.cache.store(self.config_path, backend=backend)
+        self.assertNotEqual(self.cache.config_key(self.config_path), self.cache.config_key(self.config_path, backend))
+        self.assertFalse(self.cache.restore(self.config_path))
+        self.assertTrue(self.cache.restore(self.config_path, backend=backend))
+
+    def test_evicts_to_size(self):
+        self.write_artifacts("x" * 100)
+        self.cache.store(self.config_path)
+        self.cache.max_bytes = 10
+        self.cache.evict()
+        self.assertEqual(self.cache.stats()['entries'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
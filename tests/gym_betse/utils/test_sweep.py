@@ -0,0 +1,93 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from gym_betse.utils import sweep, yaml_friend
+
+CONFIG_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "..", "gym_betse", "config")
+CONFIG_PATH = os.path.join(CONFIG_DIR, "betse_config.yaml")
+
+
+class TestSampleParameters(unittest.TestCase):
+
+    def test_methods_stay_in_bounds(self):
+        low, high = sweep.parameter_bounds([1e-18, 3e-18, -2.0], spread=0.5)
+        for method in ('uniform', 'lhs'):
+            samples = sweep.sample_parameters(low, high, 1000, method=method, seed=0)
+            self.assertEqual(samples.shape, (1000, 3))
+            self.assertTrue(np.all((samples >= low) & (samples <= high)))
+        samples = sweep.sample_parameters(low[:2], high[:2], 1000, method='log_uniform', seed=0)
+        self.assertTrue(np.all((samples >= low[:2]) & (samples <= high[:2])))
+        with self.assertRaises(ValueError):
+            sweep.sample_parameters(low, high, 10, method='log_uniform')
+        np.testing.assert_array_equal(sweep.sample_parameters(low, high, 5, seed=1),
+                                      sweep.sample_parameters(low, high, 5, seed=1))
+
+    def test_latin_hypercube_fills_every_stratum_once(self):
+        samples = sweep.sample_parameters([0.0, 10.0], [1.0, 20.0], 50, method='lhs', seed=0)
+        strata = np.floor((samples - [0.0, 10.0]) / [1.0, 10.0] * 50).astype(int)
+        for column in strata.T:
+            self.assertEqual(sorted(column), list(range(50)))
+
+    def test_rounded_samples_keep_their_significant_figures(self):
+        # narrow ranges, so many rounded samples fall outside the bounds and get clipped
+        low = np.array([0.12345, -2.71828e-3, 9.9951, 1.00001e-18])
+        high = np.array([0.12987, -2.70123e-3, 10.0449, 1.01999e-18])
+        for method in ('uniform', 'lhs'):
+            samples = sweep.sample_parameters(low, high, 200, method=method, seed=0, significant_figures=3)
+            self.assertTrue(np.all((samples >= low) & (samples <= high)))
+            for value in samples.ravel():
+                self.assertEqual(value, float(f"{value:.2e}"))
+        with self.assertRaises(ValueError):
+            sweep.sample_parameters([0.12341], [0.12349], 5, significant_figures=3)
+
+    def test_round_significant_matches_string_formatting(self):
+        values = np.random.default_rng(0).uniform(-1, 1, 1000) * 10.0 ** np.arange(-25, 15).repeat(25)
+        expected = [float(f"{value:.2e}") for value in values]
+        self.assertEqual(yaml_friend.round_significant(values, 3).tolist(), expected)
+
+
+class TestRunSweep(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.sweep_dir = os.path.join(self.tmp, "sweep")
+        self.paths = yaml_friend.get_param_list(os.path.join(CONFIG_DIR, "params.txt"))[:4]
+        base = yaml_friend.ParamAccessor(CONFIG_PATH, self.paths).get_values()
+        self.values = sweep.sample_parameters(*sweep.parameter_bounds(base), 3, method='lhs', seed=0,
+                                              significant_figures=3)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_resumes_from_the_manifest(self):
+        summary = sweep.run_sweep(CONFIG_PATH, self.paths, self.values, self.sweep_dir, workers=2,
+                                  backend='reduced_order')
+        self.assertEqual(summary, {'done': 3, 'skipped': 0, 'failed': 0})
+        run_config = os.path.join(self.sweep_dir, "run_00001", "betse_config.yaml")
+        self.assertEqual(yaml_friend.ParamAccessor(run_config, self.paths).get_values(), self.values[1].tolist())
+
+        # drop the last run from the manifest, as if the sweep had been interrupted before it finished
+        manifest = os.path.join(self.sweep_dir, sweep.MANIFEST)
+        with open(manifest) as file:
+            lines = file.readlines()
+        dropped = json.loads(lines[-1])['run']
+        with open(manifest, 'w') as file:
+            file.writelines(lines[:-1] + ['{"run": 0, "key": "cut sho'])
+        summary = sweep.run_sweep(CONFIG_PATH, self.paths, self.values, self.sweep_dir, workers=1,
+                                  backend='reduced_order')
+        self.assertEqual(summary, {'done': 1, 'skipped': 2, 'failed': 0})
+        self.assertEqual(json.loads(open(manifest).readlines()[-1])['run'], dropped)
+
+        values, results = sweep.load_results(self.sweep_dir)
+        np.testing.assert_array_equal(values, self.values)
+        self.assertEqual([result.shape for result in results], [(60, 7)] * 3)
+        self.assertFalse(np.allclose(results[0], results[1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from gym_betse.utils.workspace import create_workspace, get_output_dirs
+
+CONFIG = """\
+init file saving:
+    directory: INITS
+    worldfile: world.betse.gz
+    file: init.betse.gz
+sim file saving:
+    directory: SIMS
+    file: sim.betse.gz
+results file saving:
+    init directory: RESULTS/init
+    sim directory: RESULTS/sim
+"""
+
+
+class TestWorkspace(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.config_dir = os.path.join(self.tmp, "config")
+        os.makedirs(os.path.join(self.config_dir, "geo"))
+        os.makedirs(os.path.join(self.config_dir, "INITS"))
+        self.config_path = os.path.join(self.config_dir, "betse_config.yaml")
+        with open(self.config_path, 'w') as file:
+            file.write(CONFIG)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_get_output_dirs(self):
+        self.assertEqual(get_output_dirs(self.config_path), {"INITS", "SIMS", "RESULTS"})
+
+    def test_workspaces_are_isolated(self):
+        first = create_workspace(self.config_path, os.path.join(self.tmp, "w0"))
+        second = create_workspace(self.config_path, os.path.join(self.tmp, "w1"))
+        self.assertNotEqual(first, second)
+        for path in (first, second):
+            workspace = os.path.dirname(path)
+            # read-only inputs are shared, output folders are not
+            self.assertTrue(os.path.isdir(os.path.join(workspace, "geo")))
+            self.assertFalse(os.path.exists(os.path.join(workspace, "INITS")))
+            with open(path) as file:
+                self.assertEqual(file.read(), CONFIG)
+
+
+if __name__ == '__main__':
+    unittest.main()
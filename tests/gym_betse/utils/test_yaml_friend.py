@@ -0,0 +1,148 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import yaml
+
+from gym_betse.utils import yaml_friend
+
+CONFIG = """\
+variable settings:
+  gap junctions:
+    gj minimum: 0.04
+general network:
+  biomolecules:
+    - name: 'X'
+      change at bounds:
+        change rate: 1.0
+        concentration: 0.5
+    - name: 'Y'
+      change at bounds:
+        change rate: 2.0
+        concentration: 0.7
+gene regulatory network settings:
+  gene regulatory network config: grn.yaml
+"""
+
+GRN = """\
+biomolecules:
+  - name: 'Gene 1'
+    z: 0
+"""
+
+PATHS = [
+    "config/variable settings/gap junctions/gj minimum",
+    "config/general network/biomolecules/change at bounds/change rate_Y",
+    "config/general network/biomolecules/change at bounds/concentration_X",
+]
+
+
+class TestParamAccessor(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.config_path = os.path.join(self.tmp, "config.yaml")
+        with open(self.config_path, 'w') as file:
+            file.write(CONFIG)
+        with open(os.path.join(self.tmp, "grn.yaml"), 'w') as file:
+            file.write(GRN)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def load(self, path):
+        with open(path) as file:
+            return yaml.safe_load(file)
+
+    def test_matches_update_yaml(self):
+        values = [0.1, 3.0, 0.9]
+        expected_path = os.path.join(self.tmp, "expected.yaml")
+        yaml_friend.update_yaml(self.config_path, PATHS, values, write_path=expected_path)
+
+        accessor = yaml_friend.ParamAccessor(self.config_path, PATHS)
+        self.assertEqual(accessor.get_values(), [0.04, 2.0, 0.5])
+        self.assertTrue(accessor.set_values(values))
+        actual_path = os.path.join(self.tmp, "actual.yaml")
+        self.assertTrue(accessor.write(actual_path))
+        self.assertEqual(self.load(actual_path), self.load(expected_path))
+
+    def test_unchanged_values_skip_write(self):
+        accessor = yaml_friend.ParamAccessor(self.config_path, PATHS)
+        self.assertFalse(accessor.set_values(accessor.get_values()))
+        self.assertFalse(accessor.write(os.path.join(self.tmp, "unused.yaml")))
+        self.assertFalse(os.path.exists(os.path.join(self.tmp, "unused.yaml")))
+
+    def test_grn_paths_write_a_copy(self):
+        accessor = yaml_friend.ParamAccessor(self.config_path, ["grn/biomolecules/z_Gene 1"])
+        accessor.set_values([2])
+        write_path = os.path.join(self.tmp, "temp.yaml")
+        accessor.write(write_path)
+
+        config = self.load(write_path)
+        grn_path = config["gene regulatory network settings"]["gene regulatory network config"]
+        self.assertEqual(self.load(grn_path)["biomolecules"][0]["z"], 2)
+        self.assertEqual(self.load(os.path.join(self.tmp, "grn.yaml"))["biomolecules"][0]["z"], 0)
+
+    def test_unknown_path_fails_on_compile(self):
+        with self.assertRaises(KeyError):
+            yaml_friend.ParamAccessor(self.config_path, ["config/variable settings/missing"])
+
+
+class TestCreateParamsDataset(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.runs = os.path.join(self.tmp, "runs")
+        for i in range(3):
+            run = os.path.join(self.runs, f"run_{i}")
+            os.makedirs(os.path.join(run, "extra_configs"))
+            with open(os.path.join(run, "config.yaml"), 'w') as file:
+                file.write(CONFIG.replace("0.04", str(i)).replace("grn.yaml", "extra_configs/grn.yaml"))
+            with open(os.path.join(run, "extra_configs", "grn.yaml"), 'w') as file:
+                file.write(GRN)
+        self.params_path = os.path.join(self.tmp, "params.txt")
+        with open(self.params_path, 'w') as file:
+            file.write("\n".join(["ID", PATHS[0], "config/general network/biomolecules/change at bounds/change rate",
+                                   "grn/biomolecules/z"]))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_matches_extract_params(self):
+        output_path = os.path.join(self.tmp, "out", "values.csv")
+        df = yaml_friend.create_params_dataset(self.runs, self.params_path, output_path=output_path, workers=2)
+
+        params_to_extract = yaml_friend.get_param_list(self.params_path)
+        expected = {param: [] for param in params_to_extract}
+        for i in range(3):
+            yaml_friend.extract_params(expected, os.path.join(self.runs, f"run_{i}", "config.yaml"), params_to_extract)
+        expected = {k: v for k, v in expected.items() if any(x is not None for x in v)}
+
+        self.assertEqual(df.to_dict('list'), expected)
+        self.assertEqual(list(df.columns), ["ID", PATHS[0],
+                                            "config/general network/biomolecules/change at bounds/change rate_X",
+                                            "config/general network/biomolecules/change at bounds/change rate_Y",
+                                            "grn/biomolecules/z_Gene 1"])
+        self.assertEqual(df["ID"].tolist(), ["run_0", "run_1", "run_2"])
+        self.assertTrue(os.path.exists(output_path))
+
+    def test_rerun_only_parses_changed_files(self):
+        cache_path = os.path.join(self.tmp, "cache.pkl")
+        yaml_friend.create_params_dataset(self.runs, self.params_path, output_path=None, cache_path=cache_path,
+                                          workers=1)
+        grn_path = os.path.join(self.runs, "run_1", "extra_configs", "grn.yaml")
+        with open(grn_path, 'w') as file:
+            file.write(GRN.replace("z: 0", "z: 5"))
+
+        with mock.patch.object(yaml_friend, '_scan_file', wraps=yaml_friend._scan_file) as scan:
+            df = yaml_friend.create_params_dataset(self.runs, self.params_path, output_path=None,
+                                                   cache_path=cache_path, workers=1)
+        self.assertEqual([call.args[0][0] for call in scan.call_args_list],
+                         [os.path.join(self.runs, "run_1", "config.yaml")])
+        self.assertEqual(df["grn/biomolecules/z_Gene 1"].tolist(), [0, 5, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
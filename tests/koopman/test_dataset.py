@@ -0,0 +1,155 @@
+import multiprocessing as mp
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+
+from gym_betse.utils.data_storage import DataStorage, find_shards, merge_shards
+from koopman.dataset import available_transitions, KoopmanDataset, ContiguousBatchSampler, StreamingKoopmanDataset, export_memmap
+from koopman.train_koopman import custom_collate_fn
+
+
+class TestKoopmanDataset(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp()
+        cls.paths = {}
+        for layout in ('ragged', 'padded'):
+            storage = DataStorage(storage_path=cls.tmp, filename=f'{layout}.h5', state_size=3, max_seq_length=6,
+                                  flush_every=8, layout=layout)
+            for i in range(40):
+                storage.store_transition(np.full(3, i), 0, np.full((i % 6 + 1, 3), i, dtype='float32'), 0.0, False)
+            storage.close()
+            cls.paths[layout] = storage.filepath
+        cls.paths['memmap'] = export_memmap(cls.paths['padded'], os.path.join(cls.tmp, 'memmap'))
+
+        # the same 40 transitions written by three collectors and indexed as one virtual dataset
+        shard_dir = os.path.join(cls.tmp, 'shards')
+        for shard, (start, stop) in enumerate([(0, 13), (13, 14), (14, 40)]):
+            storage = DataStorage(storage_path=shard_dir, state_size=3, max_seq_length=6, flush_every=8, shard=shard)
+            for i in range(start, stop):
+                storage.store_transition(np.full(3, i), 0, np.full((i % 6 + 1, 3), i, dtype='float32'), 0.0, False)
+            storage.close()
+        cls.paths['virtual'] = merge_shards(find_shards(shard_dir), os.path.join(shard_dir, 'dataset.h5'))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp)
+
+    def datasets(self):
+        yield 'ragged', KoopmanDataset(self.paths['ragged'])
+        yield 'padded', KoopmanDataset(self.paths['padded'])
+        yield 'preload', KoopmanDataset(self.paths['ragged'], preload=True)
+        yield 'memmap', KoopmanDataset(self.paths['memmap'])
+        yield 'virtual', KoopmanDataset(self.paths['virtual'])
+        yield 'virtual preload', KoopmanDataset(self.paths['virtual'], preload=True)
+
+    def check_item(self, item, i):
+        self.assertEqual(int(item['seq_len']), i % 6 + 1)
+        torch.testing.assert_close(item['state'], torch.full((3,), float(i)))
+        torch.testing.assert_close(item['next_states'], torch.full((i % 6 + 1, 3), float(i)))
+
+    def test_backends_agree(self):
+        for name, dataset in self.datasets():
+            with self.subTest(backend=name):
+                self.assertEqual(len(dataset), 40)
+                self.check_item(dataset[7], 7)
+                indices = [31, 2, 17, 2, 39]
+                for i, item in zip(indices, dataset.__getitems__(indices)):
+                    self.check_item(item, i)
+                for i, item in zip(range(8, 16), dataset.__getitems__(list(range(8, 16)))):
+                    self.check_item(item, i)
+                dataset.close()
+
+    def test_contiguous_batches_with_workers(self):
+        dataset = KoopmanDataset(self.paths['ragged'])
+        sampler = ContiguousBatchSampler(dataset, batch_size=16)
+        loader = DataLoader(dataset, batch_sampler=sampler, num_workers=2, collate_fn=custom_collate_fn)
+        seen = torch.cat([batch['state'][:, 0] for batch in loader])
+        self.assertEqual(sorted(seen.int().tolist()), list(range(40)))
+        self.assertEqual(len(sampler), 3)
+        dataset.close()
+
+
+def _collect(storage_path, count, opened):
+    # writer process for TestStreamingKoopmanDataset
+    storage = DataStorage(storage_path=storage_path, state_size=3, max_seq_length=6, flush_every=8, swmr=True)
+    opened.set()
+    for i in range(count):
+        storage.store_transition(np.full(3, i), 0, np.full((i % 6 + 1, 3), i, dtype='float32'), 0.0, False)
+        if i % 8 == 7:
+            time.sleep(0.02)
+    storage.close()
+
+
+class TestStreamingKoopmanDataset(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def check_items(self, items, count):
+        self.assertEqual(sorted(int(item['state'][0]) for item in items), list(range(count)))
+        for item in items:
+            i = int(item['state'][0])
+            torch.testing.assert_close(item['next_states'], torch.full((i % 6 + 1, 3), float(i)))
+
+    def test_follows_a_running_writer(self):
+        ctx = mp.get_context('fork')
+        opened = ctx.Event()
+        writer = ctx.Process(target=_collect, args=(self.tmp, 200, opened))
+        writer.start()
+        self.assertTrue(opened.wait(30))
+        dataset = StreamingKoopmanDataset(os.path.join(self.tmp, 'dataset.h5'), shuffle_buffer=16, block_size=10,
+                                          poll_interval=0.01, idle_timeout=2.0, seed=0)
+        items = list(dataset)
+        writer.join()
+        self.check_items(items, 200)
+        self.assertNotEqual([int(item['state'][0]) for item in items], list(range(200)))
+
+    def test_rows_being_flushed_are_not_available(self):
+        storage = DataStorage(storage_path=self.tmp, state_size=3, max_seq_length=6, flush_every=8, swmr=True)
+        for i in range(8):
+            storage.store_transition(np.full(3, i), 0, np.full((i % 6 + 1, 3), i, dtype='float32'), 0.0, False)
+        transitions = storage.h5file['transitions']
+        total_states = storage.total_states
+        # a flush between resizing seq_len and writing its rows
+        for name, dataset in transitions.items():
+            if name != 'next_states':
+                dataset.resize(12, axis=0)
+        storage.h5file.flush()
+        self.assertEqual(available_transitions(transitions), (8, total_states))
+        transitions['seq_len'][8:12] = 1
+        self.assertEqual(available_transitions(transitions)[0], 12)
+        storage.close()
+
+    def test_workers_split_a_finished_file(self):
+        for layout in ('ragged', 'padded'):
+            with self.subTest(layout=layout):
+                storage = DataStorage(storage_path=self.tmp, filename=f'{layout}.h5', state_size=3,
+                                      max_seq_length=6, flush_every=8, layout=layout)
+                for i in range(40):
+                    storage.store_transition(np.full(3, i), 0, np.full((i % 6 + 1, 3), i, dtype='float32'), 0.0,
+                                             False)
+                storage.close()
+                path = storage.filepath
+
+                in_order = list(StreamingKoopmanDataset(path, shuffle_buffer=1, block_size=8))
+                self.assertEqual([int(item['state'][0]) for item in in_order], list(range(40)))
+                # without swmr the file cannot be growing, so following ends at its current length
+                loader = DataLoader(StreamingKoopmanDataset(path, block_size=8, start=5), batch_size=4,
+                                    num_workers=2, collate_fn=custom_collate_fn)
+                seen = torch.cat([batch['state'][:, 0] for batch in loader])
+                self.assertEqual(sorted(seen.int().tolist()), list(range(5, 40)))
+
+
+if __name__ == '__main__':
+    unittest.main()
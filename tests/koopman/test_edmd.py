@@ -0,0 +1,72 @@
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import torch
+
+from gym_betse.utils.data_storage import DataStorage
+from koopman.dataset import KoopmanDataset
+from koopman.edmd import EDMDStatistics, edmd, lifted_pairs
+from koopman.models import KoopmanModel
+from koopman.train_koopman import custom_collate_fn
+
+
+class TestEDMD(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(0)
+        self.tmp = tempfile.mkdtemp()
+        self.model = KoopmanModel(state_size=3, lifted_size=4)
+        self.storage = DataStorage(storage_path=self.tmp, state_size=3, max_seq_length=6, flush_every=8)
+        self.rng = np.random.default_rng(0)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def store(self, count):
+        for _ in range(count):
+            seq_len = self.rng.integers(1, 7)
+            self.storage.store_transition(self.rng.random(3), 0, self.rng.random((seq_len, 3)), 0.0, False)
+        self.storage.flush()
+
+    def test_recovers_linear_operator(self):
+        K = torch.randn(4, 4, dtype=torch.float64) * 0.5
+        X = torch.randn(200, 4, dtype=torch.float64)
+        statistics = EDMDStatistics(4)
+        statistics.update(X[:120], X[:120] @ K)
+        statistics.update(X[120:], X[120:] @ K)
+        torch.testing.assert_close(statistics.solve(regularization=0.0), K)
+
+    def test_matches_least_squares(self):
+        self.store(30)
+        self.storage.close()
+        statistics = edmd(self.model, self.storage.filepath, batch_size=7, regularization=0.0)
+        self.assertEqual(statistics.num_transitions, 30)
+
+        dataset = KoopmanDataset(self.storage.filepath)
+        batch = custom_collate_fn(dataset.__getitems__(list(range(30))))
+        with torch.no_grad():
+            X, Y = lifted_pairs(self.model, batch['state'], batch['next_states'], batch['seq_len'])
+        self.assertEqual(X.shape[0], statistics.num_pairs)
+        expected = torch.linalg.lstsq(X.double(), Y.double()).solution
+        torch.testing.assert_close(self.model.K.detach(), expected.float(), rtol=1e-4, atol=1e-4)
+
+    def test_streaming_update_matches_full_pass(self):
+        self.store(20)
+        statistics = EDMDStatistics(4)
+        self.assertEqual(statistics.update_from_dataset(self.model, self.storage.filepath, batch_size=6), 20)
+        self.store(15)
+        self.assertEqual(statistics.update_from_dataset(self.model, self.storage.filepath, batch_size=6), 15)
+        self.assertEqual(statistics.update_from_dataset(self.model, self.storage.filepath), 0)
+        self.storage.close()
+
+        full = EDMDStatistics(4)
+        full.update_from_dataset(self.model, self.storage.filepath, batch_size=35)
+        torch.testing.assert_close(statistics.G, full.G)
+        torch.testing.assert_close(statistics.A, full.A)
+        torch.testing.assert_close(statistics.solve(), full.solve())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+
+import torch
+import torch.nn as nn
+
+from koopman.models import KoopmanModel
+from koopman.utils import compute_koopman_loss, koopman_powers
+
+
+def loop_loss(model, state, next_states, seq_len):
+    # the per-step rollout train_koopman_model used before compute_koopman_loss
+    criterion = nn.MSELoss()
+    lifted_state = model(state)
+    total_loss = 0.0
+    for t in range(next_states.shape[1] - 1):
+        lifted_state = model.predict_next_lifted(lifted_state)
+        reconstructed_state = model.reconstruct(lifted_state)
+        mask = (seq_len > t + 1).float().unsqueeze(1)
+        total_loss += criterion(reconstructed_state * mask, next_states[:, t + 1, :] * mask)
+    return total_loss
+
+
+class TestComputeKoopmanLoss(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(0)
+        self.model = KoopmanModel(state_size=5, lifted_size=8).double()
+        with torch.no_grad():
+            # keep the rollout bounded so both versions are compared on well-scaled values
+            self.model.K.mul_(0.3)
+        self.state = torch.randn(6, 5, dtype=torch.float64)
+        self.seq_len = torch.tensor([1, 3, 7, 7, 2, 5])
+        self.next_states = torch.randn(6, 7, 5, dtype=torch.float64)
+        for i, n in enumerate(self.seq_len):
+            self.next_states[i, n:] = 0
+
+    def test_powers(self):
+        K = self.model.K.detach()
+        powers = koopman_powers(K, 5)
+        self.assertEqual(powers.shape, (5, 8, 8))
+        torch.testing.assert_close(powers[4], torch.linalg.matrix_power(K, 5))
+
+    def test_matches_loop(self):
+        expected = loop_loss(self.model, self.state, self.next_states, self.seq_len)
+        expected_grads = torch.autograd.grad(expected, list(self.model.parameters()))
+        actual = compute_koopman_loss(self.model, self.state, self.next_states, self.seq_len)
+        actual_grads = torch.autograd.grad(actual, list(self.model.parameters()))
+        torch.testing.assert_close(actual, expected)
+        for actual_grad, expected_grad in zip(actual_grads, expected_grads):
+            torch.testing.assert_close(actual_grad, expected_grad)
+
+    def test_optional_terms(self):
+        base = compute_koopman_loss(self.model, self.state, self.next_states, self.seq_len)
+        weighted = compute_koopman_loss(self.model, self.state, self.next_states, self.seq_len,
+                                        reconstruction_weight=0.5, linearity_weight=0.5)
+        self.assertGreater(weighted.item(), base.item())
+        single = compute_koopman_loss(self.model, self.state, self.next_states[:, :1], self.seq_len.clamp(max=1))
+        self.assertEqual(single.item(), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()